@@ -71,6 +71,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'projects.middleware.BatchedProjectTouchMiddleware',
 ]
 
 AUTHENTICATION_BACKENDS = [
@@ -199,6 +200,19 @@ STATIC_ROOT = os.getenv('STATIC_FILES', '/static/')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Identical media files are stored once (see mediadedupe command)
+DEFAULT_FILE_STORAGE = 'projects.utils.storage.DeduplicatingStorage'
+
+# Prepared export archives (sent to the clients as is)
+EXPORTS_ROOT = os.getenv('EXPORTS_ROOT', os.path.join(BASE_DIR, 'exports'))
+
+# Downloads are authorized by Django and sent by nginx (X-Accel-Redirect)
+SENDFILE_X_ACCEL = int(os.getenv('SENDFILE_X_ACCEL', not DEBUG))
+SENDFILE_LOCATIONS = (
+    (MEDIA_ROOT, '/protected/media/'),
+    (EXPORTS_ROOT, '/protected/exports/'),
+)
+
 VALIDATOR_SYMBOLS = f'{string.ascii_letters}{string.digits}_-'
 
 CRT_TTS_CONVERT_API_URL = '%YOUR_CRT_TTS_API_LINK%'
@@ -295,6 +309,48 @@ MANUAL_EDIT_SLUG = 'drafts'
 # Other Hz rate cannot be played by Buddy
 DEFAULT_HRZ_RATE = 8000
 
+# Size of the thread pools for the TTS requests and SoX conversions
+AUDIO_WORKERS = int(os.getenv('AUDIO_WORKERS', 15))
+
+# Derived audio cache (same FS as media, so cached files are hardlinked)
+AUDIO_CACHE_ROOT = os.getenv(
+    'AUDIO_CACHE_ROOT',
+    os.path.join(MEDIA_ROOT, '.cache')
+)
+SPEED_VARIANTS_MAX_SIZE = int(
+    os.getenv('SPEED_VARIANTS_MAX_SIZE', 512 * 2 ** 20)
+)
+# Browser previews are compressed copies (exports use original PCM)
+PREVIEWS_MAX_SIZE = int(os.getenv('PREVIEWS_MAX_SIZE', 256 * 2 ** 20))
+PREVIEW_BITRATE = os.getenv('PREVIEW_BITRATE', '16k')
+# Exported (raw) audio, reused by every rebuild of the project archives
+RAW_DERIVATIVES_MAX_SIZE = int(
+    os.getenv('RAW_DERIVATIVES_MAX_SIZE', 1024 * 2 ** 20)
+)
+# TTS results by the normalized text, voice and emotion (default speed)
+SYNTHESIS_CACHE_MAX_SIZE = int(
+    os.getenv('SYNTHESIS_CACHE_MAX_SIZE', 1024 * 2 ** 20)
+)
+# Compression of the exported archives: "method[:level]", where method is
+# stored, deflated, bzip2 or lzma. Stored is the fastest (PCM audio barely
+# shrinks), deflated:1 is the fastest one that compresses, bzip2 and lzma
+# trade much longer exports for size. Run "zipbench" on real projects first
+EXPORT_COMPRESSION = os.getenv('EXPORT_COMPRESSION', 'stored')
+# Seconds the previous export artifact is kept for the downloads in progress
+EXPORT_GRACE_PERIOD = int(os.getenv('EXPORT_GRACE_PERIOD', 6 * 60 * 60))
+# Multi-project archives, one per chosen set of projects (oldest are evicted)
+BULK_EXPORTS_MAX_SIZE = int(
+    os.getenv('BULK_EXPORTS_MAX_SIZE', 2048 * 2 ** 20)
+)
+# Speeds prepared right after synthesis, e.g. "0.9,1.1,1.2" (off if empty)
+SPEED_VARIANTS_PREWARM = tuple(
+    float(speed)
+    for speed in os.getenv('SPEED_VARIANTS_PREWARM', '').split(',')
+    if speed.strip()
+)
+# Seconds without edits of the draft before its speculative synthesis
+DRAFT_WARM_DELAY = float(os.getenv('DRAFT_WARM_DELAY', 1.5))
+
 
 CRT_TTS_OPENING_SHORTENING_RULES = {
     'Анна8000': 0.2,
@@ -7,13 +7,17 @@ from typing import Any, Iterable, Tuple
 
 import xlwt
 
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.http.request import HttpRequest
 from django.shortcuts import redirect
 from django.views import View
 
-from projects.mixins.imed_based import ZipFileMediaBuildMixin
+from projects.mixins.imed_based import (
+    CURSOR_CHUNK_SIZE,
+    ZipFileMediaBuildMixin,
+)
 from projects.models import IntegrationProject
+from projects.utils import datasheets
 
 
 class PackAndSendZipView(View, ZipFileMediaBuildMixin):
@@ -33,13 +37,49 @@ class PackAndSendZipView(View, ZipFileMediaBuildMixin):
 
         return self.create_and_send_a_zip(
             IntegrationProject.objects.get(slug=project),
-            self.request.GET.get('build-path')
+            self.request.GET.get('build-path'),
+            self.request.GET.get('compression')
+        )
+
+
+class PackAndSendBulkZipView(View, ZipFileMediaBuildMixin):
+    """ View for creating single ZIP archive of several projects """
+
+    def get(
+            self,
+            request: HttpRequest,
+            *_args: Any,
+            **_kwargs: Any
+    ) -> HttpResponse:
+        """ Projects are chosen by the repeated "project" parameter """
+        slugs = set(request.GET.getlist('project'))
+        if not slugs:
+            return HttpResponse(status=400, content='No projects are chosen')
+        projects = list(IntegrationProject.objects.filter(slug__in=slugs))
+        missing = slugs - {project.slug for project in projects}
+        if missing:
+            return HttpResponse(
+                status=404,
+                content=f'Cannot find projects: {", ".join(sorted(missing))}'
+            )
+
+        return self.create_and_send_a_bulk_zip(
+            projects,
+            request.GET.get('build-path'),
+            request.GET.get('compression'),
+            request.GET.get('split') in ('1', 'true')
         )
 
 
 class GetAnalyticsDataSheetView(View):
     """ Get project-related audio data CSV d-sheets """
 
+    FORMATS = ('xls', 'xlsx', 'csv')
+
+    XLSX_CONTENT_TYPE = (
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
     @staticmethod
     def _make_excel(
             data: Iterable[Tuple[str, str]]
@@ -71,16 +111,37 @@ class GetAnalyticsDataSheetView(View):
             *_args: Any,
             **_kwargs: Any
     ) -> HttpResponse:
-        """ Trigger for data sheet fetch """
-        response = HttpResponse(content_type='application/vnd.ms-excel')
+        """ Trigger for data sheet fetch (?format=xls|xlsx|csv) """
+        sheet_format = self.request.GET.get('format', 'xls')
+        if sheet_format not in self.FORMATS:
+            return HttpResponse(
+                status=400,
+                content=f'Unknown format. Use one of {self.FORMATS}'
+            )
         project = IntegrationProject.objects.get(slug=self.kwargs['project'])
         cursor_iter = project.audiorecord_set.all().values_list('name', 'text')
 
-        xls_file = self._make_excel(cursor_iter)
-        response.write(xls_file.getvalue())
+        if sheet_format == 'xls':
+            response = HttpResponse(content_type='application/vnd.ms-excel')
+            xls_file = self._make_excel(cursor_iter)
+            response.write(xls_file.getvalue())
+        else:
+            # Server-side cursor, rows are written as they are fetched
+            rows = cursor_iter.iterator(chunk_size=CURSOR_CHUNK_SIZE)
+            if sheet_format == 'csv':
+                response = StreamingHttpResponse(
+                    datasheets.iter_csv(rows),
+                    content_type='text/csv'
+                )
+            else:
+                response = StreamingHttpResponse(
+                    datasheets.iter_xlsx(rows),
+                    content_type=self.XLSX_CONTENT_TYPE
+                )
         response['Content-Disposition'] = (
             'attachment; '
-            f'filename="{project.slug}_{datetime.datetime.now()}.xls"'
+            f'filename="{project.slug}_{datetime.datetime.now()}'
+            f'.{sheet_format}"'
         )
         return response
 
@@ -0,0 +1,110 @@
+""" Conditional GET helpers (ETag/Last-Modified) for listing API views """
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from projects.models import IntegrationProject
+
+
+__all__ = (
+    'conditional_listing',
+    'projects_listing_state',
+    'records_listing_state',
+)
+
+ListingState = Tuple[Optional[datetime], int]
+
+_STATE_ATTR = '_listing_state'
+
+
+def _memoize_on_request(
+        fn: Callable[..., Optional[ListingState]]
+) -> Callable[..., Optional[ListingState]]:
+    """ Compute listing state only once per request
+
+    Notes:
+        Both ETag and Last-Modified callbacks are fed from the same state,
+        so without memoization every conditional request costs two queries
+
+    """
+    @wraps(fn)
+    def wrapper(request: Any, *args: Any, **kwargs: Any):
+        if not hasattr(request, _STATE_ATTR):
+            setattr(request, _STATE_ATTR, fn(request, *args, **kwargs))
+        return getattr(request, _STATE_ATTR)
+    return wrapper
+
+
+@_memoize_on_request
+def projects_listing_state(
+        _request: Any,
+        *_args: Any,
+        **_kwargs: Any
+) -> Optional[ListingState]:
+    """ Freshest project timestamp and amount of listed projects """
+    state = IntegrationProject.objects.exclude(
+        slug=settings.MANUAL_EDIT_SLUG
+    ).aggregate(last_updated=Max('last_updated'), projects=Count('pk'))
+    return state['last_updated'], state['projects']
+
+
+@_memoize_on_request
+def records_listing_state(
+        _request: Any,
+        *_args: Any,
+        project: str,
+        **_kwargs: Any
+) -> Optional[ListingState]:
+    """ Project timestamp and amount of its records (None if not found)
+
+    Notes:
+        AudioRecord.save touches the project, so last_updated is changed on
+        every record write, the count covers deletion of the records
+
+    """
+    return IntegrationProject.objects.filter(
+        slug__exact=project
+    ).annotate(
+        records=Count('audiorecord')
+    ).values_list('last_updated', 'records').first()
+
+
+def conditional_listing(
+        state_func: Callable[..., Optional[ListingState]]
+) -> Callable[[Callable], Callable]:
+    """ Decorate listing method with weak ETag and Last-Modified support
+
+    Args:
+        state_func: Callable that returns (last_updated, amount) pair for the
+                    listed resource, None in case resource does not exist
+
+    Returns:
+        Method decorator. Answer is 304 Not Modified if client copy is fresh
+
+    """
+    def etag(request: Any, *args: Any, **kwargs: Any) -> Optional[str]:
+        state = state_func(request, *args, **kwargs)
+        if state is None or state[0] is None:
+            return None
+        last_updated, amount = state
+        return f'W/"{last_updated.timestamp():.6f}-{amount}"'
+
+    def last_modified(
+            request: Any,
+            *args: Any,
+            **kwargs: Any
+    ) -> Optional[datetime]:
+        state = state_func(request, *args, **kwargs)
+        return state[0] if state else None
+
+    def decorator(fn: Callable) -> Callable:
+        fn = method_decorator(condition(etag, last_modified))(fn)
+        # Make browsers revalidate every poll instead of using stale copy
+        return method_decorator(cache_control(private=True, no_cache=True))(fn)
+    return decorator
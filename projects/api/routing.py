@@ -14,6 +14,10 @@ from .views import (
     FileImportView,
     UpdateRecordView,
     ImportOwnFilesView,
+    SpeedPreviewView,
+    WarmDraftView,
+    PreviewView,
+    DownloadAudioView,
 )
 urlpatterns = []
 
@@ -60,6 +64,26 @@ urlpatterns += [
         UpdateRecordView.as_view(),
         name='audio-update'
     ),
+    path(
+        'audiorecords/<slug:project>/speed-preview/<optint:primary_key>',
+        SpeedPreviewView.as_view(),
+        name='audio-speed-preview'
+    ),
+    path(
+        'audiorecords/<slug:project>/warm/<optint:primary_key>',
+        WarmDraftView.as_view(),
+        name='audio-warm'
+    ),
+    path(
+        'audiorecords/<slug:project>/preview/<optint:primary_key>',
+        PreviewView.as_view(),
+        name='audio-preview'
+    ),
+    path(
+        'audiorecords/<slug:project>/download/<optint:primary_key>',
+        DownloadAudioView.as_view(),
+        name='audio-download'
+    ),
     path(
         'audiorecords/<slug:project>/destroy/<optint:id>',
         DestroyAudioView.as_view(),
@@ -25,6 +25,19 @@ def humanize_datetime(data: Dict[str, Any], *, field: str) -> Dict[str, Any]:
 class RecordSerializer(serializers.ModelSerializer):
     """ Static All query records serializer for AudioRecord model """
 
+    preview = serializers.SerializerMethodField('get_link_to_preview')
+
+    def get_link_to_preview(self, object_: AudioRecord) -> str:
+        """ Make field with the link for compressed audio (for playback) """
+        link = reverse(
+            'api:audio-preview',
+            kwargs={
+                'project': object_.related_project.slug,
+                'primary_key': object_.pk
+            }
+        )
+        return f'{link}?v={object_.modified_at.timestamp():.6f}'
+
     def to_representation(self, instance: Any):
         """ Redefine data representation """
         data = super().to_representation(instance)
@@ -33,6 +46,15 @@ class RecordSerializer(serializers.ModelSerializer):
             char for char in instance.voice if char not in string.digits
         ])
         data['id'] = instance.id
+        if instance.audio:
+            # Media is not public, it is sent after the record lookup
+            data['audio'] = reverse(
+                'api:audio-download',
+                kwargs={
+                    'project': instance.related_project.slug,
+                    'primary_key': instance.pk
+                }
+            )
         return humanize_datetime(data, field='modified_at')
 
     class Meta:
@@ -47,6 +69,11 @@ class IntegrationProjectSerializer(serializers.ModelSerializer):
 
     audiorecords = serializers.SerializerMethodField('get_link_to_audios')
 
+    # Available only for the IntegrationProject.objects.with_totals()
+    records_amount = serializers.IntegerField(read_only=True)
+    total_duration = serializers.FloatField(read_only=True)
+    storage_used = serializers.IntegerField(read_only=True)
+
     def get_link_to_audios(self, object_: IntegrationProject):
         """ Make field for receiving actual link for project audio records """
         return reverse(
@@ -90,6 +117,7 @@ class IntegrationProjectSerializer(serializers.ModelSerializer):
         model = IntegrationProject
         fields = (
             'name', 'slug', 'audiorecords', 'last_updated',
+            'records_amount', 'total_duration', 'storage_used',
         )
 
 
@@ -11,7 +11,11 @@ from .audio_related import (
     DestroyAudioView,
     FileImportView,
     UpdateRecordView,
-    ImportOwnFilesView
+    ImportOwnFilesView,
+    SpeedPreviewView,
+    WarmDraftView,
+    PreviewView,
+    DownloadAudioView
 )
 
 from .source_related import (
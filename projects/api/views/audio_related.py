@@ -5,18 +5,26 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Any, Tuple, Dict
 
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
 from django.forms import model_to_dict
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 
 from requests import Request
 
 from rest_framework import generics
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from projects.api.conditions import (
+    conditional_listing,
+    records_listing_state,
+)
 from projects.api.serializers import RecordSerializer
 from projects.mixins.sound_based import (
     CRTTTSMixin,
@@ -24,8 +32,17 @@ from projects.mixins.sound_based import (
     SoxTransformerMixin
 )
 from projects.models import AudioRecord, Source, IntegrationProject
+from projects.utils.downloads import send_file
 from projects.utils.exceptions import ReadUserDataFileError
+from projects.utils.previews import PREVIEW_CONTENT_TYPE, audio_preview
+from projects.utils.cache import (
+    prewarm_speed_variants,
+    speed_variant,
+    variant_speed
+)
+from projects.utils.storage import temp_copy
 from projects.utils.tasks import FileParserWithAudioCreation, import_own_files
+from projects.utils.warmer import draft_warmer
 
 
 class DestroyAudioView(generics.DestroyAPIView):
@@ -49,7 +66,12 @@ class GetRecordsForProjectView(generics.ListAPIView):
         """ Get data ONLY for concrete project """
         return AudioRecord.objects.filter(
             related_project__slug__exact=self.kwargs['project']
-        )
+        ).select_related('related_project', 'source')
+
+    @conditional_listing(records_listing_state)
+    def get(self, request, *args, **kwargs):
+        """ Answer 304 if project records were not changed """
+        return super().get(request, *args, **kwargs)
 
 
 def wrap_error(fn):
@@ -91,29 +113,58 @@ class UpdateRecordView(APIView):
         presets['speed'] = float(presets.pop('playing_speed'))
         return presets
 
+    @staticmethod
+    def _is_speed_only(entry: AudioRecord, data: Dict[str, Any]) -> bool:
+        """ Check that request changes nothing but the playing speed
+
+        Notes:
+            Fields equal to the stored ones are not treated as changes
+
+        """
+        if 'speed' not in data or not entry.default_audio:
+            return False
+        if str(data['tts']) != str(entry.source_id):
+            return False
+        stored = {'text': entry.text, 'voice': entry.voice}
+        if entry.emote:
+            stored['emotion'] = entry.emote
+        return all(
+            key in stored and data[key] == stored[key]
+            for key in data.keys() - {'tts', 'speed'}
+        )
+
     @staticmethod
     def _speed_update(
             entry: AudioRecord,
             data: Dict[str, Any],
             builder: SoxTransformerMixin
     ) -> Response:
-        """ Only update speed for current audio record """
+        """ Only update speed for current audio record
+
+        Notes:
+            New tempo is made from the stored default audio, so there is
+            no TTS call. Tempo of every speed is changed only once (cached)
+
+        """
         new_speed = float(data['speed'])
-        new_record = builder.change_audio_speed(
-            entry.default_audio.path,
-            new_speed
-        )
-        with new_record as audio:
-            entry.audio.delete()
-            entry.audio.save(
-                f'{entry.name}_{datetime.now()}.wav',
-                ContentFile(audio.read())
+        name = f'{entry.name}_{datetime.now()}.wav'
+        if new_speed == 1.0:
+            field = entry.audio.field
+            entry.audio = field.storage.link(
+                entry.default_audio.name,
+                field.generate_filename(entry, name),
+                max_length=field.max_length
             )
+        else:
+            variant = speed_variant(entry.default_audio, new_speed, builder)
+            # Cache entry is copied, it must not become the stored blob
+            with temp_copy(variant) as audio:
+                entry.audio.save(name, audio, save=False)
         entry.playing_speed = Decimal.from_float(new_speed)
-        entry.save()
+        entry.save()  # Previous audio is removed by django_cleanup
         return Response(
             RecordSerializer(entry).data,
-            status=201
+            status=200
         )
 
     @staticmethod
@@ -138,24 +189,20 @@ class UpdateRecordView(APIView):
             converted: Any,
             entry: AudioRecord
     ) -> None:
-        """ Update existing audio record """
+        """ Update existing audio record (model is saved by the caller) """
         with converted as converted_:
-            content = converted_.read()
-            entry.audio.save(
-                f'{entry.name}_{datetime.now()}.wav',
-                ContentFile(content)
-            )
+            content = ContentFile(converted_.read())
             if origin == converted:
-                entry.default_audio.save(
-                    f'{entry.name}_{datetime.now()}-default.wav',
-                    ContentFile(content)
-                )
+                default_content = None
             else:
                 with origin as origin_:
-                    entry.default_audio.save(
-                        f'{entry.name}_{datetime.now()}-default.wav',
-                        ContentFile(origin_.read())
-                    )
+                    default_content = ContentFile(origin_.read())
+            entry.save_audio(
+                f'{entry.name}_{datetime.now()}.wav',
+                content,
+                f'{entry.name}_{datetime.now()}-default.wav',
+                default_content
+            )
 
     @wrap_error
     def post(
@@ -180,14 +227,15 @@ class UpdateRecordView(APIView):
             AudioRecord.objects.filter(related_project__slug__exact=project),
             pk=primary_key
         )
+        # Warming of the same draft is useless after the save
+        draft_warmer().cancel((project, entry.pk))
         source = Source.objects.get(pk=data['tts'])
         if source.id == 1:
             builder = YSKTTSMixin()
         else:
             builder = CRTTTSMixin()
-        if len(data) == 2:
-            if 'speed' in data:
-                self._speed_update(entry, data, builder)
+        if self._is_speed_only(entry, data):
+            return self._speed_update(entry, data, builder)
 
         presets = self._build_presets(model_to_dict(entry), data)
         text = presets.pop('text')
@@ -198,6 +246,7 @@ class UpdateRecordView(APIView):
 
         self._save_updated_audio(origin, converted, entry)
         self._update_record(entry, text, source, presets)
+        prewarm_speed_variants(entry.default_audio, builder)
         return Response(
             RecordSerializer(entry).data,
             status=200
@@ -222,6 +271,14 @@ class _MakeRecordBaseView(generics.CreateAPIView):
         """ Interface for getting right source (synthesis) """
         raise NotImplementedError()
 
+    @staticmethod
+    def _duplicate_error() -> ValidationError:
+        """ Error for the name which is already taken in the project """
+        return ValidationError(
+            {'name': 'This name already exists'},
+            code='400',
+        )
+
     @wrap_error
     def create(
             self,
@@ -235,13 +292,11 @@ class _MakeRecordBaseView(generics.CreateAPIView):
         project = IntegrationProject.objects.get(
             slug=self.kwargs['project']
         )
+        # Cheap index lookup, saves paid TTS call for the known duplicate
         if AudioRecord.objects.filter(related_project=project,
                                       name=data['name']
                                       ).exists():
-            raise ValidationError(
-                {'name': 'This name already exists'},
-                code='400',
-            )
+            raise self._duplicate_error()
 
         origin, converted = self.convert_text_to_sound_via_tts_service(
             text,
@@ -259,23 +314,28 @@ class _MakeRecordBaseView(generics.CreateAPIView):
         if emote:
             record.emote = emote
         with converted as converted_:
-            record.audio.save(
-                f'{data["name"]}.wav',
-                ContentFile(converted_.read())
-            )
+            content = ContentFile(converted_.read())
             if origin == converted:
-                record.default_audio.save(
-                    f'{data["name"]}-default.wav',
-                    ContentFile(converted_.read())
-                )
+                default_content = None
             else:
                 with origin as origin_:
-                    record.default_audio.save(
-                        f'{data["name"]}-default.wav',
-                        ContentFile(origin_.read())
-                    )
+                    default_content = ContentFile(origin_.read())
+            record.stage_audio(
+                f'{data["name"]}.wav',
+                content,
+                f'{data["name"]}-default.wav',
+                default_content
+            )
 
-        record.save()
+        try:
+            with transaction.atomic():
+                record.save()
+        except IntegrityError:
+            # Concurrent request won the (related_project, name) race
+            record.discard_audio()
+            raise self._duplicate_error()
+        record.save(update_fields=record.publish_audio())
+        prewarm_speed_variants(record.default_audio, self)
         return Response(
             RecordSerializer(record).data,
             status=201,
@@ -316,23 +376,29 @@ class FileImportView(APIView):
         }
         presets['project'] = project
         try:
-            exceptions = FileParserWithAudioCreation(
+            parser = FileParserWithAudioCreation(
                 self.request.data['export-file'],
                 presets
-            ).parse()
+            )
+            exceptions = parser.parse()
         except ReadUserDataFileError as error_str:
             return Response(
                 data=json.dumps({'file': f'{str(error_str)}. Check examples'}),
                 status=400,
                 headers={'content-type': 'application/json'}
             )
+        # Amounts of the rows, synthesized and repeated phrases
+        stats = {
+            f'X-Import-{key.capitalize()}': str(value)
+            for key, value in parser.stats.items()
+        }
         if exceptions:
             return Response(
                 status=205,
                 data=json.dumps(exceptions),
-                headers={'content-type': 'application/json'}
+                headers={'content-type': 'application/json', **stats}
             )
-        return Response(status=204)
+        return Response(status=204, headers=stats)
 
 
 class ImportOwnFilesView(APIView):
@@ -361,3 +427,175 @@ class ImportOwnFilesView(APIView):
             if success:
                 data['success'].append(success)
         return Response(status=200, data=data)
+
+
+class SpeedPreviewView(APIView):
+    """ Record audio with the other playing speed (record is not changed) """
+
+    permission_classes = (AllowAny,)
+
+    def get(
+            self,
+            request: Request,
+            project: str,
+            primary_key: int,
+            *_args: Any,
+            **_kwargs: Any
+    ) -> HttpResponse:
+        """ Answer with the cached speed variant of the default audio """
+        try:
+            speed = variant_speed(request.query_params['speed'])
+        except (KeyError, ValueError):
+            raise ValidationError({'speed': 'Number is required'}, code='400')
+        if not 0.1 <= speed <= 3:
+            raise ValidationError({'speed': 'Chosen speed is unavailable'})
+        entry: AudioRecord = get_object_or_404(
+            AudioRecord.objects.filter(related_project__slug__exact=project),
+            pk=primary_key
+        )
+        if not entry.default_audio:
+            raise NotFound('Record has no audio')
+        if speed == 1.0:
+            path = entry.default_audio.path
+        else:
+            path = speed_variant(
+                entry.default_audio,
+                speed,
+                SoxTransformerMixin()
+            )
+        response = send_file(
+            path,
+            content_type='audio/wav',
+            attachment=False,
+            request=request
+        )
+        # Variant of the same default audio never changes
+        patch_cache_control(response, private=True, max_age=3600)
+        return response
+
+
+class WarmDraftView(APIView):
+    """ Speculative synthesis of the draft being edited (nothing is saved)
+
+    Notes:
+        Form state is sent on every edit, the synthesis starts only after
+        DRAFT_WARM_DELAY seconds without edits. Audio of the current voice
+        and emotion is cached with the current and SPEED_VARIANTS_PREWARM
+        speeds, so the save of the draft makes no backend call
+    """
+
+    permission_classes = (AllowAny,)
+
+    def post(
+            self,
+            request: Request,
+            project: str,
+            primary_key: int,
+            *_args: Any,
+            **_kwargs: Any
+    ) -> Response:
+        """ Schedule the warming of the synthesis cache """
+        if project != settings.MANUAL_EDIT_SLUG:
+            raise NotFound('Only drafts are synthesized in advance')
+        entry: AudioRecord = get_object_or_404(
+            AudioRecord.objects.filter(related_project__slug__exact=project),
+            pk=primary_key
+        )
+        data: Dict[str, Any] = request.data
+        text = str(data.get('text') or '').strip()
+        if not text:
+            raise ValidationError({'text': 'Text is required'})
+        try:
+            source = Source.objects.get(pk=data['tts'])
+        except (KeyError, ValueError, Source.DoesNotExist):
+            raise ValidationError({'tts': 'Unknown TTS source'})
+        try:
+            speed = float(data.get('speed', entry.playing_speed))
+        except (TypeError, ValueError):
+            raise ValidationError({'speed': 'Number is required'})
+        # Bounds of the record speed (NaN is refused as well), SoX gets it
+        if not 0.1 <= speed <= 3:
+            raise ValidationError(
+                {'speed': 'Speed should be between 0.1 and 3'}
+            )
+        if source.id == 1:
+            builder = YSKTTSMixin()
+        else:
+            builder = CRTTTSMixin()
+        presets = {
+            'voice': data.get('voice', entry.voice),
+            'emotion': data.get('emotion', entry.emote),
+            'speed': speed,
+        }
+        draft_warmer().schedule(
+            (project, entry.pk),
+            builder,
+            text,
+            presets,
+            (speed, *settings.SPEED_VARIANTS_PREWARM)
+        )
+        return Response(status=202)
+
+
+class PreviewView(APIView):
+    """ Compressed record audio for playback in the browser """
+
+    permission_classes = (AllowAny,)
+
+    def get(
+            self,
+            request: Request,
+            project: str,
+            primary_key: int,
+            *_args: Any,
+            **_kwargs: Any
+    ) -> HttpResponse:
+        """ Answer with the preview (304 if client has the same one) """
+        entry: AudioRecord = get_object_or_404(
+            AudioRecord.objects.filter(related_project__slug__exact=project),
+            pk=primary_key
+        )
+        if not entry.audio:
+            raise NotFound('Record has no audio')
+        path, etag = audio_preview(entry.audio)
+        etag = f'"{etag}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = send_file(
+                path,
+                content_type=PREVIEW_CONTENT_TYPE,
+                attachment=False,
+                request=request
+            )
+        response['ETag'] = etag
+        # URL is versioned by the record modification time
+        patch_cache_control(response, private=True, max_age=86400)
+        return response
+
+
+class DownloadAudioView(APIView):
+    """ Original (PCM) record audio as the attachment """
+
+    permission_classes = (AllowAny,)
+
+    def get(
+            self,
+            request: Request,
+            project: str,
+            primary_key: int,
+            *_args: Any,
+            **_kwargs: Any
+    ) -> HttpResponse:
+        """ File is sent by nginx, after the record lookup """
+        entry: AudioRecord = get_object_or_404(
+            AudioRecord.objects.filter(related_project__slug__exact=project),
+            pk=primary_key
+        )
+        if not entry.audio:
+            raise NotFound('Record has no audio')
+        return send_file(
+            entry.audio.path,
+            filename=f'{entry.name}.wav',
+            content_type='audio/wav',
+            request=request
+        )
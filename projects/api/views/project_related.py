@@ -3,6 +3,10 @@ from rest_framework import generics
 from rest_framework.permissions import AllowAny
 
 from projects.models import IntegrationProject
+from projects.api.conditions import (
+    conditional_listing,
+    projects_listing_state,
+)
 from projects.api.serializers import (
     IntegrationProjectSerializer,
 )
@@ -18,11 +22,16 @@ __all__ = (
 class GetProjectsView(generics.ListAPIView):
     """ Basic list of integration projects (internal use) """
 
-    queryset = IntegrationProject.objects.all().exclude(
+    queryset = IntegrationProject.objects.with_totals().exclude(
         slug=settings.MANUAL_EDIT_SLUG
     )
     serializer_class = IntegrationProjectSerializer
 
+    @conditional_listing(projects_listing_state)
+    def get(self, request, *args, **kwargs):
+        """ Answer 304 if none of the projects were changed """
+        return super().get(request, *args, **kwargs)
+
 
 class MakeProjectView(generics.CreateAPIView):
     """ Create project in the system """
@@ -0,0 +1,71 @@
+from typing import Any, Dict, Iterator, List
+
+from django.core.management.base import BaseCommand
+from django.db.models import QuerySet
+
+from projects.models import AudioRecord
+from projects.models.audiorecord import SUMMARY_FIELDS
+from projects.utils.freshness import batched_project_touch, touch_project
+
+
+class Command(BaseCommand):
+    help = 'Fill audio metadata (duration, size, hash, etc.) of the records'
+
+    batch_size = 500
+
+    summary_fields = SUMMARY_FIELDS
+
+    def add_arguments(self, parser):  # type: (Any) -> None
+        """ Create arguments for command """
+        parser.add_argument(
+            '--project',
+            action='append',
+            dest='projects',
+            help='Slug of the project to process (may be repeated)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            dest='overwrite',
+            help='Remake existing summaries as well'
+        )
+
+    def _queryset(self, options):  # type: (Dict[str, Any]) -> QuerySet
+        """ Records to process """
+        queryset = AudioRecord.objects.exclude(audio='').exclude(audio=None)
+        if options['projects']:
+            queryset = queryset.filter(
+                related_project__slug__in=options['projects']
+            )
+        if not options['overwrite']:
+            queryset = queryset.filter(audio_hash='')  # Never processed
+        return queryset.order_by('pk')
+
+    def _batches(self, queryset):
+        # type: (QuerySet) -> Iterator[List[AudioRecord]]
+        """ Split records to the lists of batch_size """
+        batch = []
+        for record in queryset.iterator(chunk_size=self.batch_size):
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _execute(self, options):  # type: (Dict[str, Any]) -> int
+        """ Operation to perform in handle() hook """
+        processed = 0
+        with batched_project_touch():
+            for batch in self._batches(self._queryset(options)):
+                for record in batch:
+                    record.update_summary()
+                    touch_project(record.related_project_id)  # New payload
+                AudioRecord.objects.bulk_update(batch, self.summary_fields)
+                processed += len(batch)
+        return processed
+
+    def handle(self, *args, **options):  # type: (Any, Any) -> None
+        """ Command hook (used only for creating fancy output) """
+        processed = self._execute(options)
+        self.stdout.write(f'{processed} record(s) processed')
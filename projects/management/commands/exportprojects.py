@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import time
+
+from typing import Any, Dict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.mixins.imed_based import ZipFileMediaBuildMixin
+from projects.models import IntegrationProject
+from projects.utils.exports import BulkArchive
+
+
+class Command(BaseCommand):
+    help = 'Pack the media builds of several projects into single ZIP'
+
+    started = 0.0
+
+    def add_arguments(self, parser):  # type: (Any) -> None
+        """ Create arguments for command """
+        parser.add_argument(
+            '--project',
+            action='append',
+            dest='projects',
+            help='Slug of the project to export (may be repeated)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            dest='all_projects',
+            help='Export every project'
+        )
+        parser.add_argument(
+            '--output',
+            required=True,
+            help='Path of the resulting archive'
+        )
+        parser.add_argument(
+            '--build-path',
+            help='Directory where Sound objects are stored (.imed)'
+        )
+        parser.add_argument(
+            '--compression',
+            help='Compression as "method[:level]" (see zipbench command)'
+        )
+        parser.add_argument(
+            '--split',
+            action='store_true',
+            help='Put the archive of every project instead of its files'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Amount of the parallel SoX conversions'
+        )
+        parser.add_argument(
+            '--imed',
+            action='store_true',
+            help='Write only the .imed file (single project)'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            dest='as_json',
+            help='Print machine-readable summary (progress goes to stderr)'
+        )
+
+    @staticmethod
+    def _projects(options):  # type: (Dict[str, Any]) -> Any
+        """ Projects to export """
+        if options['all_projects']:
+            return list(IntegrationProject.objects.all())
+        if not options['projects']:
+            raise CommandError('Choose projects with --project or --all')
+        slugs = set(options['projects'])
+        projects = list(IntegrationProject.objects.filter(slug__in=slugs))
+        missing = slugs - {project.slug for project in projects}
+        if missing:
+            raise CommandError(
+                f'Cannot find projects: {", ".join(sorted(missing))}'
+            )
+        return projects
+
+    def _progress(self, slug):  # type: (str) -> None
+        """ Report every packed project """
+        self.packed.append(
+            {'project': slug, 'seconds': self._elapsed()}
+        )
+        self.stderr.write(
+            f'[{len(self.packed)}] {slug} is packed '
+            f'({self.packed[-1]["seconds"]:.3f}s)'
+        )
+
+    def _elapsed(self):  # type: () -> float
+        """ Seconds since the start of the export """
+        return round(time.perf_counter() - self.started, 3)
+
+    def _write_imed(self, projects, options):
+        # type: (Any, Dict[str, Any]) -> None
+        """ Write .imed file of the single project """
+        if len(projects) != 1:
+            raise CommandError('Exactly one project is required for --imed')
+        builder = ZipFileMediaBuildMixin()
+        records = projects[0].audiorecord_set.all().exclude(audio='')
+        with builder.create_imed(records, options['build_path']) as imed:
+            shutil.copyfile(imed.name, options['output'])
+        self._progress(projects[0].slug)
+
+    def _write_archive(self, projects, options):
+        # type: (Any, Dict[str, Any]) -> bool
+        """ Write the archive of the projects (True if it was cached) """
+        try:
+            archive = BulkArchive(
+                projects,
+                ZipFileMediaBuildMixin(),
+                options['build_path'],
+                options['compression'],
+                options['split'],
+                options['workers'],
+                progress=self._progress
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+        cached = os.path.isfile(archive.path)
+        shutil.copyfile(archive.get_or_build(), options['output'])
+        return cached
+
+    def _execute(self, options):  # type: (Dict[str, Any]) -> Dict[str, Any]
+        """ Operation to perform in handle() hook """
+        self.started = time.perf_counter()
+        self.packed = []
+        projects = self._projects(options)
+        cached = False
+        try:
+            if options['imed']:
+                self._write_imed(projects, options)
+            else:
+                cached = self._write_archive(projects, options)
+        except OSError as error:
+            raise CommandError(f'Export is interrupted: {error}')
+        return {
+            'output': options['output'],
+            'size': os.path.getsize(options['output']),
+            'cached': cached,
+            'projects': self.packed,
+            'seconds': self._elapsed(),
+        }
+
+    def handle(self, *args, **options):  # type: (Any, Any) -> None
+        """ Command hook (used only for creating fancy output) """
+        summary = self._execute(options)
+        if options['as_json']:
+            self.stdout.write(json.dumps(summary))
+            return
+        self.stdout.write(
+            f'{summary["output"]} is written ({summary["size"]} byte(s)) '
+            f'in {summary["seconds"]:.3f}s'
+        )
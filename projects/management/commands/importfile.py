@@ -0,0 +1,132 @@
+import json
+import os
+import time
+
+from typing import Any, Dict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.models import IntegrationProject
+from projects.utils import exceptions
+from projects.utils.storage import TempFile
+from projects.utils.tasks import FileParserWithAudioCreation
+
+
+class Command(BaseCommand):
+    help = 'Synthesize audio records from the data file (csv, xls, imed)'
+
+    progress_step = 100
+
+    processed = 0
+
+    # Amount of progress_step boundaries already reported
+    reported = 0
+
+    def add_arguments(self, parser):  # type: (Any) -> None
+        """ Create arguments for command """
+        parser.add_argument('path', help='Data file with ID and TEXT rows')
+        parser.add_argument(
+            '--project',
+            required=True,
+            help='Slug of the project to fill'
+        )
+        parser.add_argument('--voice', required=True, help='TTS voice')
+        parser.add_argument(
+            '--emotion',
+            default='neutral',
+            help='TTS emotion (default: neutral)'
+        )
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=1.0,
+            help='Playing speed (default: 1.0)'
+        )
+        parser.add_argument(
+            '--source',
+            type=int,
+            default=1,
+            help='ID of the TTS source (default: 1)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Amount of the parallel TTS requests'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            dest='as_json',
+            help='Print machine-readable summary (progress goes to stderr)'
+        )
+
+    def _progress(self, done, failed):  # type: (int, int) -> None
+        """ Report every progress_step rows
+
+        Notes:
+            Rows are done by groups, so the report is made once the
+            boundary is crossed, not only when it is hit exactly
+
+        """
+        self.processed = done
+        steps = done // self.progress_step
+        if steps > self.reported:
+            self.reported = steps
+            self.stderr.write(f'{done} row(s) processed, {failed} failed')
+
+    def _execute(self, options):  # type: (Dict[str, Any]) -> Dict[str, Any]
+        """ Operation to perform in handle() hook """
+        if not os.path.isfile(options['path']):
+            raise CommandError(f'Cannot find file - {options["path"]}')
+        if not IntegrationProject.objects.filter(
+                slug=options['project']
+        ).exists():
+            raise CommandError(f'Cannot find project - {options["project"]}')
+        presets = {
+            'project': options['project'],
+            'voice': options['voice'],
+            'emotion': options['emotion'],
+            'speed': options['speed'],
+            'source': options['source'],
+        }
+        started = time.perf_counter()
+        with TempFile(open(options['path'], 'rb')) as data_file:
+            try:
+                parser = FileParserWithAudioCreation(
+                    data_file,
+                    presets,
+                    workers=options['workers'],
+                    progress=self._progress
+                )
+                failed = parser.parse()
+            except (
+                    exceptions.ReadUserDataFileError,
+                    exceptions.FileUploadParseError
+            ) as error:
+                raise CommandError(str(error))
+        seconds = time.perf_counter() - started
+        return {
+            'project': options['project'],
+            'file': options['path'],
+            'processed': self.processed,
+            'failed': len(failed),
+            'errors': failed,
+            **parser.stats,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.processed / seconds, 3),
+        }
+
+    def handle(self, *args, **options):  # type: (Any, Any) -> None
+        """ Command hook (used only for creating fancy output) """
+        summary = self._execute(options)
+        if options['as_json']:
+            self.stdout.write(json.dumps(summary))
+            return
+        for error in summary['errors']:
+            self.stderr.write(error)
+        self.stdout.write(
+            f'{summary["processed"]} row(s) processed, '
+            f'{summary["failed"]} failed. '
+            f'{summary.get("deduplicated", 0)} repeated phrase(s) reused. '
+            f'Done in {summary["seconds"]:.3f}s'
+        )
@@ -0,0 +1,91 @@
+import os
+from typing import Any, Dict, Iterator, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.utils.storage import DeduplicatingStorage
+
+
+class Command(BaseCommand):
+    help = 'Move media records into content-addressed (deduplicated) storage'
+
+    roots_prefix = 'records'
+
+    def add_arguments(self, parser):  # type: (Any) -> None
+        """ Create arguments for command """
+        parser.add_argument(
+            '--root',
+            action='append',
+            dest='roots',
+            help=(
+                'Media directory to migrate (may be repeated). '
+                f'Default: every "{self.roots_prefix}*" directory'
+            )
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count duplicates, do not change anything'
+        )
+        parser.add_argument(
+            '--skip-gc',
+            action='store_true',
+            help='Do not delete unreferenced blobs'
+        )
+
+    def _iter_names(self, storage, roots):
+        # type: (DeduplicatingStorage, Any) -> Iterator[str]
+        """ Walk through files of the given media directories """
+        if not roots:
+            roots = [
+                name for name in os.listdir(storage.location)
+                if name.startswith(self.roots_prefix)
+            ]
+        for root in roots:
+            if not os.path.isdir(storage.path(root)):
+                raise CommandError(f'Cannot find "{root}" in media root')
+            for dir_, _, files in os.walk(storage.path(root)):
+                for file_name in files:
+                    yield os.path.relpath(
+                        os.path.join(dir_, file_name),
+                        storage.location
+                    )
+
+    def _execute(self, storage, options):
+        # type: (DeduplicatingStorage, Dict[str, Any]) -> Tuple[int, int]
+        """ Operation to perform in handle() hook """
+        files, freed = 0, 0
+        seen: Dict[str, int] = {}
+        for name in self._iter_names(storage, options['roots']):
+            files += 1
+            if options['dry_run']:
+                digest = storage.file_digest(name)
+                stat = os.stat(storage.path(name))
+                if seen.setdefault(digest, stat.st_ino) != stat.st_ino:
+                    freed += stat.st_size
+            else:
+                freed += storage.adopt(name)
+        return files, freed
+
+    def handle(self, *args, **options):  # type: (Any, Any) -> None
+        """ Command hook (used only for creating fancy output) """
+        storage = DeduplicatingStorage()
+        if not os.path.isdir(storage.location):
+            raise CommandError(
+                f'Cannot find media root - {storage.location}'
+            )
+        try:
+            files, freed = self._execute(storage, options)
+        except OSError as error:
+            raise CommandError(f'Migration is interrupted: {error}')
+        verb = 'may be' if options['dry_run'] else 'were'
+        self.stdout.write(
+            f'{files} file(s) processed. {freed} byte(s) {verb} freed'
+        )
+        if options['dry_run'] or options['skip_gc']:
+            return
+        deleted, released = storage.collect_garbage()
+        self.stdout.write(
+            f'{deleted} unreferenced blob(s) deleted. '
+            f'{released} byte(s) released'
+        )
@@ -0,0 +1,113 @@
+import tempfile
+import time
+
+from typing import Any, Dict, Iterator, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.mixins.imed_based import ZipFileMediaBuildMixin
+from projects.models import IntegrationProject
+from projects.utils.exports import ProjectArchive, parse_compression
+
+
+class Command(BaseCommand):
+    help = 'Compare time and size of the project archives per compression'
+
+    default_compressions = (
+        'stored',
+        'deflated:1',
+        'deflated:6',
+        'deflated:9',
+        'bzip2:9',
+        'lzma',
+    )
+
+    def add_arguments(self, parser):  # type: (Any) -> None
+        """ Create arguments for command """
+        parser.add_argument(
+            '--project',
+            action='append',
+            dest='projects',
+            required=True,
+            help='Slug of the project to pack (may be repeated)'
+        )
+        parser.add_argument(
+            '--compression',
+            action='append',
+            dest='compressions',
+            help=(
+                'Compression as "method[:level]" (may be repeated). '
+                f'Default: {", ".join(self.default_compressions)}'
+            )
+        )
+        parser.add_argument(
+            '--build-path',
+            help='Directory where Sound objects are stored (.imed)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1,
+            help='Amount of runs per compression (best one is reported)'
+        )
+
+    @staticmethod
+    def _pack(archive, repeat):
+        # type: (ProjectArchive, int) -> Tuple[float, int]
+        """ Best time of packing and size of the archive """
+        best = None
+        for _ in range(max(repeat, 1)):
+            with tempfile.TemporaryFile() as stream:
+                started = time.perf_counter()
+                archive.pack(stream)
+                elapsed = time.perf_counter() - started
+                size = stream.tell()
+            best = elapsed if best is None else min(best, elapsed)
+        return best, size
+
+    def _execute(self, options):
+        # type: (Dict[str, Any]) -> Iterator[Tuple[str, str, float, int]]
+        """ Operation to perform in handle() hook """
+        compressions = options['compressions'] or self.default_compressions
+        for compression in compressions:
+            try:
+                parse_compression(compression)
+            except ValueError as error:
+                raise CommandError(str(error))
+        builder = ZipFileMediaBuildMixin()
+        for slug in options['projects']:
+            try:
+                project = IntegrationProject.objects.get(slug=slug)
+            except IntegrationProject.DoesNotExist:
+                raise CommandError(f'Cannot find project - {slug}')
+            # Warm-up, so SoX conversions are not measured
+            self._pack(
+                ProjectArchive(project, builder, options['build_path']),
+                1
+            )
+            for compression in compressions:
+                elapsed, size = self._pack(
+                    ProjectArchive(
+                        project,
+                        builder,
+                        options['build_path'],
+                        compression
+                    ),
+                    options['repeat']
+                )
+                yield slug, compression, elapsed, size
+
+    def handle(self, *args, **options):  # type: (Any, Any) -> None
+        """ Command hook (used only for creating fancy output) """
+        self.stdout.write(
+            f'{"project":<24} {"compression":<12} '
+            f'{"seconds":>9} {"bytes":>12} {"ratio":>6}'
+        )
+        baseline = {}
+        for slug, compression, elapsed, size in self._execute(options):
+            # Ratio to the first measured compression of the project
+            base = baseline.setdefault(slug, size) or 1
+            self.stdout.write(
+                f'{slug:<24} {compression:<12} '
+                f'{elapsed:>9.3f} {size:>12} {size / base:>6.2f}'
+            )
@@ -0,0 +1,17 @@
+""" Request-level middleware for the projects app """
+from typing import Callable
+
+from django.http import HttpRequest, HttpResponse
+
+from projects.utils.freshness import batched_project_touch
+
+
+class BatchedProjectTouchMiddleware(object):
+    """ Update last_updated of changed projects once per request """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with batched_project_touch():
+            return self.get_response(request)
@@ -0,0 +1,54 @@
+from django.core.files.storage import default_storage
+from django.db import migrations
+from django.db.models import Count, Min, Q
+
+
+def remove_duplicates(apps, _schema_editor):
+    """ Python OP to erase duplicating records before unique index creation
+
+    Args:
+        apps: Registered apps in the system
+        _schema_editor: Schema of the DB used
+
+    Notes:
+        Earliest record (lowest PK) is the one that stays in the project.
+        Audio of the removed records is deleted, unless the kept records
+        refer to the same files (django_cleanup does not watch the
+        historical models)
+
+    """
+    AUDIO_RECORD = apps.get_model('projects', 'AudioRecord')
+    # Default ordering of the model would be added to the GROUP BY
+    duplicates = AUDIO_RECORD.objects.order_by().values(
+        'related_project', 'name'
+    ).annotate(
+        amount=Count('pk'), keep=Min('pk')
+    ).filter(amount__gt=1)
+    files = set()
+    for duplicate in duplicates:
+        removed = AUDIO_RECORD.objects.filter(
+            related_project=duplicate['related_project'],
+            name=duplicate['name'],
+        ).exclude(pk=duplicate['keep'])
+        for names in removed.values_list('audio', 'default_audio'):
+            files.update(name for name in names if name)
+        removed.delete()
+    for name in files:
+        if not AUDIO_RECORD.objects.filter(
+                Q(audio=name) | Q(default_audio=name)
+        ).exists():
+            default_storage.delete(name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_auto_20191022_1343'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicates,
+            migrations.RunPython.noop
+        ),
+    ]
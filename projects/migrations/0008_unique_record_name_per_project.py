@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:13
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_remove_duplicating_records'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='audiorecord',
+            unique_together={('related_project', 'name')},
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:29
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_unique_record_name_per_project'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiorecord',
+            name='duration',
+            field=models.FloatField(editable=False, null=True, verbose_name='Duration of the audio (sec)'),
+        ),
+        migrations.AddField(
+            model_name='audiorecord',
+            name='waveform_peaks',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.SmallIntegerField(), blank=True, default=list, editable=False, size=None, verbose_name='Waveform peaks of the audio'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_audio_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiorecord',
+            name='audio_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='SHA-256 of the audio file'),
+        ),
+        migrations.AddField(
+            model_name='audiorecord',
+            name='audio_size',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Size of the audio file (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='audiorecord',
+            name='sample_count',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Amount of the audio samples'),
+        ),
+    ]
@@ -3,10 +3,9 @@ import re
 import string
 import tempfile
 
-import lxml.builder as xml_bld
-import zipfile
+from typing import Any, Iterable, Iterator
 
-from io import BytesIO
+import lxml.builder as xml_bld
 
 from lxml import etree  # NO QA
 from django.http import HttpResponse
@@ -16,6 +15,12 @@ from projects.mixins.sound_based import (
     SoxTransformerMixin as SoundChangerMixin,
 )
 from projects.models import IntegrationProject
+from projects.utils.downloads import send_file, send_stream
+from projects.utils.exports import BulkArchive, ProjectArchive
+
+SPACES_REGEXP = re.compile(' +')
+
+CURSOR_CHUNK_SIZE = 2000
 
 
 class ImedBuilderMixin(object):
@@ -65,53 +70,64 @@ class ImedBuilderMixin(object):
         Returns:
             TempFile: Instance with the .imed content (xml file)
 
+        Notes:
+            Sounds are written incrementally while iterating over the DB
+            cursor, so memory consumption doesn't depend on the records amount
+
         """
         path_to_build = './client/{project}/audio/{filename}'
         alternative_path = '{path}{filename}'
+        if build_path:
+            build_path = self._escape_string_for_path(build_path)
+        slugs = dict(
+            IntegrationProject.objects.filter(
+                pk__in=audio_cursor.values('related_project')
+            ).values_list('pk', 'slug')
+        )
+        rows = audio_cursor.values_list(
+            'name', 'text', 'related_project'
+        ).iterator(chunk_size=CURSOR_CHUNK_SIZE)
         t_file = tempfile.NamedTemporaryFile()
-        xml_content = xml_bld.E.Voice(
-            xml_bld.E.BaseProduct(
-                name='./base.imed'
-            ),
-            xml_bld.E.Langs(
-              xml_bld.E.Lang(
-                  name='ru', description=u'Русский'
-              )
-            ),
-            xml_bld.E.Sounds(
-                *[
-                    xml_bld.E.Sound(
-                        name=entry.name,
-                        file=path_to_build.format(
-                            filename=f'{entry.name}.raw',
-                            project=entry.related_project.slug.replace(
-                                '-', '_'
+        with etree.xmlfile(t_file.name, encoding='UTF-8') as xml_file:
+            xml_file.write_declaration(standalone=True)
+            with xml_file.element('Voice', schema='1', version='Multy'):
+                xml_file.write(
+                    '\n  ',
+                    xml_bld.E.BaseProduct(name='./base.imed'),
+                    '\n  ',
+                )
+                with xml_file.element('Langs'):
+                    xml_file.write(
+                        '\n    ',
+                        xml_bld.E.Lang(name='ru', description=u'Русский'),
+                        '\n  ',
+                    )
+                xml_file.write('\n  ')
+                with xml_file.element('Sounds'):
+                    for name, text, project_pk in rows:
+                        xml_file.write(
+                            '\n    ',
+                            xml_bld.E.Sound(
+                                name=name,
+                                file=path_to_build.format(
+                                    filename=f'{name}.raw',
+                                    project=slugs[project_pk].replace(
+                                        '-', '_'
+                                    )
+                                )
+                                if not build_path
+                                else alternative_path.format(
+                                    path=build_path,
+                                    filename=f'{name}.raw'
+                                ),
+                                description="".join([
+                                    SPACES_REGEXP.sub(' ', x)
+                                    for x in text.splitlines()
+                                ])
                             )
                         )
-                        if not build_path
-                        else alternative_path.format(
-                            path=self._escape_string_for_path(build_path),
-                            filename=f'{entry.name}.raw'
-                        ),
-                        description="".join([
-                            re.sub(' +', ' ', x)
-                            for x in entry.text.splitlines()
-                        ])
-                    ) for entry in audio_cursor
-                ]
-            ),
-            schema='1', version='Multy'
-        )
-        #
-        with open(t_file.name, 'wb') as f:
-            f.write(etree.tostring(
-                xml_content,
-                pretty_print=True,
-                encoding='UTF-8',
-                standalone='yes',
-                xml_declaration=True,
-            ))
-        #
+                    xml_file.write('\n  ')
+                xml_file.write('\n')
         return t_file
 
 
@@ -122,67 +138,103 @@ class ZipFileMediaBuildMixin(SoundChangerMixin, ImedBuilderMixin):
     def create_and_send_a_zip(
             self,
             project: IntegrationProject,
-            build_path: str = None
+            build_path: str = None,
+            compression: str = None
     ) -> HttpResponse:
-        """ Creating a ZIP in memory using BytesIO and zipfile libraries
+        """ Creating a ZIP (or reusing the cached one) and sending it
 
         Args:
             project: IntegrationProject DB record with its _set manager
             build_path: directory where Sound object are stored (for .imed)
+            compression: "method[:level]" of the archive entries
 
         Returns:
             HttpResponse: Django Http object. In our case this is the response
                           with the MIME type of zip archive, so browser will
                           start download automatically
 
+        Notes:
+            Archive is cached in the EXPORTS_ROOT (until the project is
+            changed) and sent by nginx
+
         """
-        cursor = project.audiorecord_set.all().exclude(audio='')
-        if not cursor.exists():
+        try:
+            archive = ProjectArchive(project, self, build_path, compression)
+        except ValueError as error:
+            return HttpResponse(status=400, content=str(error))
+        if not archive.records().exists():
             return HttpResponse(content='NO AUDIO RECORDS!', status=404)
+        return self._send_archive(archive)
 
-        wav_files = [record.audio.file for record in cursor]
-        wav_filenames = [audio.name for audio in cursor]
-        raw_files = []
+    def create_and_send_a_bulk_zip(
+            self,
+            projects: Iterable[IntegrationProject],
+            build_path: str = None,
+            compression: str = None,
+            split: bool = False
+    ) -> HttpResponse:
+        """ Creating a ZIP of several projects (or reusing the cached one)
 
-        zip_name = f'cc_{project.slug.replace("-", "_")}_audio_loadout.zip'
-        stream = BytesIO()
-        zip_subdir = 'audio'
-        zip_file = zipfile.ZipFile(stream, 'w')
+        Args:
+            projects: IntegrationProject DB records
+            build_path: directory where Sound object are stored (for .imed)
+            compression: "method[:level]" of the archive entries
+            split: put the archive of every project instead of its files
 
-        for cursor_file in wav_files:
-            raw_files.append(
-                self.convert_audio_type_format(cursor_file)
+        Returns:
+            HttpResponse: Response with the single zip archive
+
+        Notes:
+            Projects share the conversion pool and the raw audio cache, so
+            it is much faster than the separate downloads. Archive that is
+            not built yet is streamed while it is being built (and stored
+            for the next downloads), so the request does not wait for the
+            whole archive
+
+        """
+        try:
+            archive = BulkArchive(
+                projects,
+                self,
+                build_path,
+                compression,
+                split
             )
-        #
-        if len(wav_filenames) != len(raw_files):
-            #
+        except ValueError as error:
+            return HttpResponse(status=400, content=str(error))
+        if not any(item.records().exists() for item in archive.archives):
+            return HttpResponse(content='NO AUDIO RECORDS!', status=404)
+        if os.path.isfile(archive.path):
+            return self._send_archive(archive)
+        return send_stream(
+            self._stream_archive(archive),
+            filename=archive.name,
+            content_type='application/x-zip-compressed'
+        )
+
+    def _stream_archive(self, archive: Any) -> Iterator[bytes]:
+        """ Content of the archive that is being built """
+        try:
+            yield from archive.iter_build()
+        except OSError:
+            # Response is already started, so the archive is cut
+            self.logger.exception('Cannot retrieve all audio records')
+            raise
+
+    def _send_archive(self, archive: Any) -> HttpResponse:
+        """ Build the archive if it is changed and send it """
+        try:
+            path = archive.get_or_build()
+        except OSError:
+            self.logger.exception('Cannot retrieve all audio records')
             return HttpResponse(
                 status=404,
                 content='Cannot retrieve all audio records'
             )
 
-        for file_idx, file in enumerate(raw_files):
-            archive_name = f'{wav_filenames[file_idx]}.raw'
-            zip_path = os.path.join(str(zip_subdir), archive_name)
-            with file as file_:
-                zip_file.write(str(file_.name), str(zip_path))
-
-        temp_imed_file = self.create_imed(cursor, build_path)
-        with temp_imed_file as tmp_imed:
-            zip_file.write(
-                tmp_imed.name,
-                os.path.join(
-                    zip_subdir,
-                    f'{cursor.first().related_project.slug}.imed'
-                )
-            )
-
-        zip_file.close()
-
-        resp = HttpResponse(
-            stream.getvalue(),
-            content_type="application/x-zip-compressed"
+        return send_file(
+            path,
+            filename=archive.name,
+            content_type='application/x-zip-compressed',
+            request=getattr(self, 'request', None)  # Resumed downloads
         )
-        resp['Content-Disposition'] = f'attachment; filename={zip_name}'
-
-        return resp
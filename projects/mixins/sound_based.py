@@ -5,7 +5,7 @@ import shutil
 import subprocess
 import tempfile
 
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Iterable, Tuple
 
 import requests
 import sox
@@ -16,6 +16,13 @@ from django.core.cache import cache
 from requests import Response
 
 from projects.utils import exceptions as exc
+from projects.utils.cache import (
+    speed_variants,
+    synthesis_key,
+    syntheses,
+    variant_speed
+)
+from projects.utils.text import normalize_text
 
 HRZ_REGEXP = re.compile(r'Sample Rate.*: (.*)')
 
@@ -157,6 +164,9 @@ class SoxTransformerMixin(_WithSoxMixin):
 class _TTSMixin(SoxTransformerMixin):
     """ Base Class for creating sound media files via TTS """
 
+    # Name of the backend in the synthesis cache keys
+    backend_name = 'tts'
+
     def convert_text_to_sound_via_tts_service(
             self,
             text: str,
@@ -174,20 +184,117 @@ class _TTSMixin(SoxTransformerMixin):
 
         Notes:
             Should always close a file!
+
+            Text is normalized, so the same phrase typed differently is
+            taken from the synthesis cache without the backend call
+        """
+        text = normalize_text(text)
+        default_speed_wav = self.synthesize(text, audio_presets)
+        speed = audio_presets.get('speed', None)
+        if speed and speed != 1.0 and isinstance(speed, float):
+            try:
+                final_wav = self._temp_copy(self._speed_variant(
+                    text,
+                    audio_presets,
+                    default_speed_wav.name,
+                    speed
+                ))
+            except BaseException:
+                default_speed_wav.close()
+                raise
+        else:
+            final_wav = default_speed_wav
+        #
+        return default_speed_wav, final_wav
+
+    def synthesize(
+            self,
+            text: str,
+            audio_presets: Dict[str, Any]
+    ) -> Any:
+        """ Default speed audio of the normalized text (cached)
+
+        Args:
+            text: Normalized text to convert
+            audio_presets: Form audio presets (voice and emotion)
+
+        Returns:
+            Default speed file in the /tmp dir with the .wav suffix
+
         """
+        key = synthesis_key(self.backend_name, text, audio_presets)
+        cached = syntheses().get(key)
+        if cached is not None:
+            return self._temp_copy(cached)
         resp = self._resolve_tts_request(text, **audio_presets)
         if resp.status_code != 200:
             print(resp.__dict__)
             raise exc.TTSBackendIsUnavailable(
                 f'Chosen backend is unavailable, please try again later'
             )
-        return self._create_audio_from_response(resp, audio_presets)
+        default_speed_wav = self._create_audio_from_response(
+            resp,
+            audio_presets
+        )
+        syntheses().put(key, default_speed_wav.name)
+        return default_speed_wav
+
+    def warm(
+            self,
+            text: str,
+            audio_presets: Dict[str, Any],
+            speeds: Iterable[float] = ()
+    ) -> None:
+        """ Put the audio into the caches without making any record
+
+        Args:
+            text: Text as it was typed
+            audio_presets: Form audio presets (voice and emotion)
+            speeds: Playing speeds to prepare besides the default one
+
+        Notes:
+            Next convert_text_to_sound_via_tts_service call with the same
+            text, voice, emotion and one of the speeds makes no backend
+            call and no SoX tempo change, only copies the cached files
+        """
+        text = normalize_text(text)
+        with self.synthesize(text, audio_presets) as default_speed_wav:
+            for speed in set(map(variant_speed, speeds)) - {1.0}:
+                self._speed_variant(
+                    text,
+                    audio_presets,
+                    default_speed_wav.name,
+                    speed
+                )
+
+    def _speed_variant(
+            self,
+            text: str,
+            audio_presets: Dict[str, Any],
+            default_path: str,
+            speed: float
+    ) -> str:
+        """ Path of the cached synthesis with the changed tempo """
+        speed = variant_speed(speed)
+        key = synthesis_key(self.backend_name, text, audio_presets)
+        return speed_variants().get_or_create(
+            f'{key}@{speed:.2f}',
+            lambda: self.change_audio_speed(default_path, new_speed=speed)
+        )
+
+    @staticmethod
+    def _temp_copy(path: str) -> Any:
+        """ Copy of the cached file (caller may change or close it) """
+        copy = tempfile.NamedTemporaryFile(suffix='.wav')
+        shutil.copyfile(path, copy.name)
+        return copy
 
     def _create_audio_from_response(
             self,
             response: Response,
             audio_presets: Dict[str, Any]
-    ) -> Tuple[Any, Any]:
+    ) -> Any:
+        """ Default speed wav file from the backend response """
         buffer_file = tempfile.NamedTemporaryFile(suffix='.raw')
         buffer_file.write(response.content)
 
@@ -202,17 +309,7 @@ class _TTSMixin(SoxTransformerMixin):
         #
         tfm.build(buffer_file.name, default_speed_wav.name)
         buffer_file.close()
-        #
-        speed = audio_presets.get('speed', None)
-        if speed and speed != 1.0 and isinstance(speed, float):
-            final_wav = self.change_audio_speed(
-                default_speed_wav.name,
-                new_speed=audio_presets['speed']
-            )
-        else:
-            final_wav = default_speed_wav
-        #
-        return default_speed_wav, final_wav
+        return default_speed_wav
 
     @staticmethod
     def _apply_anti_grasp_effects(
@@ -245,6 +342,8 @@ class _TTSMixin(SoxTransformerMixin):
 class YSKTTSMixin(_TTSMixin):
     """ YandexSpeechKit TTS cloud API mixin. Can use any sound converters """
 
+    backend_name = 'ysk'
+
     def _resolve_tts_request(
             self,
             text: str,
@@ -307,6 +406,8 @@ class YSKTTSMixin(_TTSMixin):
 class CRTTTSMixin(_TTSMixin):
     """ CenterOfSpeechTechnologies API Mixin. Can use any sound converters """
 
+    backend_name = 'crt'
+
     def _resolve_tts_request(
             self,
             text: str,
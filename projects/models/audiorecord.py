@@ -1,15 +1,34 @@
+import os
+import uuid
+
 from functools import partial
 
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.urls import reverse
 from django.utils.translation import ugettext as _
 
 from projects.utils import validators as vdt
-from projects.utils.storage import project_path_cb
+from projects.utils.freshness import touch_project
+from projects.utils.storage import (
+    DeduplicatingStorage,
+    file_digest,
+    project_path_cb
+)
+from projects.utils.waveform import empty_summary, summarize
 
 from .project_related import IntegrationProject
 from .source import Source
 
+# Fields filled from the audio file by AudioRecordBase.update_summary
+SUMMARY_FIELDS = (
+    'duration',
+    'waveform_peaks',
+    'sample_count',
+    'audio_size',
+    'audio_hash',
+)
+
 
 class AudioRecordBase(models.Model):
     """ Model that contains records about audio TTS files """
@@ -69,13 +88,157 @@ class AudioRecordBase(models.Model):
 
     emote = models.CharField(max_length=50, default='Not specified')
 
+    # Summary of the audio for the UI (made once, when audio is saved)
+    duration = models.FloatField(
+        null=True,
+        editable=False,
+        verbose_name=_('Duration of the audio (sec)')
+    )
+
+    waveform_peaks = ArrayField(
+        models.SmallIntegerField(),
+        default=list,
+        blank=True,
+        editable=False,
+        verbose_name=_('Waveform peaks of the audio')
+    )
+
+    sample_count = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name=_('Amount of the audio samples')
+    )
+
+    audio_size = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name=_('Size of the audio file (bytes)')
+    )
+
+    audio_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name=_('SHA-256 of the audio file')
+    )
+
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """ Remember stored audio, so summary is not made twice """
+        instance = super().from_db(db, field_names, values)
+        audio = instance.__dict__.get('audio')
+        instance._summarized_audio = getattr(audio, 'name', audio)
+        return instance
+
     def __str__(self):
         """ Repr for django admin """
         return self.name
 
+    def save_audio(self, name, content, default_name, default_content=None):
+        """ Store record audio files (model itself is not saved)
+
+        Args:
+            name: Filename of the audio
+            content: Django File with the audio
+            default_name: Filename of the default (1.0 speed) audio
+            default_content: Django File with the default audio. None if it
+                             is the same as audio (speed is 1.0)
+
+        Notes:
+            Identical content is stored once. Default audio is the link
+            to the audio file, while both fields are resolved as usual
+
+        """
+        self.audio.save(name, content, save=False)
+        self.update_summary()
+        if default_content is not None:
+            self.default_audio.save(default_name, default_content, save=False)
+            return
+        field = self.default_audio.field
+        self.default_audio = field.storage.link(
+            self.audio.name,
+            field.generate_filename(self, default_name),
+            max_length=field.max_length
+        )
+
+    def stage_audio(self, name, content, default_name, default_content=None):
+        """ Store audio under the unique names (see save_audio for args)
+
+        Notes:
+            Names of the records are unique per project, while the files
+            are named after them. Audio of the record that is not inserted
+            yet is staged, so the losing side of the name race never
+            touches the files of the winner. Call publish_audio after the
+            record is committed (or delete the staged files)
+
+        """
+        token = uuid.uuid4().hex
+        self._published_names = (name, default_name)
+        self.save_audio(
+            f'.{token}-{name}',
+            content,
+            f'.{token}-{default_name}',
+            default_content
+        )
+
+    def publish_audio(self):
+        """ Move staged audio to the final names (model is not saved)
+
+        Returns:
+            Names of the changed fields
+
+        """
+        names = zip(('audio', 'default_audio'), self._published_names)
+        for field_name, name in names:
+            file_ = getattr(self, field_name)
+            field = file_.field
+            setattr(self, field_name, field.storage.move(
+                file_.name,
+                field.generate_filename(self, name),
+                max_length=field.max_length
+            ))
+        self._summarized_audio = self.audio.name  # Content is the same
+        return ['audio', 'default_audio']
+
+    def discard_audio(self):
+        """ Delete stored audio files (model is not saved) """
+        self.audio.delete(save=False)
+        self.default_audio.delete(save=False)
+
+    def update_summary(self):
+        """ Make metadata (duration, size, hash, etc.) of the current audio
+
+        Notes:
+            Called by save_audio and save (if audio is changed). Bulk
+            operations should use save_audio or call it explicitly.
+            Deduplicating storage already knows the digest of the stored
+            content, so the file is hashed only by the other storages
+
+        """
+        if self.audio:
+            path = self.audio.path
+            storage = self.audio.storage
+            summary = summarize(path)
+            try:
+                self.audio_size = os.stat(path).st_size
+                if isinstance(storage, DeduplicatingStorage):
+                    self.audio_hash = storage.file_digest(self.audio.name)
+                else:
+                    self.audio_hash = file_digest(path)
+            except FileNotFoundError:
+                self.audio_size, self.audio_hash = None, ''
+        else:
+            summary = empty_summary()
+            self.audio_size, self.audio_hash = None, ''
+        self.duration = summary.duration
+        self.sample_count = summary.sample_count
+        self.waveform_peaks = summary.peaks
+        self._summarized_audio = self.audio.name
+
     def get_absolute_url(self):
         """ Absolute path to the object in the MVC (URLification) """
         return reverse(
@@ -122,9 +285,15 @@ class AudioRecord(AudioRecordBase):
         verbose_name = _('Audio record')
         verbose_name_plural = _('Audio records')
         ordering = ('name', 'text', 'audio', 'modified_at')
+        # Duplicates are resolved by the DB (conflict-ignoring inserts)
+        unique_together = ('related_project', 'name')
 
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
-        """ Easiest way to update last modified field """
-        self.related_project.save()
+        """ Update last modified field of the project (batched if possible) """
+        if getattr(self, '_summarized_audio', None) != self.audio.name:
+            self.update_summary()
+            if update_fields is not None:
+                update_fields = {*update_fields, *SUMMARY_FIELDS}
         super().save(force_insert, force_update, using, update_fields)
+        touch_project(self.related_project_id)
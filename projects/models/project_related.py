@@ -4,6 +4,24 @@ from django.urls import reverse
 from django.utils.translation import ugettext as _
 
 
+class ProjectManager(models.Manager):
+    """ Manager with the project-level audio totals """
+
+    def with_totals(self):
+        """ Projects annotated with the totals of their records audio
+
+        Notes:
+            Single aggregate query over the stored records metadata:
+            records_amount, total_duration (sec) and storage_used (bytes)
+
+        """
+        return super().get_queryset().annotate(
+            records_amount=models.Count('audiorecord'),
+            total_duration=models.Sum('audiorecord__duration'),
+            storage_used=models.Sum('audiorecord__audio_size'),
+        )
+
+
 class IntegrationProject(models.Model):
     """ Model for integration projects """
 
@@ -26,6 +44,8 @@ class IntegrationProject(models.Model):
         verbose_name=_('Last updated')
     )
 
+    objects = ProjectManager()
+
     def __str__(self):
         """ String representation of object """
         return self.name
@@ -2,31 +2,12 @@ import uuid
 
 import unidecode
 
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, pre_save
 from django.utils.text import slugify
 from django.dispatch import receiver
 
 from projects.models import AudioRecord, IntegrationProject
-
-
-@receiver(post_save, sender=AudioRecord)
-def resolve_audio_record_name(sender, instance, **kwargs):
-    """ This is an additional method to erase duplicates silently
-        Main check is in the form method
-
-    Args:
-        sender: Sender model
-        instance: Saved instance of the AudioRecord model
-        **kwargs: props for future
-
-    Notes:
-        Work silently (May be use django.contrib.messages to display errors)
-
-    """
-    if instance.related_project.audiorecord_set.filter(
-            name=instance.name
-    ).count() > 1:
-        instance.delete()
+from projects.utils.freshness import touch_project
 
 
 @receiver(pre_save, sender=IntegrationProject)
@@ -38,3 +19,9 @@ def check_slug_existence(sender, instance, **kwargs):
     if text == '':
         text = uuid.uuid4().hex
     instance.slug = text
+
+
+@receiver(post_delete, sender=AudioRecord)
+def touch_project_after_record_removal(sender, instance, **kwargs):
+    """ Removal is a project change as well (keeps last_updated reliable) """
+    touch_project(instance.related_project_id)
@@ -0,0 +1,265 @@
+import os
+import tempfile
+
+import mock
+import pytest
+
+from django.test import SimpleTestCase
+
+from projects.mixins.sound_based import YSKTTSMixin
+from projects.tests.test_utils.cases import IsolatedFilesMixin
+from projects.utils import cache
+
+
+@pytest.mark.unit
+class DiskLRUCacheTest(IsolatedFilesMixin, SimpleTestCase):
+    """ Test case for the size-limited file cache """
+
+    def setUp(self):
+        """ Cache in the isolated directory """
+        super().setUp()
+        self.cache = cache.DiskLRUCache(self.location, 10, suffix='.wav')
+
+    def _put(self, key, data):
+        """ Cache the temp file with the given content """
+        with tempfile.NamedTemporaryFile() as source:
+            source.write(data)
+            source.flush()
+            return self.cache.put(key, source.name)
+
+    def test_cached_file_survives_source(self):
+        """ Checks: Entry is kept after the source file removal """
+        path = self._put('a', b'data')
+        self.assertEqual(self.cache.get('a'), path)
+        with open(path, 'rb') as cached:
+            self.assertEqual(cached.read(), b'data')
+
+    def test_miss(self):
+        """ Checks: Unknown key is not resolved """
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_least_recently_used_is_evicted(self):
+        """ Checks: Entries above the size limit are evicted in LRU order """
+        first = self._put('a', b'1234')
+        second = self._put('b', b'1234')
+        os.utime(first, (0, 0))
+        os.utime(second, (1, 1))
+        self.cache.get('a')  # Hit makes entry the most recent one
+        self._put('c', b'1234')
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_directory_is_walked_above_limit(self):
+        """ Checks: Puts under the limit do not walk through the entries """
+        self._put('a', b'12')  # Size is learnt by the first walk
+        with mock.patch.object(
+                self.cache,
+                '_entries',
+                wraps=self.cache._entries
+        ) as entries:
+            self._put('b', b'12')
+            self._put('c', b'12')
+            entries.assert_not_called()
+            self._put('d', b'12345')
+            entries.assert_called_once_with()
+
+    def test_eviction_leaves_room(self):
+        """ Checks: Cache above the limit is freed below it """
+        for key in 'abcde':
+            os.utime(self._put(key, b'12'), (0, 0))
+        self._put('f', b'12')
+        self.assertEqual(self.cache.evict(), (0, 0))
+        total = sum(stat.st_size for _, stat in self.cache._entries())
+        self.assertLessEqual(total, 10 * cache.EVICTION_TARGET)
+
+    def test_factory_is_called_once(self):
+        """ Checks: Miss is resolved once, then the entry is reused """
+        factory = mock.Mock(
+            side_effect=lambda: tempfile.NamedTemporaryFile(suffix='.wav')
+        )
+        path = self.cache.get_or_create('a', factory)
+        self.assertEqual(self.cache.get_or_create('a', factory), path)
+        factory.assert_called_once_with()
+
+    def test_clear(self):
+        """ Checks: Every entry is removed """
+        self._put('a', b'1')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('a'))
+
+
+@pytest.mark.unit
+class SpeedVariantTest(IsolatedFilesMixin, SimpleTestCase):
+    """ Test case for the cached speed variants of the records """
+    isolated_caches = (cache.speed_variants,)
+
+    def setUp(self):
+        """ Isolated cache directory """
+        super().setUp()
+        self.builder = mock.Mock()
+        self.builder.change_audio_speed.side_effect = (
+            lambda *_args: tempfile.NamedTemporaryFile(suffix='.wav')
+        )
+        self.audio = mock.Mock(path=os.path.join(self.location, 'a.wav'))
+        self.audio.name = 'records/a.wav'
+        self._store(b'first')
+
+    def isolated_settings(self):
+        """ Speed variants are cached in the temp directory """
+        return {
+            'AUDIO_CACHE_ROOT': self.location,
+            'SPEED_VARIANTS_MAX_SIZE': 2 ** 20,
+        }
+
+    def _store(self, content):
+        """ Replace the default audio the way the storage does """
+        with tempfile.NamedTemporaryFile(dir=self.location,
+                                         delete=False) as audio:
+            audio.write(content)
+        os.replace(audio.name, self.audio.path)
+
+    def test_speed_is_changed_once(self):
+        """ Checks: Repeated speed choice does not reprocess audio """
+        path = cache.speed_variant(self.audio, 1.2, self.builder)
+        self.assertEqual(cache.speed_variant(self.audio, 1.2, self.builder),
+                         path)
+        self.builder.change_audio_speed.assert_called_once_with(
+            self.audio.path,
+            1.2
+        )
+
+    def test_new_audio_is_not_served_from_cache(self):
+        """ Checks: Variants are bound to the default audio file """
+        first = cache.speed_variant(self.audio, 1.2, self.builder)
+        self.audio.name = 'records/a_new.wav'
+        self.assertNotEqual(
+            cache.speed_variant(self.audio, 1.2, self.builder),
+            first
+        )
+
+    def test_recreated_audio_is_not_served_from_cache(self):
+        """ Checks: Audio stored under the same name gets its own variant """
+        first = cache.speed_variant(self.audio, 1.2, self.builder)
+        self._store(b'second')
+        self.assertNotEqual(
+            cache.speed_variant(self.audio, 1.2, self.builder),
+            first
+        )
+        self.assertEqual(self.builder.change_audio_speed.call_count, 2)
+
+    def test_speed_is_rounded_once(self):
+        """ Checks: Speeds of the same variant share the rendered tempo """
+        path = cache.speed_variant(self.audio, 1.234, self.builder)
+        self.assertEqual(
+            cache.speed_variant(self.audio, 1.2349, self.builder),
+            path
+        )
+        self.builder.change_audio_speed.assert_called_once_with(
+            self.audio.path,
+            1.23
+        )
+
+    def test_prewarm_skips_default_speed(self):
+        """ Checks: Only non-default speeds are prepared """
+        futures = cache.prewarm_speed_variants(
+            self.audio,
+            self.builder,
+            speeds=(0.9, 1.0, 1.1)
+        )
+        for future in futures:
+            future.result()
+        self.assertEqual(self.builder.change_audio_speed.call_count, 2)
+
+
+@pytest.mark.unit
+class SynthesisCacheTest(IsolatedFilesMixin, SimpleTestCase):
+    """ Test case for the cached TTS results """
+    isolated_caches = (cache.syntheses, cache.speed_variants)
+
+    def setUp(self):
+        """ Isolated cache and the backend that answers with the text """
+        super().setUp()
+        self.builder = YSKTTSMixin()
+        self.request_patch = mock.patch.object(
+            self.builder,
+            '_resolve_tts_request',
+            side_effect=lambda text, **_presets: mock.Mock(
+                status_code=200,
+                content=text.encode('utf-8')
+            )
+        )
+        self.request = self.request_patch.start()
+        self.response_patch = mock.patch.object(
+            self.builder,
+            '_create_audio_from_response',
+            side_effect=self._wav
+        )
+        self.response_patch.start()
+        self.presets = {'voice': 'alena', 'emotion': 'good', 'speed': 1.0}
+
+    def tearDown(self):
+        """ Drop the backend patches """
+        self.response_patch.stop()
+        self.request_patch.stop()
+
+    def isolated_settings(self):
+        """ Syntheses and their variants are cached in the temp directory """
+        return {
+            'AUDIO_CACHE_ROOT': self.location,
+            'SYNTHESIS_CACHE_MAX_SIZE': 2 ** 20,
+            'SPEED_VARIANTS_MAX_SIZE': 2 ** 20,
+        }
+
+    @staticmethod
+    def _wav(response, _presets):
+        """ Temp file with the response content """
+        wav = tempfile.NamedTemporaryFile(suffix='.wav')
+        wav.write(response.content)
+        wav.flush()
+        return wav
+
+    def _convert(self, text, **presets):
+        """ Content of the synthesized audio """
+        default, final = self.builder.convert_text_to_sound_via_tts_service(
+            text,
+            {**self.presets, **presets}
+        )
+        with default, final:
+            with open(final.name, 'rb') as audio:
+                return audio.read()
+
+    def test_same_phrase_is_synthesized_once(self):
+        """ Checks: Differently typed phrase is taken from the cache """
+        expected = '"Привет", мир'.encode('utf-8')
+        self.assertEqual(self._convert('«Привет»,  мир'), expected)
+        self.assertEqual(self._convert(' “Привет” , мир\n'), expected)
+        self.request.assert_called_once_with(
+            '"Привет", мир',
+            **self.presets
+        )
+
+    def test_voice_is_part_of_the_key(self):
+        """ Checks: Other voice is synthesized again """
+        self._convert('Привет')
+        self._convert('Привет', voice='filipp')
+        self.assertEqual(self.request.call_count, 2)
+
+    def test_warmed_speed_is_only_copied(self):
+        """ Checks: Warmed text and speed need no backend call and no SoX """
+        with mock.patch.object(
+                self.builder,
+                'change_audio_speed',
+                side_effect=lambda path, new_speed: self._wav(
+                    mock.Mock(content=f'{new_speed}'.encode('utf-8')),
+                    None
+                )
+        ) as change_speed:
+            self.builder.warm('Привет ,  мир', self.presets, (1.2, 1.0))
+            self.assertEqual(self._convert('Привет, мир', speed=1.2), b'1.2')
+            self.assertEqual(
+                self._convert('Привет, мир'),
+                'Привет, мир'.encode('utf-8')
+            )
+        self.request.assert_called_once()
+        change_speed.assert_called_once()
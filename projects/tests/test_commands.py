@@ -1,10 +1,16 @@
+import json
 import os
+import tempfile
 from io import StringIO
 
+import mock
 import pytest
 import parameterized
 from django.core.management import call_command
-from django.test import TestCase
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from projects.tests.test_utils.cases import IsolatedFilesMixin
 
 
 @pytest.mark.unit
@@ -68,3 +74,282 @@ class EraseMediaFilesTest(TestCase):
             'old,new\n'
         )
         self.assertEqual(actual, expected)
+
+
+@pytest.mark.unit
+class DeduplicateMediaFilesTest(IsolatedFilesMixin, SimpleTestCase):
+    """ Test case for the command that moves media into content storage """
+
+    def setUp(self):
+        """ Fill in isolated media root with duplicating records """
+        super().setUp()
+        for name in ('records/p/a.wav', 'records:default-audio/p/a.wav'):
+            path = os.path.join(self.location, name)
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as record:
+                record.write(b'pepega')
+        self.strio = StringIO()
+
+    def isolated_settings(self):
+        """ Media is stored in the temp directory """
+        return {'MEDIA_ROOT': self.location}
+
+    def test_dry_run(self):
+        """ Checks: Nothing is changed, possible profit is reported """
+        call_command('mediadedupe', '--dry-run', stdout=self.strio)
+        self.assertEqual(
+            self.strio.getvalue(),
+            '2 file(s) processed. 6 byte(s) may be freed\n'
+        )
+        self.assertFalse(
+            os.path.isdir(os.path.join(self.location, '.blobs'))
+        )
+
+    def test_duplicates_are_linked(self):
+        """ Checks: Duplicating records share the same content """
+        call_command('mediadedupe', stdout=self.strio)
+        self.assertEqual(
+            self.strio.getvalue(),
+            '2 file(s) processed. 6 byte(s) were freed\n'
+            '0 unreferenced blob(s) deleted. 0 byte(s) released\n'
+        )
+        self.assertTrue(os.path.samefile(
+            os.path.join(self.location, 'records/p/a.wav'),
+            os.path.join(self.location, 'records:default-audio/p/a.wav'),
+        ))
+
+    def test_unknown_root(self):
+        """ Checks: Missing directory is reported as command error """
+        with self.assertRaises(CommandError):
+            call_command('mediadedupe', '--root', 'nope', stdout=self.strio)
+
+
+@pytest.mark.unit
+class ZipBenchmarkTest(SimpleTestCase):
+    """ Test case for the command that compares archive compressions """
+
+    def setUp(self):
+        """ Fake project with the archive of known size """
+        self.strio = StringIO()
+        self.project_patch = mock.patch(
+            'projects.management.commands.zipbench.IntegrationProject'
+        )
+        self.project_model = self.project_patch.start()
+        self.pack_patch = mock.patch(
+            'projects.management.commands.zipbench.ProjectArchive.pack',
+            autospec=True,
+            side_effect=self._pack
+        )
+        self.pack = self.pack_patch.start()
+
+    def tearDown(self):
+        """ Drop the patches """
+        self.pack_patch.stop()
+        self.project_patch.stop()
+
+    @staticmethod
+    def _pack(archive, stream):
+        """ Smaller archive for any real compression """
+        stream.write(b'0' * (10 if archive.level is None else 5))
+
+    def test_report(self):
+        """ Checks: Every compression is measured after the warm-up """
+        call_command(
+            'zipbench',
+            '--project', 'demo',
+            '--compression', 'stored',
+            '--compression', 'deflated:6',
+            stdout=self.strio
+        )
+        lines = self.strio.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1].split()[1::3], ['stored', '1.00'])
+        self.assertEqual(lines[2].split()[1::3], ['deflated:6', '0.50'])
+        self.assertEqual(self.pack.call_count, 3)
+
+    def test_wrong_compression(self):
+        """ Checks: Wrong compression is reported before packing """
+        with self.assertRaises(CommandError):
+            call_command(
+                'zipbench',
+                '--project', 'demo',
+                '--compression', 'zstd',
+                stdout=self.strio
+            )
+        self.pack.assert_not_called()
+
+
+@pytest.mark.unit
+class ExportProjectsTest(IsolatedFilesMixin, SimpleTestCase):
+    """ Test case for the command that exports several projects """
+
+    def setUp(self):
+        """ Fake projects and the built archive """
+        super().setUp()
+        self.strio = StringIO()
+        self.artifact = os.path.join(self.location, 'artifact.zip')
+        with open(self.artifact, 'wb') as artifact:
+            artifact.write(b'PK')
+        self.project_patch = mock.patch(
+            'projects.management.commands.exportprojects.IntegrationProject'
+        )
+        self.project_model = self.project_patch.start()
+        self.project_model.objects.filter.return_value = [
+            mock.Mock(slug='one')
+        ]
+        self.archive_patch = mock.patch(
+            'projects.management.commands.exportprojects.BulkArchive'
+        )
+        self.archive = self.archive_patch.start()
+        self.archive.return_value.get_or_build.return_value = self.artifact
+
+    def tearDown(self):
+        """ Drop the patches """
+        self.archive_patch.stop()
+        self.project_patch.stop()
+
+    def test_export(self):
+        """ Checks: Archive is copied to the output """
+        output = os.path.join(self.location, 'out.zip')
+        call_command(
+            'exportprojects',
+            '--project', 'one',
+            '--output', output,
+            '--workers', '3',
+            stdout=self.strio
+        )
+        self.assertTrue(
+            self.strio.getvalue().startswith(
+                f'{output} is written (2 byte(s)) in '
+            )
+        )
+        self.assertEqual(self.archive.call_args[0][-1], 3)
+
+    def test_json_summary(self):
+        """ Checks: Summary contains timings of the packed projects """
+        self.archive.return_value.path = self.artifact  # Cached already
+        progress = StringIO()
+
+        def build():
+            self.archive.call_args[1]['progress']('one')
+            return self.artifact
+
+        self.archive.return_value.get_or_build.side_effect = build
+        call_command(
+            'exportprojects',
+            '--project', 'one',
+            '--output', os.path.join(self.location, 'out.zip'),
+            '--json',
+            stdout=self.strio,
+            stderr=progress
+        )
+        summary = json.loads(self.strio.getvalue())
+        self.assertEqual(summary['size'], 2)
+        self.assertTrue(summary['cached'])
+        self.assertEqual(
+            [project['project'] for project in summary['projects']],
+            ['one']
+        )
+        self.assertTrue(progress.getvalue().startswith('[1] one is packed'))
+
+    def test_missing_project(self):
+        """ Checks: Unknown slugs are reported """
+        with self.assertRaisesMessage(CommandError, 'two'):
+            call_command(
+                'exportprojects',
+                '--project', 'one',
+                '--project', 'two',
+                '--output', os.path.join(self.location, 'out.zip'),
+                stdout=self.strio
+            )
+
+
+@pytest.mark.unit
+class ImportFileTest(SimpleTestCase):
+    """ Test case for the command that synthesizes records of data file """
+
+    def setUp(self):
+        """ Fake project and parser """
+        self.strio = StringIO()
+        self.data_file = tempfile.NamedTemporaryFile(suffix='.csv')
+        self.project_patch = mock.patch(
+            'projects.management.commands.importfile.IntegrationProject'
+        )
+        self.project_patch.start()
+        self.parser_patch = mock.patch(
+            'projects.management.commands.importfile.'
+            'FileParserWithAudioCreation'
+        )
+        self.parser = self.parser_patch.start()
+        self.parser.return_value.parse.side_effect = self._parse
+        self.progress = range(1, 4)
+        self.parser.return_value.stats = {
+            'rows': 3,
+            'synthesized': 2,
+            'deduplicated': 1,
+        }
+
+    def tearDown(self):
+        """ Drop the patches and file """
+        self.parser_patch.stop()
+        self.project_patch.stop()
+        self.data_file.close()
+
+    def _parse(self):
+        """ Rows done by self.progress, one of them is failed """
+        progress = self.parser.call_args[1]['progress']
+        for done in self.progress:
+            progress(done, 1)
+        return ['Convert failed for audio with id 2']
+
+    def test_json_summary(self):
+        """ Checks: Parser gets the presets and the pool size """
+        call_command(
+            'importfile', self.data_file.name,
+            '--project', 'demo',
+            '--voice', 'alyss',
+            '--workers', '4',
+            '--json',
+            stdout=self.strio
+        )
+        summary = json.loads(self.strio.getvalue())
+        self.assertEqual(summary['processed'], 3)
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(summary['deduplicated'], 1)
+        (data_file, presets), kwargs = self.parser.call_args
+        self.assertEqual(data_file.temporary_file_path(), self.data_file.name)
+        self.assertEqual(presets['voice'], 'alyss')
+        self.assertEqual(presets['source'], 1)
+        self.assertEqual(kwargs['workers'], 4)
+
+    def test_progress_by_groups(self):
+        """ Checks: Every crossed step is reported once """
+        self.progress = (60, 130, 250, 260, 300)
+        stderr = StringIO()
+        call_command(
+            'importfile', self.data_file.name,
+            '--project', 'demo',
+            '--voice', 'alyss',
+            stdout=self.strio,
+            stderr=stderr
+        )
+        self.assertEqual(
+            stderr.getvalue().splitlines(),
+            [
+                '130 row(s) processed, 1 failed',
+                '250 row(s) processed, 1 failed',
+                '300 row(s) processed, 1 failed',
+                'Convert failed for audio with id 2',
+            ]
+        )
+
+    def test_missing_file(self):
+        """ Checks: Missing file is reported before parsing """
+        with self.assertRaises(CommandError):
+            call_command(
+                'importfile', 'missing.csv',
+                '--project', 'demo',
+                '--voice', 'alyss',
+                stdout=self.strio
+            )
+        self.parser.assert_not_called()
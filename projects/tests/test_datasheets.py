@@ -0,0 +1,47 @@
+import csv
+import io
+
+import pytest
+import xlrd
+
+from django.test import SimpleTestCase
+
+from projects.utils import datasheets
+
+
+@pytest.mark.unit
+class DataSheetWritersTest(SimpleTestCase):
+    """ Test case for streaming data sheet writers """
+
+    rows = [
+        ('Example_1', 'Пример   заполнения'),
+        ('Example_2', 'Line\nbreak & <tags> "quotes"'),
+    ]
+
+    def test_csv_is_readable(self):
+        """ Checks: Streamed CSV contain header and every row """
+        data = b''.join(datasheets.iter_csv(iter(self.rows)))
+        actual = list(csv.reader(io.StringIO(data.decode('utf-8'))))
+        expected = [['ID', 'TEXT']] + [list(row) for row in self.rows]
+        self.assertEqual(actual, expected)
+
+    def test_csv_is_streamed_in_chunks(self):
+        """ Checks: Rows are yielded in chunks, not as the whole body """
+        rows = ((str(idx), 'text') for idx in range(2000))
+        chunks = [chunk for chunk in datasheets.iter_csv(rows) if chunk]
+        self.assertGreater(len(chunks), 1)
+
+    def test_xlsx_is_readable(self):
+        """ Checks: Streamed workbook can be read by the import parser lib """
+        data = b''.join(datasheets.iter_xlsx(iter(self.rows)))
+        sheet = xlrd.open_workbook(file_contents=data).sheet_by_index(0)
+        self.assertEqual(sheet.nrows, 3)
+        self.assertEqual(sheet.row_values(0), ['ID', 'TEXT'])
+        self.assertEqual(sheet.row_values(2), list(self.rows[1]))
+
+    def test_xlsx_has_no_row_ceiling(self):
+        """ Checks: More rows than .xls format allows can be exported """
+        rows = ((str(idx), 'text') for idx in range(70000))
+        data = b''.join(datasheets.iter_xlsx(rows))
+        sheet = xlrd.open_workbook(file_contents=data).sheet_by_index(0)
+        self.assertEqual(sheet.nrows, 70001)
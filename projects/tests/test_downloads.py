@@ -0,0 +1,161 @@
+import os
+import tempfile
+
+import parameterized
+import pytest
+
+from django.http import FileResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from projects.tests.test_utils.cases import IsolatedFilesMixin
+from projects.utils import downloads
+
+
+@pytest.mark.unit
+class SendFileTest(IsolatedFilesMixin, SimpleTestCase):
+    """ Test case for the downloads offloaded to nginx """
+
+    def setUp(self):
+        """ Served directory with the single file """
+        super().setUp()
+        self.path = os.path.join(self.location, 'records', 'a b.wav')
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as stored:
+            stored.write(b'RIFF')
+
+    def isolated_settings(self):
+        """ The temp directory is served by nginx """
+        return {
+            'SENDFILE_X_ACCEL': True,
+            'SENDFILE_LOCATIONS': ((self.location, '/protected/media/'),),
+        }
+
+    def test_file_is_sent_by_nginx(self):
+        """ Checks: Response has no body, only the internal location """
+        response = downloads.send_file(self.path, filename='Запись.wav')
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected/media/records/a%20b.wav'
+        )
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Type'], 'audio/x-wav')
+        self.assertEqual(
+            response['Content-Disposition'],
+            "attachment; filename*=UTF-8''%D0%97%D0%B0%D0%BF%D0%B8%D1%81%D1%8C"
+            '.wav'
+        )
+
+    def test_file_is_streamed_without_nginx(self):
+        """ Checks: Django sends file itself if offload is disabled """
+        with override_settings(SENDFILE_X_ACCEL=False):
+            response = downloads.send_file(self.path, attachment=False)
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(b''.join(response.streaming_content), b'RIFF')
+        self.assertTrue(response['Content-Disposition'].startswith('inline'))
+
+    def test_unexposed_file_is_streamed(self):
+        """ Checks: Files outside of the nginx locations are not redirected """
+        with tempfile.NamedTemporaryFile(suffix='.zip') as outside:
+            response = downloads.send_file(outside.name)
+            self.assertIsInstance(response, FileResponse)
+            # response.close() would finish the request (DB connections)
+            response.file_to_stream.close()
+
+    def test_missing_file(self):
+        """ Checks: nginx is not asked for the missing file """
+        with self.assertRaises(FileNotFoundError):
+            downloads.send_file(os.path.join(self.location, 'missing.wav'))
+
+    def test_stream_is_not_buffered(self):
+        """ Checks: Content being made is passed by nginx at once """
+        response = downloads.send_stream(
+            iter([b'PK', b'\x03\x04']),
+            filename='Архив.zip'
+        )
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertTrue(response['Content-Disposition'].startswith(
+            "attachment; filename*=UTF-8''"
+        ))
+        self.assertEqual(
+            b''.join(response.streaming_content),
+            b'PK\x03\x04'
+        )
+
+
+@pytest.mark.unit
+class ResumableDownloadTest(SimpleTestCase):
+    """ Test case for the range requests served by Django """
+
+    def setUp(self):
+        """ File of ten bytes, sent without nginx """
+        self.stored = tempfile.NamedTemporaryFile(suffix='.zip')
+        self.stored.write(b'0123456789')
+        self.stored.flush()
+        self.etag = downloads.file_etag(os.stat(self.stored.name))
+        self.factory = RequestFactory()
+        self.settings_patch = override_settings(SENDFILE_X_ACCEL=False)
+        self.settings_patch.enable()
+
+    def tearDown(self):
+        """ Erase the file """
+        self.settings_patch.disable()
+        self.stored.close()
+
+    def _send(self, **headers):
+        """ Response to GET with the given headers """
+        response = downloads.send_file(
+            self.stored.name,
+            request=self.factory.get('/', **headers)
+        )
+        self.addCleanup(self._release, response)
+        return response
+
+    @staticmethod
+    def _release(response):
+        """ Close the sent file (response.close() finishes the request) """
+        if isinstance(response, FileResponse):
+            response.file_to_stream.close()
+        elif response.streaming:  # Range is closed when it is read out
+            b''.join(response.streaming_content)
+
+    def test_full(self):
+        """ Checks: Whole file is sent with the range support headers """
+        response = self._send()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    @parameterized.parameterized.expand([
+        ('bytes=2-4', b'234', 'bytes 2-4/10'),
+        ('bytes=7-', b'789', 'bytes 7-9/10'),
+        ('bytes=-2', b'89', 'bytes 8-9/10'),
+        ('bytes=8-100', b'89', 'bytes 8-9/10'),
+    ])
+    def test_range(self, header, content, content_range):
+        """ Checks: Requested part is sent """
+        response = self._send(HTTP_RANGE=header)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], content_range)
+        self.assertEqual(response['Content-Length'], str(len(content)))
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+    def test_unsatisfiable(self):
+        """ Checks: Range out of the file is rejected """
+        response = self._send(HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_if_range(self):
+        """ Checks: Part is sent only if the file is still the same """
+        response = self._send(HTTP_RANGE='bytes=5-', HTTP_IF_RANGE=self.etag)
+        self.assertEqual(response.status_code, 206)
+        response = self._send(HTTP_RANGE='bytes=5-', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_not_modified(self):
+        """ Checks: Cached copy is validated by the entity tag """
+        response = self._send(HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
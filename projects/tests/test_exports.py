@@ -0,0 +1,306 @@
+import datetime
+import os
+import tempfile
+import zipfile
+
+import mock
+import parameterized
+import pytest
+
+from django.test import SimpleTestCase, override_settings
+
+from projects.mixins.imed_based import ZipFileMediaBuildMixin
+from projects.tests.test_utils.cases import IsolatedFilesMixin
+from projects.utils import exports
+
+
+class ExportTestCase(IsolatedFilesMixin, SimpleTestCase):
+    """ Isolated exports with the fake conversions """
+    isolated_caches = (exports.raw_derivatives,)
+
+    def setUp(self):
+        """ Isolated exports, cache and project with two records """
+        super().setUp()
+        self.records = [self._record('first'), self._record('second')]
+        self.project = self._project('demo-project', self.records)
+        self.builder = mock.Mock()
+        self.builder.convert_audio_type_format.side_effect = self._convert
+        self.builder.create_imed.side_effect = (
+            lambda *args: self._temp(b'<imed/>')
+        )
+
+    def isolated_settings(self):
+        """ Exports and raw derivatives are kept in the temp directory """
+        return {
+            'AUDIO_CACHE_ROOT': os.path.join(self.location, 'cache'),
+            'EXPORTS_ROOT': os.path.join(self.location, 'exports'),
+            'RAW_DERIVATIVES_MAX_SIZE': 2 ** 20,
+            'EXPORT_COMPRESSION': 'deflated:6',
+            'EXPORT_GRACE_PERIOD': 0,
+            'BULK_EXPORTS_MAX_SIZE': 2 ** 20,
+        }
+
+    @staticmethod
+    def _project(slug, records):
+        """ Project with the given records """
+        project = mock.Mock(
+            slug=slug,
+            last_updated=datetime.datetime(2020, 1, 1)
+        )
+        queryset = project.audiorecord_set.all.return_value.exclude
+        queryset.return_value.only.return_value.iterator.side_effect = (
+            lambda: iter(records)
+        )
+        return project
+
+    def _record(self, name):
+        """ Record with the stored audio """
+        record = mock.Mock(audio_hash=f'{name}-hash')
+        record.name = name
+        return record
+
+    @staticmethod
+    def _temp(content):
+        """ Named temp file as the SoX conversion returns """
+        temp = tempfile.NamedTemporaryFile()
+        temp.write(content)
+        temp.flush()
+        return temp
+
+    def _convert(self, audio):
+        """ Fake SoX conversion """
+        return self._temp(b'raw')
+
+
+@pytest.mark.unit
+class ProjectArchiveTest(ExportTestCase):
+    """ Test case for the cached export archives """
+
+    def test_build(self):
+        """ Archive contains the raw audio and .imed file """
+        archive = exports.ProjectArchive(self.project, self.builder, 'path')
+        with zipfile.ZipFile(archive.get_or_build()) as zip_file:
+            self.assertEqual(
+                sorted(zip_file.namelist()),
+                [
+                    'audio/demo-project.imed',
+                    'audio/first.raw',
+                    'audio/second.raw',
+                ]
+            )
+        self.assertEqual(archive.name, 'cc_demo_project_audio_loadout.zip')
+
+    def test_unchanged_project_is_not_rebuilt(self):
+        """ Same version of the project is served from the artifact """
+        archive = exports.ProjectArchive(self.project, self.builder, 'path')
+        path = archive.get_or_build()
+        self.assertEqual(archive.get_or_build(), path)
+        self.assertEqual(self.builder.create_imed.call_count, 1)
+        self.assertEqual(
+            os.listdir(archive.directory),
+            [os.path.basename(path)]
+        )
+
+    def test_changed_project_reuses_audio(self):
+        """ Only new audio is converted, outdated artifact is removed """
+        archive = exports.ProjectArchive(self.project, self.builder, 'path')
+        outdated = archive.get_or_build()
+        self.project.last_updated = datetime.datetime(2020, 1, 2)
+        self.records.append(self._record('third'))
+        path = archive.get_or_build()
+        self.assertNotEqual(path, outdated)
+        self.assertFalse(os.path.exists(outdated))
+        self.assertEqual(self.builder.convert_audio_type_format.call_count, 3)
+
+    def test_outdated_artifact_is_kept_for_downloads(self):
+        """ Previous artifact is removed after the grace period """
+        archive = exports.ProjectArchive(self.project, self.builder, 'path')
+        with override_settings(EXPORT_GRACE_PERIOD=60):
+            outdated = archive.get_or_build()
+            self.project.last_updated = datetime.datetime(2020, 1, 2)
+            path = archive.get_or_build()
+            self.assertTrue(os.path.exists(outdated))
+            os.utime(outdated, (0, 0))
+            os.utime(path, (1, 1))  # Replaced long ago
+            self.project.last_updated = datetime.datetime(2020, 1, 3)
+            latest = archive.get_or_build()
+        self.assertFalse(os.path.exists(outdated))
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.exists(latest))
+
+    def test_build_path_has_own_artifact(self):
+        """ Archives with different .imed build paths are kept apart """
+        first = exports.ProjectArchive(self.project, self.builder, 'first')
+        second = exports.ProjectArchive(self.project, self.builder, 'second')
+        self.assertNotEqual(first.get_or_build(), second.get_or_build())
+        self.assertTrue(os.path.exists(first.path))
+
+    def test_compression(self):
+        """ Entries are compressed by the chosen method """
+        archive = exports.ProjectArchive(
+            self.project,
+            self.builder,
+            'path',
+            'bzip2:9'
+        )
+        with zipfile.ZipFile(archive.get_or_build()) as zip_file:
+            self.assertEqual(
+                {info.compress_type for info in zip_file.infolist()},
+                {zipfile.ZIP_BZIP2}
+            )
+        default = exports.ProjectArchive(self.project, self.builder, 'path')
+        self.assertNotEqual(default.path, archive.path)
+
+    def test_failed_conversion(self):
+        """ Errors of the conversions are raised, no artifact is left """
+        self.builder.convert_audio_type_format.side_effect = OSError
+        archive = exports.ProjectArchive(self.project, self.builder, 'path')
+        with self.assertRaises(OSError):
+            archive.get_or_build()
+        self.assertEqual(os.listdir(archive.directory), [])
+
+
+@pytest.mark.unit
+class BulkArchiveTest(ExportTestCase):
+    """ Test case for the archives of several projects """
+
+    def setUp(self):
+        """ Second project shares the audio with the first one """
+        super().setUp()
+        self.other = self._project(
+            'other',
+            [self._record('first'), self._record('third')]
+        )
+
+    def test_single_archive(self):
+        """ Projects are placed into own directories, audio is reused """
+        archive = exports.BulkArchive(
+            [self.project, self.other],
+            self.builder,
+            workers=2
+        )
+        with zipfile.ZipFile(archive.get_or_build()) as zip_file:
+            self.assertEqual(
+                sorted(zip_file.namelist()),
+                [
+                    'demo-project/audio/demo-project.imed',
+                    'demo-project/audio/first.raw',
+                    'demo-project/audio/second.raw',
+                    'other/audio/first.raw',
+                    'other/audio/other.imed',
+                    'other/audio/third.raw',
+                ]
+            )
+        self.assertEqual(self.builder.convert_audio_type_format.call_count, 3)
+        self.assertEqual(archive.get_or_build(), archive.path)
+        self.assertEqual(self.builder.create_imed.call_count, 2)
+
+    def test_split(self):
+        """ Archive contains the (cached) archives of the projects """
+        archive = exports.BulkArchive(
+            [self.other, self.project],
+            self.builder,
+            split=True
+        )
+        with zipfile.ZipFile(archive.get_or_build()) as zip_file:
+            self.assertEqual(
+                zip_file.namelist(),
+                ['demo-project.zip', 'other.zip']
+            )
+        project_archive = exports.ProjectArchive(self.project, self.builder)
+        self.assertTrue(os.path.isfile(project_archive.path))
+
+    def test_changed_project(self):
+        """ Change of any project makes the new artifact """
+        archive = exports.BulkArchive([self.project, self.other], self.builder)
+        outdated = archive.get_or_build()
+        self.other.last_updated = datetime.datetime(2020, 1, 2)
+        self.assertNotEqual(archive.get_or_build(), outdated)
+        self.assertFalse(os.path.exists(outdated))
+
+    def test_oldest_archives_are_evicted(self):
+        """ Archives of the other projects sets are limited by size """
+        first = exports.BulkArchive([self.project], self.builder)
+        oldest = first.get_or_build()
+        os.utime(oldest, (0, 0))
+        second = exports.BulkArchive([self.other], self.builder)
+        limit = os.stat(oldest).st_size + 1
+        with override_settings(BULK_EXPORTS_MAX_SIZE=limit):
+            latest = second.get_or_build()
+        self.assertFalse(os.path.exists(oldest))
+        self.assertTrue(os.path.exists(latest))
+
+    def test_new_archive_is_kept(self):
+        """ Archive above the limit is still sent """
+        archive = exports.BulkArchive([self.project], self.builder)
+        with override_settings(BULK_EXPORTS_MAX_SIZE=0):
+            self.assertTrue(os.path.isfile(archive.get_or_build()))
+
+    def test_streamed_while_built(self):
+        """ Streamed content is the archive stored for the next downloads """
+        archive = exports.BulkArchive([self.project, self.other], self.builder)
+        content = b''.join(archive.iter_build())
+        with open(archive.path, 'rb') as stored:
+            self.assertEqual(stored.read(), content)
+        with zipfile.ZipFile(archive.path) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(len(zip_file.namelist()), 6)
+
+    def test_stream_raises_build_error(self):
+        """ Failed build cuts the stream and stores nothing """
+        self.builder.create_imed.side_effect = OSError
+        archive = exports.BulkArchive([self.project], self.builder)
+        with self.assertRaises(OSError):
+            b''.join(archive.iter_build())
+        self.assertEqual(os.listdir(archive.directory), [])
+
+
+@pytest.mark.unit
+class BulkDownloadTest(ExportTestCase):
+    """ Test case for the download of several projects """
+
+    def setUp(self):
+        """ Mixin with the fake conversions """
+        super().setUp()
+        self.mixin = ZipFileMediaBuildMixin()
+        self.mixin.convert_audio_type_format = self._convert
+        self.mixin.create_imed = self.builder.create_imed
+
+    @override_settings(SENDFILE_X_ACCEL=False)
+    def test_new_archive_is_streamed(self):
+        """ Archive is sent while it is built, then from the artifact """
+        response = self.mixin.create_and_send_a_bulk_zip([self.project])
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        content = b''.join(response.streaming_content)
+        response = self.mixin.create_and_send_a_bulk_zip([self.project])
+        self.assertNotIn('X-Accel-Buffering', response)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        response.file_to_stream.close()
+
+
+@pytest.mark.unit
+class ParseCompressionTest(SimpleTestCase):
+    """ Test case for the compression option of the exports """
+
+    @parameterized.parameterized.expand([
+        ('stored', (zipfile.ZIP_STORED, None)),
+        ('deflated', (zipfile.ZIP_DEFLATED, None)),
+        ('Deflated:0', (zipfile.ZIP_DEFLATED, 0)),
+        ('bzip2:9', (zipfile.ZIP_BZIP2, 9)),
+        ('lzma', (zipfile.ZIP_LZMA, None)),
+    ])
+    def test_valid(self, spec, expected):
+        """ Method and level are parsed """
+        self.assertEqual(exports.parse_compression(spec), expected)
+
+    @parameterized.parameterized.expand([
+        ('zstd',),
+        ('stored:1',),
+        ('deflated:10',),
+        ('bzip2:0',),
+        ('deflated:fast',),
+    ])
+    def test_invalid(self, spec):
+        """ Unknown methods and levels are rejected """
+        with self.assertRaises(ValueError):
+            exports.parse_compression(spec)
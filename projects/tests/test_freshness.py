@@ -0,0 +1,55 @@
+import mock
+import pytest
+
+from django.test import TestCase
+
+from projects.models import AudioRecord, IntegrationProject, Source
+from projects.utils import freshness
+
+
+@pytest.mark.unit
+class ProjectTouchTest(TestCase):
+    """ TestCase for the batched 'IntegrationProject' freshness updates """
+
+    def setUp(self):
+        """ Setting up test environment """
+        self.project = IntegrationProject.objects.create(
+            name='Touched',
+            slug='touched'
+        )
+
+    @mock.patch('projects.utils.freshness._touch')
+    def test_touch_is_immediate_outside_of_batch(self, touch):
+        """ Checks: Project is touched right away without batch block """
+        freshness.touch_project(self.project.pk)
+        touch.assert_called_once_with([self.project.pk])
+
+    @mock.patch('projects.utils.freshness._touch')
+    def test_touches_are_merged_in_batch(self, touch):
+        """ Checks: Any amount of touches in the block costs single update """
+        with freshness.batched_project_touch():
+            with freshness.batched_project_touch():
+                freshness.touch_project(self.project.pk)
+            freshness.touch_project(self.project.pk)
+            touch.assert_not_called()
+        touch.assert_called_once_with({self.project.pk})
+
+    def test_record_save_updates_project(self):
+        """ Checks: Saved record moves project last_updated forward """
+        before = self.project.last_updated
+        AudioRecord.objects.create(
+            name='touch',
+            text='touch',
+            related_project=self.project,
+            source=Source.objects.first(),
+        )
+        self.project.refresh_from_db()
+        self.assertGreater(self.project.last_updated, before)
+
+    def test_batch_costs_single_update(self):
+        """ Checks: Touches of the block are flushed by one query """
+        other = IntegrationProject.objects.create(name='Other', slug='other')
+        with self.assertNumQueries(1):
+            with freshness.batched_project_touch():
+                for project in (self.project, other, self.project):
+                    freshness.touch_project(project.pk)
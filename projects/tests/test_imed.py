@@ -0,0 +1,52 @@
+import pytest
+
+from django.test import TestCase
+
+from lxml import objectify
+
+from projects.mixins.imed_based import ImedBuilderMixin
+from projects.models import AudioRecord, IntegrationProject, Source
+
+
+@pytest.mark.unit
+class ImedQueriesTest(TestCase):
+    """ Test case for the streamed .imed generation """
+
+    def setUp(self):
+        """ Project with the records """
+        self.project = IntegrationProject.objects.create(
+            name='Pog U',
+            slug='pog-u'
+        )
+        self.builder = ImedBuilderMixin()
+
+    def _make_records(self, first, last):
+        """ Add records to the project """
+        AudioRecord.objects.bulk_create(
+            AudioRecord(
+                name=f'{idx}_name',
+                text=f'{idx}_text',
+                related_project=self.project,
+                source=Source.objects.first(),
+            )
+            for idx in range(first, last)
+        )
+
+    def _sounds(self):
+        """ Sound elements of the .imed file (queries are counted) """
+        with self.assertNumQueries(2):
+            imed = self.builder.create_imed(AudioRecord.objects.all())
+        with imed:
+            return list(objectify.parse(imed.name).getroot().Sounds.Sound)
+
+    def test_queries_do_not_depend_on_records_amount(self):
+        """ Checks: Project slug is fetched once, records are streamed """
+        self._make_records(0, 3)
+        self.assertEqual(len(self._sounds()), 3)
+        self._make_records(3, 33)
+        sounds = self._sounds()
+        self.assertEqual(len(sounds), 33)
+        self.assertEqual(
+            sounds[0].attrib['file'],
+            './client/pog_u/audio/0_name.raw'
+        )
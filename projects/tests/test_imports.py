@@ -0,0 +1,74 @@
+import tempfile
+
+import mock
+import pytest
+
+from django.test import TestCase
+
+from projects.models import AudioRecord, IntegrationProject, Source
+from projects.utils import tasks
+
+
+@pytest.mark.unit
+class ImportOwnFilesTest(TestCase):
+    """ Import of the pre-recorded audio files """
+
+    def setUp(self):
+        """ Define project with records that could be replaced """
+        self.project = IntegrationProject.objects.create(
+            name='own',
+            slug='own'
+        )
+        for name in ('first', 'second'):
+            AudioRecord.objects.create(
+                name=name,
+                text=name,
+                related_project=self.project,
+                source=Source.objects.get(name='Yandex Speech Kit'),
+            )
+        self.conversion_patch = mock.patch.object(
+            tasks,
+            '_convert_own_file',
+            side_effect=lambda *_args: tempfile.NamedTemporaryFile(
+                suffix='.wav'
+            )
+        )
+
+    def tearDown(self):
+        """ Drop down stored media """
+        for instance in AudioRecord.objects.all():
+            instance.audio.delete()
+            instance.default_audio.delete()
+
+    def _import(self, *names):
+        """ Run import for the given file names """
+        files = {name: mock.Mock() for name in names}
+        with self.conversion_patch:
+            return list(tasks.import_own_files(
+                files,
+                qs=self.project.audiorecord_set.all(),
+                voice='Male'
+            ))
+
+    def test_known_records_are_replaced(self):
+        """ Checks: Records with the same name are updated with own audio """
+        results = self._import('first.wav', 'second.mp3')
+        actual = sorted(result['success'] for result in results)
+        self.assertEqual(actual, ['first', 'second'])
+        for record in self.project.audiorecord_set.all():
+            self.assertEqual(record.source.name, 'Voice actor')
+            self.assertEqual(record.voice, 'Male')
+            self.assertTrue(record.audio)
+
+    def test_unknown_files_are_reported(self):
+        """ Checks: Unknown names and extensions are reported as errors """
+        results = self._import('first.wav', 'third.wav', 'second.txt')
+        actual = sorted(
+            result['error'] for result in results if result['error']
+        )
+        self.assertEqual(actual, ['second.txt', 'third'])
+
+    def test_queries_do_not_depend_on_files_amount(self):
+        """ Checks: Records are fetched and stored in batches """
+        with self.assertNumQueries(4):
+            self._import('first.wav', 'second.wav')
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import mock
+import pytest
+
+from django.test import SimpleTestCase
+
+from projects.utils import tasks
+
+
+@pytest.mark.unit
+class AudioPipelineTest(SimpleTestCase):
+    """ Bounded synthesis pipeline of the converter """
+
+    def test_rows_in_flight_are_limited(self):
+        """ Checks: Phrases are submitted as results are consumed """
+        taken = []
+        rows = [{'ID': str(idx), 'TEXT': str(idx)} for idx in range(100)]
+        converter = tasks.DataToAudioConverter([], {}, None, workers=2)
+        limit = converter.ROWS_PER_WORKER * converter.workers
+        with mock.patch.object(
+                converter,
+                '_new_rows',
+                return_value=iter(rows)
+        ), mock.patch.object(
+            converter,
+            '_make_audio_content',
+            side_effect=taken.append
+        ), ThreadPoolExecutor(max_workers=2) as executor:
+            for consumed, _ in enumerate(
+                    converter._iter_converted(executor), start=1
+            ):
+                self.assertLessEqual(len(taken), consumed + limit)
+        self.assertEqual(consumed, 100)
+
+    def test_progress_is_reported(self):
+        """ Checks: Callback gets amounts of the done and failed rows """
+        progress = mock.Mock()
+        converter = tasks.DataToAudioConverter(
+            [],
+            {},
+            None,
+            workers=2,
+            progress=progress
+        )
+        failed = mock.Mock()
+        failed.result.side_effect = RuntimeError
+        rows = [([{'ID': str(idx)}], failed) for idx in range(2)]
+        with mock.patch.object(
+                converter,
+                '_iter_converted',
+                return_value=iter(rows)
+        ):
+            errors = converter.make_audio_files()
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(
+            progress.call_args_list,
+            [mock.call(1, 1), mock.call(2, 2)]
+        )
+
+    def test_repeated_phrases_are_synthesized_once(self):
+        """ Checks: Records of the same phrase share single synthesis """
+        rows = [
+            {'ID': '1', 'TEXT': 'Hello,  world'},
+            {'ID': '2', 'TEXT': 'Bye'},
+            {'ID': '3', 'TEXT': ' Hello, world\n'},
+        ]
+        converter = tasks.DataToAudioConverter([], {}, None, workers=2)
+        saved = []
+        with mock.patch.object(
+                converter,
+                '_new_rows',
+                return_value=iter(rows)
+        ), mock.patch.object(
+            converter,
+            '_make_audio_content',
+            return_value=(None, mock.Mock())
+        ) as synthesis, mock.patch.object(
+            converter,
+            '_save_record',
+            side_effect=lambda row, *_args: saved.append(row['ID'])
+        ), mock.patch.object(converter, '_persist', return_value=[]):
+            self.assertEqual(converter.make_audio_files(), [])
+        self.assertEqual(synthesis.call_count, 2)
+        self.assertEqual(sorted(saved), ['1', '2', '3'])
+        self.assertEqual(
+            converter.stats,
+            {'rows': 3, 'synthesized': 2, 'deduplicated': 1}
+        )
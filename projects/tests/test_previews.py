@@ -0,0 +1,157 @@
+import os
+
+import mock
+import pytest
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from projects.models import AudioRecord, IntegrationProject, Source
+from projects.tests.test_utils.cases import IsolatedFilesMixin
+from projects.utils import previews
+
+
+@pytest.mark.unit
+class AudioPreviewTest(IsolatedFilesMixin, SimpleTestCase):
+    """ Test case for the compressed audio previews """
+    isolated_caches = (previews.previews,)
+
+    def setUp(self):
+        """ Isolated cache and stored audio """
+        super().setUp()
+        self.audio = mock.Mock(path=os.path.join(self.location, 'a.wav'))
+        self.audio.name = 'records/a.wav'
+        self._store(b'RIFF')
+        self.encoding_patch = mock.patch.object(
+            previews.pydub.AudioSegment,
+            'from_wav'
+        )
+        self.from_wav = self.encoding_patch.start()
+        self.from_wav.return_value.export.side_effect = self._export
+
+    def tearDown(self):
+        """ Drop the encoding patch """
+        self.encoding_patch.stop()
+
+    def isolated_settings(self):
+        """ Previews are cached in the temp directory """
+        return {
+            'AUDIO_CACHE_ROOT': self.location,
+            'PREVIEWS_MAX_SIZE': 2 ** 20,
+        }
+
+    @staticmethod
+    def _export(name, **_kwargs):
+        """ Imitation of the encoder """
+        with open(name, 'wb') as encoded:
+            encoded.write(b'mp3')
+
+    def _store(self, data):
+        """ Replace stored audio with the new file """
+        temp_path = f'{self.audio.path}.new'
+        with open(temp_path, 'wb') as stored:
+            stored.write(data)
+        os.replace(temp_path, self.audio.path)
+
+    def test_preview_is_encoded_once(self):
+        """ Checks: Same audio is encoded only on the first request """
+        path, etag = previews.audio_preview(self.audio)
+        self.assertEqual(previews.audio_preview(self.audio), (path, etag))
+        self.from_wav.assert_called_once_with(self.audio.path)
+        with open(path, 'rb') as preview:
+            self.assertEqual(preview.read(), b'mp3')
+
+    def test_changed_audio_gets_new_preview(self):
+        """ Checks: Preview is bound to the stored file """
+        _, etag = previews.audio_preview(self.audio)
+        self._store(b'RIFF2')
+        self.assertNotEqual(previews.audio_preview(self.audio)[1], etag)
+        self.assertEqual(self.from_wav.call_count, 2)
+
+    def test_compressed_format_is_requested(self):
+        """ Checks: Preview is mp3 with the configured bitrate """
+        with override_settings(PREVIEW_BITRATE='16k'):
+            previews.audio_preview(self.audio)
+        _, kwargs = self.from_wav.return_value.export.call_args
+        self.assertEqual(kwargs, {'format': 'mp3', 'bitrate': '16k'})
+
+
+@pytest.mark.unit
+class PreviewViewTest(IsolatedFilesMixin, TestCase):
+    """ Test case for the previews sent by nginx """
+
+    def setUp(self):
+        """ Record with the stored audio and its cached preview """
+        super().setUp()
+        self.client = APIClient()
+        self.entry = AudioRecord.objects.create(
+            name='Preview',
+            text='Preview',
+            related_project=IntegrationProject.objects.create(
+                name='Previews',
+                slug='previews'
+            ),
+            source=Source.objects.first(),
+            voice='alyss',
+            audio='records/a.wav',
+            default_audio='records/a.wav'
+        )
+        self.preview = os.path.join(self.location, '.cache', 'a.mp3')
+        for path in (self.entry.audio.path, self.preview):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as stored:
+                stored.write(b'RIFF')
+        self.preview_patch = mock.patch(
+            'projects.api.views.audio_related.audio_preview',
+            return_value=(self.preview, 'abc')
+        )
+        self.preview_patch.start()
+
+    def tearDown(self):
+        """ Drop the preview patch """
+        self.preview_patch.stop()
+
+    def isolated_settings(self):
+        """ Media is stored in the temp directory, served by nginx """
+        return {
+            'MEDIA_ROOT': self.location,
+            'SENDFILE_X_ACCEL': True,
+            'SENDFILE_LOCATIONS': ((self.location, '/protected/media/'),),
+        }
+
+    def _get(self, name, data=None, **extra):
+        """ Answer of the record endpoint """
+        return self.client.get(
+            reverse(name, args=['previews', self.entry.pk]),
+            data,
+            **extra
+        )
+
+    def test_preview_is_sent_by_nginx(self):
+        """ Checks: Preview is redirected with its own ETag """
+        response = self._get('api:audio-preview')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected/media/.cache/a.mp3'
+        )
+        self.assertEqual(response['Content-Type'], 'audio/mpeg')
+        self.assertTrue(response['Content-Disposition'].startswith('inline'))
+        self.assertEqual(response['ETag'], '"abc"')
+
+    def test_same_preview_is_not_sent(self):
+        """ Checks: Django answers 304 to the client with the same ETag """
+        response = self._get('api:audio-preview', HTTP_IF_NONE_MATCH='"abc"')
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.has_header('X-Accel-Redirect'))
+
+    def test_speed_preview_is_sent_by_nginx(self):
+        """ Checks: Audio of the usual speed is redirected as is """
+        response = self._get('api:audio-speed-preview', {'speed': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected/media/records/a.wav'
+        )
+        self.assertIn('private', response['Cache-Control'])
@@ -0,0 +1,306 @@
+import hashlib
+import importlib
+
+import mock
+import pytest
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+
+from projects.models import AudioRecord, IntegrationProject, Source
+from projects.tests.test_utils.cases import IsolatedFilesMixin
+from projects.utils import tasks
+from projects.utils.waveform import AudioSummary
+
+
+class RecordTestCase(IsolatedFilesMixin, TestCase):
+    """ Project in the database and media in the isolated directory """
+
+    def setUp(self):
+        """ Project without records """
+        super().setUp()
+        self.project = IntegrationProject.objects.create(
+            name='Records',
+            slug='records'
+        )
+        self.source = Source.objects.first()
+
+    def isolated_settings(self):
+        """ Media is stored in the temp directory """
+        return {'MEDIA_ROOT': self.location}
+
+    def _record(self, name, project=None):
+        """ Record of the project (not saved) """
+        return AudioRecord(
+            name=name,
+            text=name,
+            related_project=project or self.project,
+            source=self.source
+        )
+
+    @staticmethod
+    def _content(field_file):
+        """ Content of the stored file """
+        with field_file.storage.open(field_file.name) as stored:
+            return stored.read()
+
+
+@pytest.mark.unit
+class RecordNameTest(RecordTestCase):
+    """ Test case for the unique record names within the project """
+
+    def test_name_is_unique_within_project(self):
+        """ Checks: DB refuses duplicating record name in the same project """
+        self._record('fake').save()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self._record('fake').save()
+
+    def test_name_may_repeat_in_other_project(self):
+        """ Checks: Same record name is allowed for the different projects """
+        other = IntegrationProject.objects.create(name='Other', slug='other')
+        self._record('fake').save()
+        self._record('fake', other).save()
+        self.assertEqual(AudioRecord.objects.filter(name='fake').count(), 2)
+
+    def test_duplicates_are_removed_by_migration(self):
+        """ Checks: Earliest record of the duplicating name is kept """
+        migration = importlib.import_module(
+            'projects.migrations.0007_remove_duplicating_records'
+        )
+        # DDL is transactional, index is back after the test
+        with connection.schema_editor() as editor:
+            editor.alter_unique_together(
+                AudioRecord,
+                [('related_project', 'name')],
+                []
+            )
+        storage = AudioRecord.audio.field.storage
+        kept = storage.save('records/records/kept.wav', ContentFile(b'1'))
+        lost = storage.save('records/records/lost.wav', ContentFile(b'2'))
+        first, second, other = [
+            AudioRecord.objects.create(
+                name=name,
+                text=name,
+                related_project=self.project,
+                source=self.source,
+                audio=audio,
+                default_audio=kept
+            )
+            for name, audio in (
+                ('fake', kept),
+                ('fake', lost),
+                ('other', None),
+            )
+        ]
+        migration.remove_duplicates(apps, None)
+        self.assertEqual(
+            list(self.project.audiorecord_set.order_by('pk')),
+            [first, other]
+        )
+        self.assertTrue(storage.exists(kept))  # Kept record refers it
+        self.assertFalse(storage.exists(lost))
+
+    def test_losing_record_keeps_winner_audio(self):
+        """ Checks: Staged audio of the duplicate is not the winner audio """
+        winner = self._record('fake')
+        winner.stage_audio('fake.wav', ContentFile(b'win'), 'fake-d.wav')
+        winner.save()
+        winner.save(update_fields=winner.publish_audio())
+        loser = self._record('fake')
+        loser.stage_audio('fake.wav', ContentFile(b'lose'), 'fake-d.wav')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            loser.save()
+        loser.discard_audio()
+        winner.refresh_from_db()
+        self.assertEqual(winner.audio.name, 'records/records/fake.wav')
+        self.assertEqual(self._content(winner.audio), b'win')
+        self.assertEqual(self._content(winner.default_audio), b'win')
+
+
+@pytest.mark.unit
+class PersistRecordsTest(RecordTestCase):
+    """ Test case for the batched insert of the imported records """
+
+    def setUp(self):
+        """ Converter of the project """
+        super().setUp()
+        self.converter = tasks.DataToAudioConverter(
+            [],
+            {
+                'project': self.project,
+                'emotion': 'neutral',
+                'voice': 'alyss',
+                'source': self.source,
+                'speed': 1,
+            },
+            None
+        )
+        self.storage = AudioRecord.audio.field.storage
+
+    def _staged(self, name, content):
+        """ Record with the staged audio """
+        record = self._record(name)
+        record.stage_audio(
+            f'{name}.wav',
+            ContentFile(content),
+            f'{name}-default.wav'
+        )
+        return record
+
+    def test_taken_name_is_reported(self):
+        """ Checks: Record that took the name keeps its audio """
+        existing = self._staged('first', b'old')
+        existing.save()
+        existing.save(update_fields=existing.publish_audio())
+        errors = self.converter._persist([
+            self._staged('first', b'new'),
+            self._staged('second', b'new'),
+        ])
+        self.assertEqual(errors, ['Audio with id first already exists'])
+        existing.refresh_from_db()
+        self.assertEqual(self._content(existing.audio), b'old')
+        second = AudioRecord.objects.get(name='second')
+        self.assertEqual(second.audio.name, 'records/records/second.wav')
+        self.assertEqual(
+            second.default_audio.name,
+            'records:default-audio/records/second-default.wav'
+        )
+        self.assertEqual(self._content(second.audio), b'new')
+
+    def test_staged_files_are_not_left(self):
+        """ Checks: Only the final names are stored """
+        self._staged('first', b'old').save()
+        self.converter._persist([self._staged('first', b'new')])
+        self.assertEqual(
+            self.storage.listdir('records/records')[1],
+            [AudioRecord.objects.get().audio.name.split('/')[-1]]
+        )
+
+    def _convert(self, *groups):
+        """ Run the converter over the synthesized groups of rows """
+        def converted(_executor):
+            for ids in groups:
+                future = mock.Mock()
+                future.result.return_value = (None, ContentFile(b'data'))
+                yield [{'ID': name, 'TEXT': 'phrase'} for name in ids], future
+
+        with mock.patch.object(
+                self.converter,
+                '_iter_converted',
+                side_effect=converted
+        ):
+            return self.converter.make_audio_files()
+
+    def test_failed_row_keeps_the_batch(self):
+        """ Checks: Row that is not staged does not drop the others """
+        save_record = self.converter._save_record
+
+        def save(row, *args):
+            if row['ID'] == 'second':
+                raise OSError
+            return save_record(row, *args)
+
+        with mock.patch.object(
+                self.converter,
+                '_save_record',
+                side_effect=save
+        ):
+            errors = self._convert(['first', 'second'])
+        self.assertEqual(errors, ['Save failed for audio with id second'])
+        first = AudioRecord.objects.get()
+        self.assertEqual(first.audio.name, 'records/records/first.wav')
+
+    def test_broken_import_leaves_no_staged_files(self):
+        """ Checks: Audio of the records that are not inserted is deleted """
+        with mock.patch.object(
+                self.converter,
+                '_iter_converted',
+                side_effect=lambda _executor: self._broken()
+        ), self.assertRaises(RuntimeError):
+            self.converter.make_audio_files()
+        self.assertFalse(AudioRecord.objects.exists())
+        self.assertEqual(self.storage.listdir('records/records')[1], [])
+
+    @staticmethod
+    def _broken():
+        """ Single synthesized phrase, then the failure """
+        future = mock.Mock()
+        future.result.return_value = (None, ContentFile(b'data'))
+        yield [{'ID': 'first', 'TEXT': 'phrase'}], future
+        raise RuntimeError
+
+    def test_partly_staged_record_is_discarded(self):
+        """ Checks: Audio is deleted if the default one is not stored """
+        with mock.patch.object(
+                self.storage,
+                'link',
+                side_effect=OSError
+        ), self.assertRaises(OSError):
+            self.converter._save_record(
+                {'ID': 'first', 'TEXT': 'phrase'},
+                None,
+                ContentFile(b'data')
+            )
+        self.assertEqual(self.storage.listdir('records/records')[1], [])
+
+
+@pytest.mark.unit
+class AudioSummaryTest(RecordTestCase):
+    """ TestCase for the duration and waveform peaks of the records """
+
+    def setUp(self):
+        """ Record without audio """
+        super().setUp()
+        self.record = self._record('summary')
+        self.record.save()
+
+    @mock.patch(
+        'projects.models.audiorecord.summarize',
+        return_value=AudioSummary(1.5, 12000, [0, 100])
+    )
+    def test_summary_is_made_once(self, summarize):
+        """ Checks: Audio is read only when it is changed """
+        self.record.save_audio(
+            'summary.wav',
+            ContentFile(b'RIFF'),
+            'summary-default.wav'
+        )
+        self.record.save()
+        record = AudioRecord.objects.get(pk=self.record.pk)
+        record.save()
+        summarize.assert_called_once_with(self.record.audio.path)
+        self.assertEqual(record.duration, 1.5)
+        self.assertEqual(record.sample_count, 12000)
+        self.assertEqual(record.waveform_peaks, [0, 100])
+        self.assertEqual(record.audio_size, 4)
+        self.assertEqual(
+            record.audio_hash,
+            hashlib.sha256(b'RIFF').hexdigest()
+        )
+
+    def test_record_without_audio(self):
+        """ Checks: There is no summary without audio """
+        self.assertIsNone(self.record.duration)
+        self.assertIsNone(self.record.audio_size)
+        self.assertEqual(self.record.waveform_peaks, [])
+
+    def test_stored_digest_is_reused(self):
+        """ Checks: Content is hashed once, while it is stored """
+        with mock.patch(
+                'projects.utils.storage.file_digest'
+        ) as digest, mock.patch(
+            'projects.models.audiorecord.file_digest'
+        ) as record_digest:
+            self.record.save_audio(
+                'summary.wav',
+                ContentFile(b'RIFF'),
+                'summary-default.wav'
+            )
+        digest.assert_not_called()
+        record_digest.assert_not_called()
+        self.assertEqual(
+            self.record.audio_hash,
+            hashlib.sha256(b'RIFF').hexdigest()
+        )
@@ -0,0 +1,237 @@
+import os
+import tempfile
+from unittest import mock
+
+import pytest
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from projects.tests.test_utils.cases import IsolatedFilesMixin
+from projects.utils.storage import (
+    DeduplicatingStorage,
+    OverwriteStorage,
+    TempFile,
+    temp_copy
+)
+
+
+@pytest.mark.unit
+class OverwriteStorageTest(IsolatedFilesMixin, SimpleTestCase):
+    """ Test case for the media storage """
+
+    def setUp(self):
+        """ Storage in the isolated directory """
+        super().setUp()
+        self.storage = OverwriteStorage(location=self.location)
+
+    def test_file_is_overwritten(self):
+        """ Checks: Same name is reused instead of generating a new one """
+        self.storage.save('records/a.wav', ContentFile(b'old'))
+        name = self.storage.save('records/a.wav', ContentFile(b'new'))
+        self.assertEqual(name, 'records/a.wav')
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'new')
+
+    def test_overwrite_skips_exists_and_delete(self):
+        """ Checks: Overwrite is a single rename, no extra file syscalls """
+        self.storage.save('records/a.wav', ContentFile(b'old'))
+        with mock.patch.object(self.storage, 'exists') as exists, \
+                mock.patch.object(self.storage, 'delete') as delete:
+            self.storage.save('records/a.wav', ContentFile(b'new'))
+        exists.assert_not_called()
+        delete.assert_not_called()
+
+    def test_no_temp_files_are_left(self):
+        """ Checks: Temp file is renamed over the target or removed """
+        self.storage.save('records/a.wav', ContentFile(b'old'))
+        with mock.patch('os.replace', side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.storage.save('records/a.wav', ContentFile(b'new'))
+        self.assertEqual(
+            os.listdir(self.storage.path('records')),
+            ['a.wav']
+        )
+        with self.storage.open('records/a.wav') as stored:
+            self.assertEqual(stored.read(), b'old')
+
+    def test_temp_file_is_not_read(self):
+        """ Checks: Temp file is linked into storage, not read into memory """
+        with tempfile.NamedTemporaryFile(dir=self.location) as temp:
+            temp.write(b'data')
+            temp.flush()
+            content = TempFile(temp)
+            with mock.patch.object(content, 'chunks') as chunks:
+                name = self.storage.save('records/a.wav', content)
+            chunks.assert_not_called()
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'data')
+        self.assertEqual(os.stat(self.storage.path(name)).st_mode & 0o777,
+                         0o644)
+
+    def test_temp_file_is_copied_across_devices(self):
+        """ Checks: Content is copied if temp file can't be linked """
+        with tempfile.NamedTemporaryFile() as temp:
+            temp.write(b'data' * 2 ** 16)
+            temp.flush()
+            with mock.patch('os.link', side_effect=OSError):
+                name = self.storage.save('records/a.wav', TempFile(temp))
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'data' * 2 ** 16)
+
+    def test_link_does_not_copy_content(self):
+        """ Checks: Linked name shares content with the source file """
+        source = self.storage.save('records/a.wav', ContentFile(b'data'))
+        name = self.storage.link(source, 'default/a-default.wav')
+        self.assertEqual(name, 'default/a-default.wav')
+        self.assertTrue(os.path.samefile(
+            self.storage.path(source),
+            self.storage.path(name)
+        ))
+
+    def test_linked_content_survives_source_deletion(self):
+        """ Checks: Content is freed only after both names are deleted """
+        source = self.storage.save('records/a.wav', ContentFile(b'data'))
+        name = self.storage.link(source, 'default/a-default.wav')
+        self.storage.delete(source)
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'data')
+
+    def test_move_keeps_content(self):
+        """ Checks: Moved file is renamed, its content is not copied """
+        source = self.storage.save('records/.a.part', ContentFile(b'data'))
+        inode = os.stat(self.storage.path(source)).st_ino
+        name = self.storage.move(source, 'records/a.wav')
+        self.assertEqual(name, 'records/a.wav')
+        self.assertFalse(self.storage.exists(source))
+        self.assertEqual(os.stat(self.storage.path(name)).st_ino, inode)
+
+    def test_long_name_is_truncated(self):
+        """ Checks: Name is fitted into the DB column length """
+        source = self.storage.save('records/a.wav', ContentFile(b'data'))
+        name = self.storage.link(source, f'default/{"a" * 120}.wav', 100)
+        self.assertLessEqual(len(name), 100)
+        self.assertTrue(name.endswith('.wav'))
+
+
+@pytest.mark.unit
+class DeduplicatingStorageTest(IsolatedFilesMixin, SimpleTestCase):
+    """ Test case for the content-addressed media storage """
+
+    def setUp(self):
+        """ Storage in the isolated directory """
+        super().setUp()
+        self.storage = DeduplicatingStorage(location=self.location)
+
+    def _blobs(self):
+        """ Stored blob paths """
+        return [path for path, _ in self.storage.iter_blobs()]
+
+    def test_identical_content_is_stored_once(self):
+        """ Checks: Same content under different names shares one blob """
+        first = self.storage.save('one/a.wav', ContentFile(b'data'))
+        second = self.storage.save('two/b.wav', ContentFile(b'data'))
+        self.assertTrue(os.path.samefile(
+            self.storage.path(first),
+            self.storage.path(second)
+        ))
+        self.assertEqual(len(self._blobs()), 1)
+
+    def test_blob_is_deleted_with_last_name(self):
+        """ Checks: Blob lives while at least one name refers to it """
+        first = self.storage.save('one/a.wav', ContentFile(b'data'))
+        second = self.storage.save('two/b.wav', ContentFile(b'data'))
+        self.storage.delete(first)
+        self.assertEqual(len(self._blobs()), 1)
+        self.storage.delete(second)
+        self.assertEqual(self._blobs(), [])
+
+    def test_overwrite_keeps_other_names(self):
+        """ Checks: Overwriting the name does not change linked content """
+        first = self.storage.save('one/a.wav', ContentFile(b'data'))
+        self.storage.save('two/b.wav', ContentFile(b'data'))
+        self.storage.save(first, ContentFile(b'new data'))
+        with self.storage.open('two/b.wav') as stored:
+            self.assertEqual(stored.read(), b'data')
+        with self.storage.open(first) as stored:
+            self.assertEqual(stored.read(), b'new data')
+
+    def test_move_releases_replaced_blob(self):
+        """ Checks: Blob of the replaced name is deleted with it """
+        self.storage.save('one/a.wav', ContentFile(b'old'))
+        staged = self.storage.save('one/.a.wav', ContentFile(b'new'))
+        self.storage.move(staged, 'one/a.wav')
+        self.assertEqual(len(self._blobs()), 1)
+        with self.storage.open('one/a.wav') as stored:
+            self.assertEqual(stored.read(), b'new')
+
+    def test_link_releases_replaced_blob(self):
+        """ Checks: Blob of the name replaced by the link is deleted """
+        self.storage.save('one/a.wav', ContentFile(b'old'))
+        source = self.storage.save('one/b.wav', ContentFile(b'new'))
+        self.storage.link(source, 'one/a.wav')
+        self.assertEqual(len(self._blobs()), 1)
+        with self.storage.open('one/a.wav') as stored:
+            self.assertEqual(stored.read(), b'new')
+
+    def test_temp_file_is_deduplicated(self):
+        """ Checks: Linked temp file shares blob with the same content """
+        first = self.storage.save('one/a.wav', ContentFile(b'data'))
+        with tempfile.NamedTemporaryFile() as temp:
+            temp.write(b'data')
+            temp.flush()
+            second = self.storage.save('two/b.wav', TempFile(temp))
+        self.assertTrue(os.path.samefile(
+            self.storage.path(first),
+            self.storage.path(second)
+        ))
+        self.assertEqual(len(self._blobs()), 1)
+
+    def test_file_with_other_names_is_copied(self):
+        """ Checks: Content linked elsewhere (cache) is not the blob """
+        with tempfile.NamedTemporaryFile(dir=self.location) as temp:
+            temp.write(b'data')
+            temp.flush()
+            cached = f'{temp.name}.cached'
+            os.link(temp.name, cached)
+            name = self.storage.save('one/a.wav', TempFile(temp))
+        self.assertFalse(os.path.samefile(cached, self.storage.path(name)))
+        self.storage.delete(name)
+        self.assertEqual(self._blobs(), [])
+
+    def test_copy_of_cache_entry_is_released(self):
+        """ Checks: Saved copy of the cached file is freed with the name """
+        cached = os.path.join(self.location, 'cached.wav')
+        with open(cached, 'wb') as entry:
+            entry.write(b'data')
+        with temp_copy(cached) as content:
+            name = self.storage.save('one/a.wav', content)
+        self.storage.save(name, ContentFile(b'other'))
+        self.assertEqual(len(self._blobs()), 1)
+        self.assertEqual(os.stat(cached).st_nlink, 1)
+
+    def test_digest_is_not_recomputed(self):
+        """ Checks: Overwrite and delete read the digest of the blob """
+        name = self.storage.save('one/a.wav', ContentFile(b'data'))
+        with mock.patch('projects.utils.storage.file_digest') as digest:
+            self.storage.save(name, ContentFile(b'new data'))
+            self.storage.delete(name)
+        digest.assert_not_called()
+        self.assertEqual(self._blobs(), [])
+
+    def test_adopt_links_existing_duplicates(self):
+        """ Checks: Legacy files are moved into blobs and deduplicated """
+        for name in ('one/a.wav', 'two/b.wav'):
+            os.makedirs(os.path.dirname(self.storage.path(name)))
+            with open(self.storage.path(name), 'wb') as legacy:
+                legacy.write(b'data')
+        self.assertEqual(self.storage.adopt('one/a.wav'), 0)
+        self.assertEqual(self.storage.adopt('two/b.wav'), 4)
+        self.assertEqual(len(self._blobs()), 1)
+
+    def test_garbage_is_collected(self):
+        """ Checks: Blobs without names are deleted by the collector """
+        name = self.storage.save('one/a.wav', ContentFile(b'data'))
+        os.remove(self.storage.path(name))  # e.g. removed outside of Django
+        self.assertEqual(self.storage.collect_garbage(), (1, 4))
+        self.assertEqual(self._blobs(), [])
@@ -0,0 +1,31 @@
+import parameterized
+import pytest
+
+from django.test import SimpleTestCase
+
+from projects.utils.text import normalize_text
+
+
+@pytest.mark.unit
+class NormalizeTextTest(SimpleTestCase):
+    """ Test case for the canonical form of the phrases """
+
+    @parameterized.parameterized.expand([
+        ('  Добрый\n день\t', 'Добрый день'),
+        ('«Компания» “Рога”', '"Компания" "Рога"'),
+        ('It’s', "It's"),
+        ('Сумма 1\u00a0000\u202f000 рублей', 'Сумма 1000000 рублей'),
+        ('В 2\u2009000 году', 'В 2000 году'),
+        ('Звоните 8 800 555 35 35', 'Звоните 8 800 555 35 35'),
+        ('5 100 минут', '5 100 минут'),
+        ('Квартира 12 34', 'Квартира 12 34'),
+        ('Алло , да !', 'Алло, да!'),
+        ('Сло\u00adво\u200b', 'Слово'),
+        ('\u0438\u0306', '\u0439'),  # Decomposed short i
+        ('№ 5', '№ 5'),
+        ('ООО', 'ООО'),
+        (15.5, '15.5'),
+    ])
+    def test_normalize(self, text, expected):
+        """ Checks: Same phrase has the same canonical form """
+        self.assertEqual(normalize_text(text), expected)
@@ -0,0 +1,37 @@
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, Iterable
+
+from django.test import override_settings
+
+
+class IsolatedFilesMixin(object):
+    """ Test case mixin. Gives every test its own temp directory
+
+    Notes:
+        Settings returned by `isolated_settings` are overridden for the
+        test and the `isolated_caches` are cleared before and after it,
+        so cached instances never point into the erased directory.
+        Cleanups run after `tearDown` of the test case.
+    """
+    isolated_caches: Iterable[Callable] = ()
+
+    def setUp(self):
+        """ Create the directory and switch the settings into it """
+        super().setUp()
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        settings_patch = override_settings(**self.isolated_settings())
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        for cached in self.isolated_caches:
+            cached.cache_clear()
+            self.addCleanup(cached.cache_clear)
+
+    def isolated_settings(self) -> Dict[str, Any]:
+        """ Settings of the test, paths are built from `self.location`
+
+        Returns:
+            Keyword arguments of `override_settings`
+        """
+        return {}
@@ -0,0 +1,81 @@
+import threading
+
+import mock
+import pytest
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from projects.utils.warmer import DraftWarmer
+
+
+@pytest.mark.unit
+class DraftWarmerTest(SimpleTestCase):
+    """ Test case for the debounced synthesis of the drafts """
+
+    def setUp(self):
+        """ Warmer with the short delay and the builder that signals """
+        self.shared = LocMemCache('drafts', {})
+        self.warmer = DraftWarmer(0.05, shared=self.shared)
+        self.warmed = threading.Event()
+        self.builder = mock.Mock()
+        self.builder.warm.side_effect = lambda *args: self.warmed.set()
+        self.presets = {'voice': 'alena', 'emotion': 'good'}
+
+    def test_last_edit_is_warmed(self):
+        """ Checks: Edits made within the delay are warmed once """
+        for text in ('П', 'Пр', 'Привет'):
+            self.warmer.schedule('draft', self.builder, text, self.presets)
+        self.assertTrue(self.warmed.wait(5))
+        self.builder.warm.assert_called_once_with(
+            'Привет',
+            self.presets,
+            ()
+        )
+        self.assertEqual(self.warmer.pending(), 0)
+
+    def test_drafts_are_independent(self):
+        """ Checks: Edit of the other draft does not cancel the warming """
+        texts = []
+        self.builder.warm.side_effect = lambda text, *args: (
+            texts.append(text) or len(texts) == 2 and self.warmed.set()
+        )
+        self.warmer.schedule('first', self.builder, 'Один', self.presets)
+        self.warmer.schedule('second', self.builder, 'Два', self.presets)
+        self.assertTrue(self.warmed.wait(5))
+        self.assertEqual(sorted(texts), ['Два', 'Один'])
+
+    def test_cancel(self):
+        """ Checks: Saved draft is not warmed """
+        self.warmer.schedule('draft', self.builder, 'Привет', self.presets)
+        self.warmer.cancel('draft')
+        self.assertFalse(self.warmed.wait(0.2))
+        self.assertEqual(self.warmer.pending(), 0)
+
+    def test_last_edit_of_other_process_is_warmed(self):
+        """ Checks: Process with the outdated edit does not warm it """
+        other = DraftWarmer(0.05, shared=self.shared)
+        self.warmer.schedule('draft', self.builder, 'Прив', self.presets)
+        outdated = self.warmer._timers['draft']
+        other.schedule('draft', self.builder, 'Привет', self.presets)
+        self.assertTrue(self.warmed.wait(5))
+        outdated.join(5)
+        self.builder.warm.assert_called_once_with(
+            'Привет',
+            self.presets,
+            ()
+        )
+
+    def test_cancel_in_other_process(self):
+        """ Checks: Draft saved through the other process is not warmed """
+        other = DraftWarmer(0.05, shared=self.shared)
+        self.warmer.schedule('draft', self.builder, 'Привет', self.presets)
+        other.cancel('draft')
+        self.assertFalse(self.warmed.wait(0.2))
+
+    def test_errors_are_not_raised(self):
+        """ Checks: Failed warming is only logged """
+        self.builder.warm.side_effect = RuntimeError
+        with mock.patch('projects.utils.warmer.logger') as logger:
+            DraftWarmer._warm(self.builder, 'Привет', self.presets, ())
+        logger.exception.assert_called_once()
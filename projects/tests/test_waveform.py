@@ -0,0 +1,59 @@
+import os
+import tempfile
+import wave
+
+import pytest
+
+from django.test import SimpleTestCase
+
+from projects.utils import waveform
+
+
+@pytest.mark.unit
+class SummarizeTest(SimpleTestCase):
+    """ Test case for the audio summary """
+
+    def setUp(self):
+        """ Wav file: one second of silence, then one second of tone """
+        descriptor, self.path = tempfile.mkstemp(suffix='.wav')
+        os.close(descriptor)
+        with wave.open(self.path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(b'\x00\x00' * 8000)
+            wav.writeframes((16384).to_bytes(2, 'little', signed=True) * 8000)
+
+    def tearDown(self):
+        """ Remove the wav file """
+        os.remove(self.path)
+
+    def test_duration(self):
+        """ Checks: Duration is measured in seconds and samples """
+        summary = waveform.summarize(self.path)
+        self.assertEqual(summary.duration, 2.0)
+        self.assertEqual(summary.sample_count, 16000)
+
+    def test_peaks(self):
+        """ Checks: Peaks follow the loudness of the parts """
+        summary = waveform.summarize(self.path, bins=4)
+        self.assertEqual(summary.peaks, [0, 0, 50, 50])
+
+    def test_default_amount_of_peaks(self):
+        """ Checks: Summary is compact whatever the duration is """
+        summary = waveform.summarize(self.path)
+        self.assertEqual(len(summary.peaks), waveform.WAVEFORM_BINS)
+
+    def test_not_wav(self):
+        """ Checks: Broken file has no summary """
+        with open(self.path, 'wb') as broken:
+            broken.write(b'\x89PNG\r\n\x1a\n')
+        self.assertEqual(
+            waveform.summarize(self.path),
+            waveform.AudioSummary(None, None, [])
+        )
+
+    def test_empty_summaries_are_independent(self):
+        """ Checks: Peaks of the empty summary are not shared """
+        waveform.empty_summary().peaks.append(100)
+        self.assertEqual(waveform.empty_summary().peaks, [])
@@ -1,12 +1,15 @@
 import json
 
+import mock
 import pytest
 
+from django.conf import settings
 from django.urls import reverse
 from rest_framework.test import APIClient
 
 from projects.api.serializers import RecordSerializer
-from projects.models import IntegrationProject, AudioRecord
+from projects.api.views.audio_related import UpdateRecordView
+from projects.models import IntegrationProject, AudioRecord, Source
 
 pytestmark = pytest.mark.django_db
 
@@ -29,18 +32,141 @@ class TestAudiorecords(object):
             playing_speed=1.0,
             emote='neutral',
             related_project=self.project,
-            tts_backend_id=1,
-            voice_id=1
+            source=Source.objects.first(),
+            voice='alyss'
         )
 
     def test_get_audio_list(self):
         """ Checks: Fetch list with audios """
         self.setup_project()
         response = self.client.get(
-            path=reverse('api-audio-records-list', args=[self.project.slug])
+            path=reverse('api:audio-records-list', args=[self.project.slug])
         )
         actual = json.loads(response.content)
         expected = [
             RecordSerializer(self.project.audiorecord_set.first()).data
         ]
         assert actual == expected
+
+    def test_get_audio_list_not_modified(self):
+        """ Checks: Unchanged list is answered with 304 via weak ETag """
+        self.setup_project()
+        path = reverse('api:audio-records-list', args=[self.project.slug])
+        response = self.client.get(path=path)
+        assert response['ETag'].startswith('W/')
+        assert response.has_header('Last-Modified')
+        cached = self.client.get(
+            path=path,
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        assert cached.status_code == 304
+
+    def test_get_audio_list_modified_after_delete(self):
+        """ Checks: ETag is changed after record removal """
+        self.setup_project()
+        path = reverse('api:audio-records-list', args=[self.project.slug])
+        response = self.client.get(path=path)
+        self.project.audiorecord_set.all().delete()
+        actual = self.client.get(
+            path=path,
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        assert actual.status_code == 200
+        assert actual['ETag'] != response['ETag']
+
+
+@pytest.mark.audiorecords_api
+@pytest.mark.api
+class TestSpeedOnlyUpdate(object):
+    """ Case for detecting updates that do not need re-synthesis """
+
+    def setup_method(self):
+        """ Stored record (DB is not touched) """
+        self.entry = AudioRecord(
+            name='Test1',
+            text='Assert me',
+            voice='alyss',
+            emote='neutral',
+            source_id=1,
+            default_audio='default/Test1-default.wav'
+        )
+
+    @pytest.mark.parametrize('data', [
+        {'tts': '1', 'speed': '1.5'},
+        {'tts': 1, 'speed': '0.5', 'text': 'Assert me'},
+        {'tts': '1', 'speed': '2.0', 'emotion': 'neutral'},
+    ])
+    def test_speed_only(self, data):
+        """ Checks: Speed (with unchanged fields) is a local update """
+        assert UpdateRecordView._is_speed_only(self.entry, data)
+
+    @pytest.mark.parametrize('data', [
+        {'tts': '1', 'text': 'Other'},
+        {'tts': '2', 'speed': '1.5'},
+        {'tts': '1', 'speed': '1.5', 'voice': 'zahar'},
+        {'tts': '1', 'speed': '1.5', 'emotion': 'evil'},
+    ])
+    def test_synthesis_required(self, data):
+        """ Checks: Text, voice, emotion or source change needs TTS call """
+        assert not UpdateRecordView._is_speed_only(self.entry, data)
+
+    def test_missing_default_audio(self):
+        """ Checks: Speed can't be changed locally without default audio """
+        self.entry.default_audio = None
+        data = {'tts': '1', 'speed': '1.5'}
+        assert not UpdateRecordView._is_speed_only(self.entry, data)
+
+
+@pytest.mark.audiorecords_api
+@pytest.mark.api
+class TestWarmDraft(object):
+    """ Case for the speculative synthesis of the drafts """
+
+    def setup_method(self):
+        """ Draft record and the client """
+        self.client = APIClient()
+        project, _ = IntegrationProject.objects.get_or_create(
+            slug=settings.MANUAL_EDIT_SLUG,
+            defaults={'name': 'Drafts'}
+        )
+        self.entry = AudioRecord.objects.create(
+            name='Draft',
+            text='Draft',
+            related_project=project,
+            source=Source.objects.first(),
+            voice='alyss'
+        )
+        self.path = reverse(
+            'api:audio-warm',
+            args=[settings.MANUAL_EDIT_SLUG, self.entry.pk]
+        )
+
+    def _warm(self, speed):
+        """ Answer to the edit with the given speed and the warmer """
+        with mock.patch(
+                'projects.api.views.audio_related.draft_warmer'
+        ) as warmer:
+            response = self.client.post(
+                self.path,
+                {
+                    'text': 'Привет',
+                    'tts': self.entry.source_id,
+                    'speed': speed,
+                },
+                format='json'
+            )
+        return response, warmer.return_value
+
+    @pytest.mark.parametrize('speed', ['10', '0', '-1', 'nan', 'inf'])
+    def test_wrong_speed(self, speed):
+        """ Checks: Speed out of the record bounds never reaches SoX """
+        response, warmer = self._warm(speed)
+        assert response.status_code == 400
+        warmer.schedule.assert_not_called()
+
+    def test_scheduled(self):
+        """ Checks: Valid edit is warmed with its speed """
+        response, warmer = self._warm('1.5')
+        assert response.status_code == 202
+        warmer.schedule.assert_called_once()
+        assert warmer.schedule.call_args[0][3]['speed'] == 1.5
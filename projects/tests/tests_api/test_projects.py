@@ -8,6 +8,7 @@ from django.conf import settings
 from rest_framework.test import APIClient
 
 from projects.api.serializers import IntegrationProjectSerializer
+from projects.models import AudioRecord, Source
 from projects.models.project_related import IntegrationProject
 
 pytestmark = pytest.mark.django_db
@@ -33,9 +34,9 @@ class TestProjectsAPI(object):
         """ Checks: Get all projects via projects list API """
         self._make_projects()
         request = self.client.get(
-            path=reverse('api-projects-list')
+            path=reverse('api:projects-list')
         )
-        instance = IntegrationProject.objects.all().exclude(
+        instance = IntegrationProject.objects.with_totals().exclude(
             slug=settings.MANUAL_EDIT_SLUG
         )
 
@@ -46,11 +47,32 @@ class TestProjectsAPI(object):
         ]
         assert actual == expected
 
+    def test_get_projects_totals(self):
+        """ Checks: Project totals are aggregated from records metadata """
+        project = IntegrationProject.objects.create(name='Sum', slug='sum')
+        for name, duration, size in (('a', 1.5, 100), ('b', 2.0, 300)):
+            AudioRecord.objects.create(
+                name=name,
+                text=name,
+                related_project=project,
+                source=Source.objects.first(),
+                duration=duration,
+                audio_size=size
+            )
+        request = self.client.get(path=reverse('api:projects-list'))
+        actual = next(
+            item for item in json.loads(request.content)
+            if item['slug'] == 'sum'
+        )
+        assert actual['records_amount'] == 2
+        assert actual['total_duration'] == 3.5
+        assert actual['storage_used'] == 400
+
     def test_create_project_full(self):
         """ Checks: Create project via POST request """
         data = {'name': 'Jesus', 'slug': 'Gabriel'}
         self.client.post(
-            path=reverse('api-projects-make'),
+            path=reverse('api:projects-make'),
             data=data,
             format='json'
         )
@@ -60,7 +82,7 @@ class TestProjectsAPI(object):
         """ Checks: Make project via POST request partial data (name only) """
         data = {'name': 'BruceU'}
         request = self.client.post(
-            path=reverse('api-projects-make'),
+            path=reverse('api:projects-make'),
             data=data,
             format='json'
         )
@@ -75,8 +97,24 @@ class TestProjectsAPI(object):
 
         instance = IntegrationProject.objects.get(name=name)
         request = self.client.delete(
-            path=reverse('api-projects-destroy', args=[instance.slug])
+            path=reverse('api:projects-destroy', args=[instance.slug])
         )
         assert request.status_code == 204
         with pytest.raises(ObjectDoesNotExist):
             IntegrationProject.objects.get(name=name)
+
+    def test_get_projects_not_modified(self):
+        """ Checks: Unchanged projects list is answered with 304 """
+        self._make_projects()
+        response = self.client.get(path=reverse('api:projects-list'))
+        cached = self.client.get(
+            path=reverse('api:projects-list'),
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        assert cached.status_code == 304
+        IntegrationProject.objects.create(name='Biden', slug='biden')
+        actual = self.client.get(
+            path=reverse('api:projects-list'),
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        assert actual.status_code == 200
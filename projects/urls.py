@@ -9,6 +9,7 @@ from .views import (
 )
 from imedgen.views import (
     GetAnalyticsDataSheetView,
+    PackAndSendBulkZipView,
     PackAndSendZipView,
     GetExampleExportFileView
 )
@@ -23,6 +24,12 @@ urlpatterns = [
         name='projects',
     ),
 
+    path(
+        'projects/get-imed/',
+        PackAndSendBulkZipView.as_view(),
+        name='bulk-media-lib',
+    ),
+
     path(
         'projects/<slug:project>/', include([
 
@@ -0,0 +1,289 @@
+""" Size-limited on-disk caches of the derived audio files """
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+
+
+__all__ = (
+    'DiskLRUCache',
+    'prewarm_speed_variants',
+    'speed_variant',
+    'speed_variants',
+    'variant_speed',
+    'synthesis_key',
+    'syntheses',
+)
+
+# Variants are made in the background, should not compete with requests
+_prewarm_executor = ThreadPoolExecutor(max_workers=2)
+
+# Eviction frees the cache down to this part of the size limit, so the
+# directory is walked once per the freed tenth instead of every put
+EVICTION_TARGET = 0.9
+
+
+class DiskLRUCache(object):
+    """ Files on disk with the total size limit and LRU eviction
+
+    Notes:
+        Entry is the file named after the key digest, its mtime is the last
+        access time (updated on every hit). Entries are placed with the
+        atomic rename, so the cache can be shared by threads and processes.
+        Total size is counted by the puts and synced with the directory
+        by the eviction walk, which happens only when the limit is
+        exceeded. Entries of the other processes are seen by the next
+        walk, so the limit is approximate when the cache is shared
+
+    """
+
+    def __init__(
+            self,
+            location: str,
+            max_size: int,
+            suffix: str = ''
+    ) -> None:
+        """ Cache in the given directory
+
+        Args:
+            location: Cache directory (same FS as media allows hardlinks)
+            max_size: Maximum total size of the entries in bytes
+            suffix: Extension of the entry files (e.g. .wav)
+
+        """
+        self.location = location
+        self.max_size = max_size
+        self.suffix = suffix
+        self._size: Optional[int] = None  # Unknown until the first walk
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        """ Location of the entry for the given key """
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(
+            self.location,
+            digest[:2],
+            f'{digest}{self.suffix}'
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """ Path of the cached file (None if there is no such entry) """
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, source_path: str) -> str:
+        """ Add the file to the cache
+
+        Args:
+            key: Cache key
+            source_path: File to cache (it is not changed or removed)
+
+        Returns:
+            Path of the cached file
+
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{uuid.uuid4().hex}.part'
+        try:
+            os.link(source_path, temp_path)
+        except OSError:
+            shutil.copyfile(source_path, temp_path)
+        os.chmod(temp_path, 0o644)  # Link to the private temp file
+        added = os.stat(temp_path).st_size
+        try:
+            added -= os.stat(path).st_size  # Replaced entry
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += added
+                if self._size <= self.max_size:
+                    return path
+        self.evict()
+        return path
+
+    def get_or_create(self, key: str, factory: Callable[[], Any]) -> str:
+        """ Cached file path. Miss is resolved with the factory
+
+        Args:
+            key: Cache key
+            factory: Callable without arguments that returns named temp
+                     file with the content (it is closed after caching)
+
+        """
+        path = self.get(key)
+        if path is not None:
+            return path
+        with factory() as created:
+            return self.put(key, created.name)
+
+    def evict(self) -> Tuple[int, int]:
+        """ Remove the least recently used entries above the size limit
+
+        Returns:
+            Amount of removed entries and freed bytes
+
+        Notes:
+            Cache above the limit is freed down to EVICTION_TARGET of it
+
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime)
+        total = sum(stat.st_size for _, stat in entries)
+        target = self.max_size
+        if total > self.max_size:
+            target = int(self.max_size * EVICTION_TARGET)
+        removed, freed = 0, 0
+        for path, stat in entries:
+            if total - freed <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # Evicted by the other process
+            removed += 1
+            freed += stat.st_size
+        with self._lock:
+            self._size = total - freed
+        return removed, freed
+
+    def clear(self) -> None:
+        """ Remove every entry """
+        for path, _ in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._size = 0
+
+    def _entries(self) -> Iterator[Tuple[str, os.stat_result]]:
+        """ Walk through the complete entries (path and stat) """
+        if not os.path.isdir(self.location):
+            return
+        for root, _dirs, files in os.walk(self.location):
+            for file_name in files:
+                if file_name.endswith('.part'):
+                    continue
+                path = os.path.join(root, file_name)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+
+def variant_speed(speed: Any) -> float:
+    """ Speed of the cached variants (same key and tempo of the audio) """
+    return round(float(speed), 2)
+
+
+@lru_cache(maxsize=None)
+def speed_variants() -> DiskLRUCache:
+    """ Cache of the records audio with the changed tempo """
+    return DiskLRUCache(
+        os.path.join(settings.AUDIO_CACHE_ROOT, 'speed'),
+        settings.SPEED_VARIANTS_MAX_SIZE,
+        suffix='.wav'
+    )
+
+
+def speed_variant(default_audio: FieldFile, speed: float, builder: Any) -> str:
+    """ Path of the record audio with the given speed (made only once)
+
+    Args:
+        default_audio: Record audio with the default speed (1.0)
+        speed: Playing speed
+        builder: SoxTransformerMixin (or any of its children)
+
+    Notes:
+        Stored names are fixed (re-created record reuses the name), so the
+        variant is bound to the stored file itself (name, inode, size and
+        mtime) the same way as the previews. New default audio never gets
+        the variants of the previous one, stale variants are evicted by
+        the cache size limit
+
+    """
+    speed = variant_speed(speed)
+    stat = os.stat(default_audio.path)
+    version = (
+        f'{default_audio.name}:{stat.st_ino}:{stat.st_size}:'
+        f'{stat.st_mtime_ns}'
+    )
+    return speed_variants().get_or_create(
+        f'{version}@{speed:.2f}',
+        lambda: builder.change_audio_speed(default_audio.path, speed)
+    )
+
+
+def prewarm_speed_variants(
+        default_audio: FieldFile,
+        builder: Any,
+        speeds: Optional[Iterable[float]] = None
+) -> List[Any]:
+    """ Make the variants for the common speeds in the background
+
+    Args:
+        default_audio: Record audio with the default speed (1.0)
+        builder: SoxTransformerMixin (or any of its children)
+        speeds: Speeds to prepare. Default: SPEED_VARIANTS_PREWARM setting
+
+    Returns:
+        Futures of the scheduled variants
+
+    """
+    if speeds is None:
+        speeds = settings.SPEED_VARIANTS_PREWARM
+    return [
+        _prewarm_executor.submit(speed_variant, default_audio, speed, builder)
+        for speed in speeds
+        if variant_speed(speed) != 1.0
+    ]
+
+
+@lru_cache(maxsize=None)
+def syntheses() -> DiskLRUCache:
+    """ Cache of the TTS results (default speed audio) """
+    return DiskLRUCache(
+        os.path.join(settings.AUDIO_CACHE_ROOT, 'synthesis'),
+        settings.SYNTHESIS_CACHE_MAX_SIZE,
+        suffix='.wav'
+    )
+
+
+def synthesis_key(backend: str, text: str, presets: Mapping[str, Any]) -> str:
+    """ Key of the synthesized audio
+
+    Args:
+        backend: Name of the TTS backend
+        text: Normalized text (see projects.utils.text.normalize_text)
+        presets: Voice and emotion of the synthesis (speed is applied later)
+
+    """
+    return '\x1f'.join((
+        backend,
+        str(presets.get('voice') or ''),
+        str(presets.get('emotion') or ''),
+        text,
+    ))
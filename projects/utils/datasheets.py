@@ -0,0 +1,238 @@
+""" Streaming data sheet writers (CSV and Office Open XML spreadsheet) """
+import csv
+import re
+import zipfile
+
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from lxml import etree
+from lxml.builder import ElementMaker
+
+
+__all__ = (
+    'iter_csv',
+    'iter_xlsx',
+)
+
+ROWS_PER_CHUNK = 500
+
+SHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+# Characters that are not allowed by XML 1.0 (would break the sheet)
+XML_ILLEGAL_REGEXP = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XML_DECLARATION = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+)
+
+_XLSX_PARTS = (
+    (
+        '[Content_Types].xml',
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'content-types">'
+        '<Default Extension="rels" ContentType="application/'
+        'vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="'
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.'
+        'worksheet+xml"/>'
+        '</Types>'
+    ),
+    (
+        '_rels/.rels',
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    (
+        'xl/workbook.xml',
+        f'<workbook xmlns="{SHEET_NS}" xmlns:r="http://schemas.'
+        'openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Audio records" sheetId="1" r:id="rId1"/>'
+        '</sheets></workbook>'
+    ),
+    (
+        'xl/_rels/workbook.xml.rels',
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    (
+        'xl/styles.xml',
+        f'<styleSheet xmlns="{SHEET_NS}">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font>'
+        '</fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="2"><xf/>'
+        '<xf applyAlignment="1"><alignment wrapText="1" vertical="top"/>'
+        '</xf></cellXfs>'
+        '<cellStyles count="1">'
+        '<cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+)
+
+
+class _ChunkBuffer(object):
+    """ Write-only file object. Collects written data until drained
+
+    Notes:
+        There is no seek(), so zipfile treats it as unseekable stream
+        and writes archive members with data descriptors
+
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        """ File-like API """
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        """ File-like API (zipfile stores member offsets) """
+        return self._position
+
+    def flush(self) -> None:
+        """ File-like API """
+
+    def drain(self) -> bytes:
+        """ Return everything written since the previous call """
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _TextWriter(object):
+    """ Text to bytes adapter for the csv writer """
+
+    def __init__(self, buffer: _ChunkBuffer) -> None:
+        self._buffer = buffer
+
+    def write(self, text: str) -> int:
+        """ File-like API """
+        return self._buffer.write(text.encode('utf-8'))
+
+
+def _chunked(
+        rows: Iterable[Sequence[str]]
+) -> Iterator[List[Sequence[str]]]:
+    """ Split rows iterator to the lists of ROWS_PER_CHUNK size """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(
+        rows: Iterable[Sequence[str]],
+        header: Tuple[str, ...] = ('ID', 'TEXT'),
+) -> Iterator[bytes]:
+    """ Lazily encode rows as CSV
+
+    Args:
+        rows: Iterable with the row values (e.g. QuerySet.iterator())
+        header: First row of the sheet
+
+    Returns:
+        Iterator with UTF-8 encoded CSV chunks
+
+    """
+    buffer = _ChunkBuffer()
+    writer = csv.writer(_TextWriter(buffer))
+    writer.writerow(header)
+    for chunk in _chunked(rows):
+        writer.writerows(chunk)
+        yield buffer.drain()
+    yield buffer.drain()
+
+
+def iter_xlsx(
+        rows: Iterable[Sequence[str]],
+        header: Tuple[str, ...] = ('ID', 'TEXT'),
+        widths: Tuple[int, ...] = (25, 100),
+) -> Iterator[bytes]:
+    """ Lazily build .xlsx workbook with the single sheet
+
+    Args:
+        rows: Iterable with the row values (e.g. QuerySet.iterator())
+        header: First row of the sheet
+        widths: Width of the columns (in characters)
+
+    Returns:
+        Iterator with the archive chunks
+
+    Notes:
+        Strings are stored inline, so there is no shared strings table to
+        keep in memory and no row limit (unlike .xls format)
+
+    """
+    maker = ElementMaker(namespace=SHEET_NS, nsmap={None: SHEET_NS})
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for part_name, content in _XLSX_PARTS:
+            archive.writestr(part_name, f'{_XML_DECLARATION}{content}')
+        yield buffer.drain()
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            with etree.xmlfile(sheet, encoding='UTF-8') as xml_file:
+                xml_file.write_declaration(standalone=True)
+                with xml_file.element(f'{{{SHEET_NS}}}worksheet',
+                                      nsmap={None: SHEET_NS}):
+                    xml_file.write(maker.cols(*[
+                        maker.col(
+                            min=str(idx),
+                            max=str(idx),
+                            width=str(width),
+                            customWidth='1'
+                        )
+                        for idx, width in enumerate(widths, start=1)
+                    ]))
+                    with xml_file.element(f'{{{SHEET_NS}}}sheetData'):
+                        xml_file.write(_xlsx_row(maker, 1, header))
+                        row_idx = 1
+                        for chunk in _chunked(rows):
+                            for values in chunk:
+                                row_idx += 1
+                                xml_file.write(
+                                    _xlsx_row(maker, row_idx, values)
+                                )
+                            xml_file.flush()
+                            yield buffer.drain()
+    yield buffer.drain()
+
+
+def _xlsx_row(
+        maker: ElementMaker,
+        row_idx: int,
+        values: Sequence[str]
+) -> etree.Element:
+    """ Make <row> element with inline string cells """
+    cells = []
+    for value in values:
+        text = maker.t(XML_ILLEGAL_REGEXP.sub('', str(value)))
+        text.set(XML_SPACE, 'preserve')
+        cells.append(maker.c(maker('is', text), t='inlineStr', s='1'))
+    return maker.row(*cells, r=str(row_idx))
@@ -0,0 +1,229 @@
+""" File downloads authorized by Django and sent by nginx """
+import mimetypes
+import os
+import re
+
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    HttpRequest,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+
+__all__ = (
+    'accel_location',
+    'file_etag',
+    'send_file',
+    'send_stream',
+)
+
+CHUNK_SIZE = 64 * 2 ** 10
+
+RANGE_REGEXP = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Marker of the range that is out of the file
+UNSATISFIABLE = (-1, -1)
+
+
+def accel_location(path: str) -> Optional[str]:
+    """ nginx internal location of the file (None if it is not exposed)
+
+    Notes:
+        Locations are defined by SENDFILE_LOCATIONS setting, that maps
+        served directories to internal nginx locations
+
+    """
+    path = os.path.realpath(path)
+    for root, location in settings.SENDFILE_LOCATIONS:
+        root = os.path.realpath(root)
+        if os.path.commonpath([root, path]) == root:
+            return f'{location}{quote(os.path.relpath(path, root))}'
+    return None
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """ Strong entity tag of the file (changed with every replacement) """
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _byte_range(
+        request: HttpRequest,
+        size: int,
+        etag: str,
+        last_modified: int
+) -> Optional[Tuple[int, int]]:
+    """ First and last byte requested by the Range header
+
+    Returns:
+        None if the whole file is to be sent (no Range, stale If-Range or
+        multiple ranges) or UNSATISFIABLE
+
+    """
+    match = RANGE_REGEXP.match(request.META.get('HTTP_RANGE', '').strip())
+    if match is None or request.method not in ('GET', 'HEAD'):
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range and if_range != etag:
+        if parse_http_date_safe(if_range) != last_modified:
+            return None  # File was changed since the first part
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        first, last = max(size - int(last), 0), size - 1  # Suffix
+    else:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        return UNSATISFIABLE
+    return first, last
+
+
+def _iter_range(
+        stream: BinaryIO,
+        first: int,
+        last: int
+) -> Iterator[bytes]:
+    """ Read the part of the file (closed when iteration stops) """
+    try:
+        stream.seek(first)
+        left = last - first + 1
+        while left > 0:
+            chunk = stream.read(min(CHUNK_SIZE, left))
+            if not chunk:
+                break
+            left -= len(chunk)
+            yield chunk
+    finally:
+        stream.close()
+
+
+def _stream_file(
+        path: str,
+        content_type: str,
+        request: Optional[HttpRequest]
+) -> HttpResponse:
+    """ File response of Django (with conditional and range requests) """
+    stream = open(path, 'rb')
+    stat = os.fstat(stream.fileno())
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    byte_range = None
+    if request is not None:
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if response is not None:  # Not modified or precondition failed
+            stream.close()
+            return response
+        byte_range = _byte_range(request, stat.st_size, etag, last_modified)
+    if byte_range is None:
+        response = FileResponse(stream, content_type=content_type)
+    elif byte_range == UNSATISFIABLE:
+        stream.close()
+        response = HttpResponse(status=416, content_type=content_type)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+    else:
+        first, last = byte_range
+        response = StreamingHttpResponse(
+            _iter_range(stream, first, last),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Length'] = str(last - first + 1)
+        response['Content-Range'] = f'bytes {first}-{last}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
+
+
+def send_file(
+        path: str,
+        *,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        attachment: bool = True,
+        request: Optional[HttpRequest] = None
+) -> HttpResponse:
+    """ Answer with the file content
+
+    Args:
+        path: Location of the file
+        filename: Name of the file for the client (default: file name)
+        content_type: MIME type (default: guessed by filename)
+        attachment: Ask browser to download the file
+        request: Request with the conditional and Range headers (if any)
+
+    Returns:
+        Response with X-Accel-Redirect header (nginx sends the file) if
+        SENDFILE_X_ACCEL is on. Otherwise file is streamed by Django,
+        that answers to the Range (single one), If-Range and conditional
+        requests, so interrupted downloads can be resumed
+
+    Raises:
+        FileNotFoundError: In case of missing file
+
+    """
+    filename = filename or os.path.basename(path)
+    content_type = content_type or _guess_type(filename)
+    location = accel_location(path) if settings.SENDFILE_X_ACCEL else None
+    if location is not None:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = location
+    else:
+        response = _stream_file(path, content_type, request)
+    response['Content-Disposition'] = _disposition(filename, attachment)
+    return response
+
+
+def send_stream(
+        chunks: Iterable[bytes],
+        *,
+        filename: str,
+        content_type: Optional[str] = None,
+        attachment: bool = True
+) -> StreamingHttpResponse:
+    """ Answer with the content that is still being made
+
+    Args:
+        chunks: Content of the file
+        filename: Name of the file for the client
+        content_type: MIME type (default: guessed by filename)
+        attachment: Ask browser to download the file
+
+    Notes:
+        Size is unknown, so ranges are not supported. nginx does not
+        buffer the response (X-Accel-Buffering), so every chunk reaches
+        the client as soon as it is made
+
+    """
+    response = StreamingHttpResponse(
+        chunks,
+        content_type=content_type or _guess_type(filename)
+    )
+    response['X-Accel-Buffering'] = 'no'
+    response['Content-Disposition'] = _disposition(filename, attachment)
+    return response
+
+
+def _guess_type(filename: str) -> str:
+    """ MIME type of the file name """
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def _disposition(filename: str, attachment: bool) -> str:
+    """ Content-Disposition header with the (quoted) file name """
+    disposition = 'attachment' if attachment else 'inline'
+    return f"{disposition}; filename*=UTF-8''{quote(filename)}"
@@ -0,0 +1,648 @@
+""" Cached ZIP export artifacts of the projects """
+import glob
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+import time
+import zipfile
+
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+from django.conf import settings
+from django.db import connection
+
+from projects.models import AudioRecord, IntegrationProject
+from projects.utils.cache import DiskLRUCache
+
+
+__all__ = (
+    'BulkArchive',
+    'COMPRESSION_METHODS',
+    'ProjectArchive',
+    'parse_compression',
+    'raw_audio',
+)
+
+ARCHIVE_SUBDIR = 'audio'
+
+# Ordered from the fastest to the smallest archives: stored entries take no
+# CPU, deflate (level 1 is its fastest) is several times faster than bzip2
+# and lzma
+COMPRESSION_METHODS = {
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA,
+}
+
+# Entries converted ahead of the compressing thread
+WRITE_AHEAD = 4
+
+# Directory of the multi-project archives (in EXPORTS_ROOT)
+BULK_SUBDIR = '.bulk'
+
+# Archive is streamed by chunks of this size (bytes)
+STREAM_CHUNK_SIZE = 64 * 2 ** 10
+
+# Chunks built ahead of the client
+STREAM_AHEAD = 16
+
+
+def parse_compression(spec: str) -> Tuple[int, Optional[int]]:
+    """ ZIP compression method and level from the "method[:level]" string
+
+    Args:
+        spec: Name from COMPRESSION_METHODS with optional level, e.g.
+              "stored", "deflated:1" or "bzip2:9"
+
+    Returns:
+        zipfile constant of the method and the level (None - default)
+
+    Raises:
+        ValueError: In case of unknown method or wrong level
+
+    """
+    method, _, level = spec.strip().lower().partition(':')
+    if method not in COMPRESSION_METHODS:
+        raise ValueError(f'Unknown compression method - {method}')
+    if not level:
+        return COMPRESSION_METHODS[method], None
+    if method in ('stored', 'lzma'):
+        raise ValueError(f'Compression level is not supported by {method}')
+    bounds = (0, 9) if method == 'deflated' else (1, 9)
+    if not level.isdigit() or not bounds[0] <= int(level) <= bounds[1]:
+        raise ValueError(
+            f'Compression level of {method} must be in {bounds[0]}..'
+            f'{bounds[1]}'
+        )
+    return COMPRESSION_METHODS[method], int(level)
+
+
+@lru_cache(maxsize=None)
+def raw_derivatives() -> DiskLRUCache:
+    """ Cache of the records audio converted to the raw format """
+    return DiskLRUCache(
+        os.path.join(settings.AUDIO_CACHE_ROOT, 'raw'),
+        settings.RAW_DERIVATIVES_MAX_SIZE,
+        suffix='.raw'
+    )
+
+
+def raw_audio(record: AudioRecord, builder: Any) -> str:
+    """ Path of the record audio in the raw format (converted only once)
+
+    Args:
+        record: Record with the stored audio
+        builder: SoxTransformerMixin (or any of its children)
+
+    Notes:
+        Key is the content hash, so unchanged audio is never converted
+        again, whatever project or build it is exported with
+
+    """
+    if record.audio_hash:
+        key = record.audio_hash
+    else:
+        stat = os.stat(record.audio.path)
+        key = f'{record.audio.name}:{stat.st_ino}:{stat.st_mtime_ns}'
+    return raw_derivatives().get_or_create(
+        key,
+        lambda: builder.convert_audio_type_format(record.audio)
+    )
+
+
+def _done(result: Any) -> Future:
+    """ Future with the known result """
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def _write_converted(
+        zip_file: zipfile.ZipFile,
+        converted: Future,
+        arcname: str
+) -> None:
+    """ Write the file to the archive, once its conversion is done """
+    zip_file.write(converted.result(), arcname)
+
+
+class _ForwardingStream(object):
+    """ Write-only stream that passes the archive to the observer as well
+
+    Notes:
+        Stream is not seekable, so zipfile puts sizes after the entries
+        (data descriptors) instead of rewriting the headers that are sent
+
+    """
+
+    def __init__(
+            self,
+            stream: BinaryIO,
+            observer: Callable[[bytes], None]
+    ) -> None:
+        """ Stream that writes to the file and gets chunks to the observer
+
+        Args:
+            stream: File of the artifact
+            observer: Callable that gets every written chunk
+
+        """
+        self._stream = stream
+        self._observer = observer
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        """ Write the data (observer gets it by STREAM_CHUNK_SIZE) """
+        self._stream.write(data)
+        self._position += len(data)
+        self._buffer += data
+        if len(self._buffer) >= STREAM_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def tell(self) -> int:
+        """ Amount of the written bytes """
+        return self._position
+
+    def flush(self) -> None:
+        """ Pass the buffered data to the observer """
+        if self._buffer:
+            self._observer(bytes(self._buffer))
+            self._buffer.clear()
+
+
+class _Artifact(object):
+    """ Archive in the EXPORTS_ROOT, rebuilt only when its content changed
+
+    Notes:
+        Artifact is named "<options digest>-<version>.zip", so the same
+        options of the same version are never packed twice. Previous
+        versions are removed by the later builds, once they have been
+        outdated for EXPORT_GRACE_PERIOD, so their downloads in progress
+        (nginx or resumed ones) are not broken
+
+    """
+
+    directory: str
+
+    def __init__(self, compression: Optional[str] = None) -> None:
+        """ Artifact with the given compression
+
+        Args:
+            compression: "method[:level]" of the entries (default:
+                         EXPORT_COMPRESSION setting)
+
+        Raises:
+            ValueError: In case of wrong compression
+
+        """
+        self.compression = compression or settings.EXPORT_COMPRESSION
+        self.method, self.level = parse_compression(self.compression)
+
+    def _options(self) -> str:
+        """ Options of the build (artifacts with other options are kept) """
+        return f'{self.method}:{self.level}'
+
+    def _version(self) -> str:
+        """ Version of the content """
+        raise NotImplementedError
+
+    @property
+    def _build_key(self) -> str:
+        """ Short digest of the build options (part of the artifact name) """
+        return hashlib.sha1(self._options().encode('utf-8')).hexdigest()[:12]
+
+    @property
+    def path(self) -> str:
+        """ Location of the artifact of the current version """
+        return os.path.join(
+            self.directory,
+            f'{self._build_key}-{self._version()}.zip'
+        )
+
+    def get_or_build(self, converter: Optional[Executor] = None) -> str:
+        """ Path of the artifact (built only if content was changed)
+
+        Args:
+            converter: Pool for SoX conversions (default: in this thread)
+
+        """
+        path = self.path
+        if os.path.isfile(path):
+            return path
+        return self.build(converter)
+
+    def build(
+            self,
+            converter: Optional[Executor] = None,
+            observer: Optional[Callable[[bytes], None]] = None
+    ) -> str:
+        """ Pack the archive of the current version
+
+        Args:
+            converter: Pool for SoX conversions (default: in this thread)
+            observer: Callable that gets the archive content while it is
+                      written (see iter_build)
+
+        Returns:
+            Path of the artifact
+
+        """
+        path = self.path
+        os.makedirs(self.directory, exist_ok=True)
+        stream = tempfile.NamedTemporaryFile(
+            dir=self.directory,
+            suffix='.part',
+            delete=False
+        )
+        try:
+            with stream:
+                if observer is None:
+                    self.pack(stream, converter)
+                else:
+                    forwarding = _ForwardingStream(stream, observer)
+                    self.pack(forwarding, converter)
+                    forwarding.flush()
+            os.chmod(stream.name, 0o644)
+            # Atomic, so the parallel download of the same one is not broken
+            os.replace(stream.name, path)
+        except BaseException:
+            os.remove(stream.name)
+            raise
+        self._remove_outdated(path)
+        return path
+
+    def iter_build(self) -> Iterator[bytes]:
+        """ Content of the archive while it is being built
+
+        Notes:
+            Archive is built by the background thread and stored as
+            usual, so the next download is sent from the artifact. At most
+            STREAM_AHEAD chunks wait for the client, the build goes on
+            (without forwarding) if the client is gone. Error of the build
+            is raised by the iterator, after the content sent so far
+
+        """
+        chunks = queue.Queue(maxsize=STREAM_AHEAD)
+        listening = threading.Event()
+        listening.set()
+        errors = []
+
+        def forward(chunk: Optional[bytes]) -> None:
+            """ Pass the chunk to the client (None - end of the archive) """
+            while listening.is_set():
+                try:
+                    chunks.put(chunk, timeout=1)
+                    return
+                except queue.Full:
+                    continue
+
+        def build() -> None:
+            """ Build the artifact, forwarding its content """
+            try:
+                self.build(observer=forward)
+            except BaseException as error:
+                errors.append(error)
+            finally:
+                connection.close()  # Connection of this thread
+                forward(None)
+
+        threading.Thread(target=build, daemon=True).start()
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            listening.clear()
+        if errors:
+            raise errors[0]
+
+    def pack(
+            self,
+            stream: BinaryIO,
+            converter: Optional[Executor] = None
+    ) -> None:
+        """ Write the archive to the given stream """
+        raise NotImplementedError
+
+    def _open(self, stream: BinaryIO) -> zipfile.ZipFile:
+        """ Archive with the chosen compression """
+        return zipfile.ZipFile(
+            stream,
+            'w',
+            compression=self.method,
+            compresslevel=self.level
+        )
+
+    def _remove_outdated(self, path: str) -> None:
+        """ Remove artifacts of the previous versions (same options)
+
+        Notes:
+            Artifact is outdated since the next one was built (mtime of
+            the next artifact), it is kept for EXPORT_GRACE_PERIOD seconds
+            after that
+
+        """
+        pattern = os.path.join(self.directory, f'{self._build_key}-*.zip')
+        artifacts = []
+        for artifact in glob.glob(pattern):
+            try:
+                artifacts.append((os.stat(artifact).st_mtime, artifact))
+            except FileNotFoundError:
+                continue
+        artifacts.sort()
+        deadline = time.time() - settings.EXPORT_GRACE_PERIOD
+        for (_, outdated), (replaced, _) in zip(artifacts, artifacts[1:]):
+            if outdated != path and replaced <= deadline:
+                try:
+                    os.remove(outdated)
+                except FileNotFoundError:
+                    pass
+
+
+class ProjectArchive(_Artifact):
+    """ ZIP archive with the raw audio and .imed file of the project
+
+    Notes:
+        Archive is stored in EXPORTS_ROOT/<project slug> and named after
+        the build path, compression and the project version
+        (last_updated), so unchanged project is never packed twice.
+        Changed project is packed again from the cached raw audio, so
+        only new or changed records are converted
+
+    """
+
+    # Maximum amount of the entries waiting for the writer
+    window = WRITE_AHEAD
+
+    def __init__(
+            self,
+            project: IntegrationProject,
+            builder: Any,
+            build_path: Optional[str] = None,
+            compression: Optional[str] = None
+    ) -> None:
+        """ Archive of the project
+
+        Args:
+            project: Exported project
+            builder: ZipFileMediaBuildMixin (SoX conversions and .imed)
+            build_path: Directory where Sound objects are stored (.imed)
+            compression: "method[:level]" of the entries (default:
+                         EXPORT_COMPRESSION setting)
+
+        Raises:
+            ValueError: In case of wrong compression
+
+        """
+        super().__init__(compression)
+        self.project = project
+        self.builder = builder
+        self.build_path = build_path
+        self.directory = os.path.join(settings.EXPORTS_ROOT, project.slug)
+
+    @property
+    def name(self) -> str:
+        """ Name of the archive for the client """
+        return f'cc_{self.project.slug.replace("-", "_")}_audio_loadout.zip'
+
+    def _options(self) -> str:
+        """ Build path and compression """
+        return f'{self.build_path or ""}:{super()._options()}'
+
+    def _version(self) -> str:
+        """ Time of the last project change """
+        return f'{self.project.last_updated.timestamp():.6f}'
+
+    def records(self):
+        """ Records to export """
+        return self.project.audiorecord_set.all().exclude(audio='')
+
+    def pack(
+            self,
+            stream: BinaryIO,
+            converter: Optional[Executor] = None
+    ) -> None:
+        """ Write the archive to the given stream
+
+        Notes:
+            Entries are compressed by the separate thread (zlib, bz2 and
+            lzma release the GIL), while the next records are converted
+            by SoX. Conversions stay at most WRITE_AHEAD entries ahead, so
+            cached raw audio is not evicted before it is written
+
+        """
+        with self._open(stream) as zip_file:
+            with ThreadPoolExecutor(max_workers=1) as writer:
+                self.write_to(zip_file, writer, converter)
+
+    def write_to(
+            self,
+            zip_file: zipfile.ZipFile,
+            writer: Executor,
+            converter: Optional[Executor] = None,
+            prefix: str = ''
+    ) -> None:
+        """ Put the raw audio and .imed file of the project to the archive
+
+        Args:
+            zip_file: Opened archive (written only by the writer)
+            writer: Single thread pool that writes the entries in order
+            converter: Pool for SoX conversions (default: in this thread)
+            prefix: Directory of the project entries in the archive
+
+        """
+        subdir = os.path.join(prefix, ARCHIVE_SUBDIR)
+        pending = deque()
+        records = self.records().only('name', 'audio', 'audio_hash')
+        for record in records.iterator():
+            if len(pending) >= self.window:
+                pending.popleft().result()
+            if converter is None:
+                converted = _done(raw_audio(record, self.builder))
+            else:
+                converted = converter.submit(raw_audio, record, self.builder)
+            pending.append(writer.submit(
+                _write_converted,
+                zip_file,
+                converted,
+                os.path.join(subdir, f'{record.name}.raw')
+            ))
+        with self.builder.create_imed(
+                self.records(),
+                self.build_path
+        ) as imed_file:
+            pending.append(writer.submit(
+                zip_file.write,
+                imed_file.name,
+                os.path.join(subdir, f'{self.project.slug}.imed')
+            ))
+            while pending:  # Raise errors of the writer (if any)
+                pending.popleft().result()
+
+
+class BulkArchive(_Artifact):
+    """ Single ZIP archive with the exports of several projects
+
+    Notes:
+        Projects are placed in the "<slug>/" directories of the archive.
+        In split mode archive contains "<slug>.zip" artifacts of the
+        projects instead (stored, they are compressed already), which
+        are shared with the single project downloads. Every project
+        uses the same conversion pool and the raw audio cache.
+        Every set of projects has own artifacts, so their total size is
+        limited by BULK_EXPORTS_MAX_SIZE (the oldest builds are evicted)
+
+    """
+
+    def __init__(
+            self,
+            projects: Iterable[IntegrationProject],
+            builder: Any,
+            build_path: Optional[str] = None,
+            compression: Optional[str] = None,
+            split: bool = False,
+            workers: Optional[int] = None,
+            progress: Optional[Callable[[str], None]] = None
+    ) -> None:
+        """ Archive of the projects
+
+        Args:
+            projects: Exported projects
+            builder: ZipFileMediaBuildMixin (SoX conversions and .imed)
+            build_path: Directory where Sound objects are stored (.imed)
+            compression: "method[:level]" of the entries (default:
+                         EXPORT_COMPRESSION setting)
+            split: Put archive of every project instead of its entries
+            workers: Size of the conversion pool (default: AUDIO_WORKERS)
+            progress: Callable that gets slug of every packed project
+
+        Raises:
+            ValueError: In case of wrong compression
+
+        """
+        super().__init__(compression)
+        self.archives = [
+            ProjectArchive(project, builder, build_path, compression)
+            for project in sorted(projects, key=lambda item: item.slug)
+        ]
+        self.build_path = build_path
+        self.split = split
+        self.workers = workers or settings.AUDIO_WORKERS
+        self.progress = progress
+        for archive in self.archives:  # Keep every converter busy
+            archive.window = max(WRITE_AHEAD, 2 * self.workers)
+        self.directory = os.path.join(settings.EXPORTS_ROOT, BULK_SUBDIR)
+
+    @property
+    def name(self) -> str:
+        """ Name of the archive for the client """
+        return 'cc_bulk_audio_loadout.zip'
+
+    def _options(self) -> str:
+        """ Projects, build path, mode and compression """
+        slugs = ','.join(archive.project.slug for archive in self.archives)
+        return (
+            f'{slugs}:{self.build_path or ""}:{self.split}:'
+            f'{super()._options()}'
+        )
+
+    def _version(self) -> str:
+        """ Digest of the projects versions """
+        versions = ','.join(archive._version() for archive in self.archives)
+        return hashlib.sha1(versions.encode('utf-8')).hexdigest()[:12]
+
+    def build(
+            self,
+            converter: Optional[Executor] = None,
+            observer: Optional[Callable[[bytes], None]] = None
+    ) -> str:
+        """ Pack the archive (projects share the conversion pool) """
+        if converter is not None:
+            return super().build(converter, observer)
+        with ThreadPoolExecutor(max_workers=self.workers) as converter:
+            return super().build(converter, observer)
+
+    def pack(
+            self,
+            stream: BinaryIO,
+            converter: Optional[Executor] = None
+    ) -> None:
+        """ Write the archive of every project to the given stream """
+        if self.split:
+            self._pack_artifacts(stream, converter)
+            return
+        with self._open(stream) as zip_file:
+            with ThreadPoolExecutor(max_workers=1) as writer:
+                for archive in self.archives:
+                    archive.write_to(
+                        zip_file,
+                        writer,
+                        converter,
+                        prefix=archive.project.slug
+                    )
+                    self._report(archive)
+
+    def _pack_artifacts(
+            self,
+            stream: BinaryIO,
+            converter: Optional[Executor] = None
+    ) -> None:
+        """ Put the (cached) archive of every project """
+        with zipfile.ZipFile(stream, 'w') as zip_file:
+            for archive in self.archives:
+                zip_file.write(
+                    archive.get_or_build(converter),
+                    f'{archive.project.slug}.zip'
+                )
+                self._report(archive)
+
+    def _remove_outdated(self, path: str) -> None:
+        """ Remove previous versions and the oldest archives above the limit
+
+        Notes:
+            Archives are evicted in the order of the builds (downloads
+            sent by nginx do not touch them). New archive is always kept
+
+        """
+        super()._remove_outdated(path)
+        artifacts = []
+        for artifact in glob.glob(os.path.join(self.directory, '*.zip')):
+            try:
+                artifacts.append((os.stat(artifact), artifact))
+            except FileNotFoundError:
+                continue
+        artifacts.sort(key=lambda item: item[0].st_mtime)
+        total = sum(stat.st_size for stat, _ in artifacts)
+        for stat, artifact in artifacts:
+            if total <= settings.BULK_EXPORTS_MAX_SIZE:
+                break
+            if artifact == path:
+                continue
+            try:
+                os.remove(artifact)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+
+    def _report(self, archive: ProjectArchive) -> None:
+        """ Pass the packed project to the progress callback """
+        if self.progress is not None:
+            self.progress(archive.project.slug)
@@ -0,0 +1,64 @@
+""" Batched IntegrationProject.last_updated maintenance """
+import threading
+
+from contextlib import contextmanager
+from typing import Any, Generator, Iterable
+
+from django.utils import timezone
+
+from projects.models.project_related import IntegrationProject
+
+
+__all__ = (
+    'batched_project_touch',
+    'touch_project',
+)
+
+_pending = threading.local()
+
+
+def _touch(project_pks: Iterable[Any]) -> None:
+    """ Single UPDATE for every given project (no pre_save signal calls) """
+    IntegrationProject.objects.filter(
+        pk__in=list(project_pks)
+    ).update(last_updated=timezone.now())
+
+
+def touch_project(project_pk: Any) -> None:
+    """ Mark project as modified
+
+    Args:
+        project_pk: Primary key (name) of the IntegrationProject
+
+    Notes:
+        Inside of the batched_project_touch() block call is postponed
+        until the block exit, so any amount of writes costs one UPDATE
+
+    """
+    pending = getattr(_pending, 'projects', None)
+    if pending is None:
+        _touch([project_pk])
+    else:
+        pending.add(project_pk)
+
+
+@contextmanager
+def batched_project_touch() -> Generator[None, None, None]:
+    """ Debounce project touches for the request or the job
+
+    Notes:
+        Nested blocks are merged into the outermost one. Touches are tracked
+        per thread, so records should be persisted in the thread that
+        opened the block
+
+    """
+    if getattr(_pending, 'projects', None) is not None:
+        yield
+        return
+    _pending.projects = set()
+    try:
+        yield
+    finally:
+        project_pks, _pending.projects = _pending.projects, None
+        if project_pks:
+            _touch(project_pks)
@@ -0,0 +1,69 @@
+""" Compressed previews of the records audio for browser playback """
+import hashlib
+import os
+
+from functools import lru_cache
+from tempfile import NamedTemporaryFile
+from typing import Any, Tuple
+
+import pydub
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+
+from projects.utils.cache import DiskLRUCache
+
+
+__all__ = (
+    'PREVIEW_CONTENT_TYPE',
+    'audio_preview',
+    'previews',
+)
+
+PREVIEW_CONTENT_TYPE = 'audio/mpeg'
+
+
+@lru_cache(maxsize=None)
+def previews() -> DiskLRUCache:
+    """ Cache of the encoded previews """
+    return DiskLRUCache(
+        os.path.join(settings.AUDIO_CACHE_ROOT, 'previews'),
+        settings.PREVIEWS_MAX_SIZE,
+        suffix='.mp3'
+    )
+
+
+def audio_preview(audio: FieldFile) -> Tuple[str, str]:
+    """ Compressed copy of the stored audio (encoded on the first request)
+
+    Args:
+        audio: Stored PCM audio of the record
+
+    Returns:
+        Path of the preview and its entity tag
+
+    Notes:
+        Preview is bound to the stored file (name, inode and mtime), so
+        changed audio never gets the previous preview. Stale previews are
+        evicted by the cache size limit
+
+    """
+    stat = os.stat(audio.path)
+    version = f'{audio.name}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}'
+    path = previews().get_or_create(version, lambda: _encode(audio.path))
+    return path, hashlib.sha1(version.encode('utf-8')).hexdigest()
+
+
+def _encode(path: str) -> Any:
+    """ Encode wav file to the mp3 temp file """
+    preview = NamedTemporaryFile(suffix='.mp3')
+    try:
+        pydub.AudioSegment.from_wav(path).export(
+            preview.name,
+            format='mp3',
+            bitrate=settings.PREVIEW_BITRATE
+        )
+    except BaseException:
+        preview.close()
+        raise
+    return preview
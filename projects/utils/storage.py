@@ -1,6 +1,18 @@
+import hashlib
 import os
-from typing import TYPE_CHECKING
+import shutil
+import tempfile
+import uuid
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Iterator,
+    Optional,
+    Tuple
+)
 
+from django.core.files.base import File
 from django.core.files.storage import FileSystemStorage
 
 if TYPE_CHECKING:  # pragma: no cover
@@ -10,14 +22,437 @@ if TYPE_CHECKING:  # pragma: no cover
 class OverwriteStorage(FileSystemStorage):
     """ Storage class based on the current Django storage class
         Implement overwriting logic to the base storage
+
+    Notes:
+        File is written into the temp file in the same directory and then
+        renamed over the target. Overwrite is atomic, there is no moment
+        when the file is missing or partially written (even after crash)
+
     """
+    CHUNK_SIZE = 64 * 2 ** 10
 
     def get_available_name(self, name, max_length=None):
-        """ Base storage method for name resolving """
-        if self.exists(name):
-            self.delete(name)
+        """ Base storage method for name resolving
+
+        Notes:
+            Existing file is not deleted here, it is replaced by _save
+
+        """
+        if max_length is not None and len(name) > max_length:
+            # Let parent truncate the name to fit DB column
+            return super().get_available_name(name, max_length)
         return name
 
+    def _save(self, name, content):
+        """ Write content into the temp file and rename it over the name """
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = self._write_temp(content, directory)
+        try:
+            os.replace(temp_path, full_path)
+        except OSError:
+            os.remove(temp_path)
+            raise
+        return name.replace('\\', '/')
+
+    def link(
+            self,
+            source: str,
+            name: str,
+            max_length: Optional[int] = None
+    ) -> str:
+        """ Store already saved file under the new name without a copy
+
+        Args:
+            source: Name of the stored file
+            name: New name for the same content
+            max_length: Maximum length of the name (DB restriction)
+
+        Returns:
+            Actual name of the linked file
+
+        Notes:
+            Hardlink is used, so content is written once and is freed only
+            after both names are deleted. Copy is used if FS can't link
+
+        """
+        name = self.get_available_name(name, max_length=max_length)
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        temp_path = self._import_temp(
+            self.path(source),
+            os.path.dirname(full_path)
+        )
+        try:
+            os.replace(temp_path, full_path)
+        except OSError:
+            os.remove(temp_path)
+            raise
+        return name.replace('\\', '/')
+
+    def move(
+            self,
+            source: str,
+            name: str,
+            max_length: Optional[int] = None
+    ) -> str:
+        """ Rename already saved file (content is not touched)
+
+        Args:
+            source: Name of the stored file
+            name: New name of the file (replaced if exists)
+            max_length: Maximum length of the name (DB restriction)
+
+        Returns:
+            Actual name of the moved file
+
+        """
+        name = self.get_available_name(name, max_length=max_length)
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(self.path(source), full_path)
+        return name.replace('\\', '/')
+
+    def _write_temp(
+            self,
+            content: File,
+            directory: str,
+            digest: Optional[Any] = None
+    ) -> str:
+        """ Write content into the new temp file in the given directory
+
+        Args:
+            content: Django File to write
+            directory: Temp file location (should be the same FS as target)
+            digest: hashlib object, updated with the written content
+
+        Returns:
+            Path of the written temp file
+
+        Notes:
+            Content that is already on disk (has temporary_file_path) is
+            linked or copied by the kernel, it is not read into memory.
+            File with other names (e.g. linked into the cache) is copied,
+            stored content never shares inode with files out of storage
+
+        """
+        if hasattr(content, 'temporary_file_path'):
+            source_path = content.temporary_file_path()
+            temp_path = self._import_temp(
+                source_path,
+                directory,
+                link=os.stat(source_path).st_nlink == 1
+            )
+            if digest is not None:
+                with open(temp_path, 'rb') as temp_file:
+                    for chunk in iter(
+                            lambda: temp_file.read(self.CHUNK_SIZE), b''
+                    ):
+                        digest.update(chunk)
+            return temp_path
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=directory,
+            prefix='.',
+            suffix='.part'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as temp_file:
+                if hasattr(content, 'seek') and content.seekable():
+                    content.seek(0)
+                for chunk in content.chunks(self.CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    if digest is not None:
+                        digest.update(chunk)
+                    temp_file.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path
+
+    def _import_temp(
+            self,
+            source_path: str,
+            directory: str,
+            link: bool = True
+    ) -> str:
+        """ Make temp file in the directory with the source file content
+
+        Notes:
+            Hardlink is used if possible (same FS) and allowed, otherwise
+            the content is copied with sendfile() without passing through
+            the userspace
+
+        """
+        temp_path = os.path.join(directory, f'.{uuid.uuid4().hex}.part')
+        if link:
+            try:
+                os.link(source_path, temp_path)
+            except OSError:
+                link = False
+        if not link:
+            descriptor = os.open(
+                temp_path,
+                os.O_WRONLY | os.O_CREAT | os.O_EXCL
+            )
+            try:
+                with open(source_path, 'rb') as source, \
+                        os.fdopen(descriptor, 'wb') as target:
+                    _copy_file_object(source, target)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        # Temp files are created as private ones (0600)
+        os.chmod(temp_path, self.file_permissions_mode or 0o644)
+        return temp_path
+
+    @staticmethod
+    def _replace_with_link(source_path: str, full_path: str) -> None:
+        """ Atomically make full_path a hardlink to the source_path """
+        temp_link = f'{full_path}.{uuid.uuid4().hex}.link'
+        os.link(source_path, temp_link)
+        try:
+            os.replace(temp_link, full_path)
+        except OSError:
+            os.remove(temp_link)
+            raise
+
+
+class DeduplicatingStorage(OverwriteStorage):
+    """ Content-addressed storage. Identical files are stored once
+
+    Notes:
+        Content lives in the blob named after its SHA-256 digest. Every
+        Django name is a hardlink to the blob, so names are resolved as
+        usual (by nginx as well), while the link count of the blob works
+        as the reference counter. Blob with no names left is garbage.
+        Digest is kept in the extended attribute of the blob (if FS allows
+        it), so it is read through any name instead of hashing the content
+
+    """
+    BLOBS_DIR = '.blobs'
+
+    DIGEST_XATTR = 'user.sha256'
+
+    def blob_path(self, digest: str) -> str:
+        """ Absolute path to the blob with the given content digest """
+        return self.path(
+            os.path.join(self.BLOBS_DIR, digest[:2], digest[2:4], digest)
+        )
+
+    def file_digest(self, name: str) -> str:
+        """ SHA-256 of the stored file content (content is read only once) """
+        path = self.path(name)
+        try:
+            return os.getxattr(path, self.DIGEST_XATTR).decode()
+        except (AttributeError, OSError):  # No xattrs (platform, FS, file)
+            return file_digest(path, self.CHUNK_SIZE)
+
+    def _save(self, name, content):
+        """ Write content into the blob (if new) and link name to it """
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        blobs_root = self.path(self.BLOBS_DIR)
+        os.makedirs(blobs_root, exist_ok=True)
+        digest = hashlib.sha256()
+        temp_path = self._write_temp(content, blobs_root, digest)
+        try:
+            stale = self._last_reference(name)
+            # Temp file keeps the blob referenced until the name is placed
+            blob = self._commit_blob(temp_path, digest.hexdigest())
+            self._replace_with_link(blob, full_path)
+        finally:
+            os.remove(temp_path)
+        if stale:
+            self._release(*stale)
+        return name.replace('\\', '/')
+
+    def delete(self, name):
+        """ Delete the name. Blob goes away with the last name referring it """
+        stale = self._last_reference(name)
+        super().delete(name)
+        if stale:
+            self._release(*stale)
+
+    def link(
+            self,
+            source: str,
+            name: str,
+            max_length: Optional[int] = None
+    ) -> str:
+        """ Link the name to the stored file. Replaced blob may go away """
+        stale = self._last_reference(name)
+        name = super().link(source, name, max_length)
+        if stale:
+            self._release(*stale)
+        return name
+
+    def move(
+            self,
+            source: str,
+            name: str,
+            max_length: Optional[int] = None
+    ) -> str:
+        """ Rename the name. Blob of the replaced name may go away """
+        stale = self._last_reference(name)
+        name = super().move(source, name, max_length)
+        if stale:
+            self._release(*stale)
+        return name
+
+    def adopt(self, name: str) -> int:
+        """ Move already stored file (not linked to any blob) to the blobs
+
+        Returns:
+            Amount of bytes freed (file content was already in the blobs)
+
+        """
+        path = self.path(name)
+        digest = self.file_digest(name)
+        blob = self.blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            self._mark_digest(path, digest)
+            os.link(path, blob)
+            return 0
+        except FileExistsError:
+            if os.path.samefile(path, blob):
+                return 0
+        size = os.stat(path).st_size
+        self._replace_with_link(blob, path)
+        return size
+
+    def iter_blobs(self) -> Iterator[Tuple[str, os.stat_result]]:
+        """ Walk through the blobs (path and stat) """
+        for root, _dirs, files in os.walk(self.path(self.BLOBS_DIR)):
+            if root == self.path(self.BLOBS_DIR):
+                continue  # Temp files of the ongoing writes
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                yield path, os.stat(path)
+
+    def collect_garbage(self) -> Tuple[int, int]:
+        """ Delete blobs that are not referenced by any name
+
+        Returns:
+            Amount of deleted blobs and freed bytes
+
+        """
+        deleted, freed = 0, 0
+        for path, stat in self.iter_blobs():
+            if stat.st_nlink == 1:
+                os.remove(path)
+                deleted += 1
+                freed += stat.st_size
+        return deleted, freed
+
+    def _commit_blob(self, temp_path: str, digest: str) -> str:
+        """ Make temp file the blob, unless same content is already stored """
+        blob = self.blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        self._mark_digest(temp_path, digest)
+        try:
+            os.link(temp_path, blob)
+        except FileExistsError:
+            pass
+        return blob
+
+    def _mark_digest(self, path: str, digest: str) -> None:
+        """ Keep the digest with the content (best effort) """
+        try:
+            os.setxattr(path, self.DIGEST_XATTR, digest.encode())
+        except (AttributeError, OSError):
+            pass
+
+    def _last_reference(self, name: str) -> Optional[Tuple[str, int]]:
+        """ Digest and inode of the blob, if name is its last reference """
+        path = self.path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        # Name and blob itself are the last links to the content (content
+        # from outside of the storage is copied, see _write_temp)
+        if stat.st_nlink != 2:
+            return None
+        return self.file_digest(name), stat.st_ino
+
+    def _release(self, digest: str, inode: int) -> None:
+        """ Delete the blob if nothing refers it """
+        blob = self.blob_path(digest)
+        try:
+            stat = os.stat(blob)
+        except FileNotFoundError:
+            return
+        if stat.st_ino == inode and stat.st_nlink == 1:
+            os.remove(blob)
+
+
+class TempFile(File):
+    """ Django File around the named temp file (e.g. NamedTemporaryFile)
+
+    Notes:
+        Storage links (or sendfile-copies) such file instead of reading it,
+        so the file must not be changed after it is saved
+
+    """
+
+    def temporary_file_path(self) -> str:
+        """ Same API as TemporaryUploadedFile """
+        return self.file.name
+
+
+def temp_copy(path: str) -> TempFile:
+    """ TempFile with the copy of the file (e.g. cache entry)
+
+    Notes:
+        Storage may link TempFile content, while the cached file should not
+        be a part of the stored content (it is evicted on its own)
+
+    """
+    copy = tempfile.NamedTemporaryFile(suffix=os.path.splitext(path)[1])
+    try:
+        shutil.copyfile(path, copy.name)
+    except BaseException:
+        copy.close()
+        raise
+    return TempFile(copy)
+
+
+def file_digest(path: str, chunk_size: int = 64 * 2 ** 10) -> str:
+    """ SHA-256 (hex) of the file content """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file_:
+        for chunk in iter(lambda: file_.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_file_object(source: BinaryIO, target: BinaryIO) -> None:
+    """ Copy the whole file in the kernel space (sendfile) if possible """
+    size = os.fstat(source.fileno()).st_size
+    offset = 0
+    sendfile = getattr(os, 'sendfile', None)
+    try:
+        while sendfile is not None and offset < size:
+            sent = sendfile(
+                target.fileno(),
+                source.fileno(),
+                offset,
+                size - offset
+            )
+            if not sent:
+                break
+            offset += sent
+    except OSError:
+        if offset:
+            raise
+    if offset < size:
+        source.seek(offset)
+        shutil.copyfileobj(source, target)
+
 
 def project_path_cb(
         instance: 'AudioRecord',
@@ -3,11 +3,19 @@ from __future__ import annotations
 import csv
 import os
 
-from concurrent.futures import as_completed, ThreadPoolExecutor
+from concurrent.futures import (
+    as_completed,
+    wait,
+    Future,
+    ThreadPoolExecutor,
+    FIRST_COMPLETED
+)
 from datetime import datetime
 from decimal import Decimal
+from itertools import islice
 from tempfile import NamedTemporaryFile
 from typing import (
+    Dict,
     List,
     Tuple,
     Any,
@@ -16,27 +24,47 @@ from typing import (
     Mapping,
     ClassVar,
     Optional,
+    Iterator,
     Generator
 )
 
 import pydub
 import xlrd
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import TemporaryUploadedFile
 from django.db.models import QuerySet
+from django.utils import timezone
 from lxml import objectify
 
 from projects.models import Source
 from projects.utils import exceptions as exc
+from projects.utils.freshness import batched_project_touch, touch_project
+from projects.utils.storage import TempFile
+from projects.utils.text import normalize_text
 
 from ..models import AudioRecord, IntegrationProject
+from ..models.audiorecord import SUMMARY_FIELDS
 from projects.mixins.sound_based import (
     CRTTTSMixin as CrtTTS,
     YSKTTSMixin as YskTTS,
     SoxTransformerMixin
 )
 
+OWN_FILES_EXTENSIONS = ('.mp3', '.wav', '.raw')
+
+OWN_FILES_UPDATE_FIELDS = (
+    'audio',
+    'default_audio',
+    'source',
+    'voice',
+    'emote',
+    'playing_speed',
+    'modified_at',
+    *SUMMARY_FIELDS,
+)
+
 
 class BaseParser(object):
     """ Base class for generating AudioRecord DB records """
@@ -220,16 +248,23 @@ class DataToAudioConverter(object):
     Notes:
         Format should be like - [{id: text}, {id:text}, ...]
     """
+    BATCH_SIZE: ClassVar[int] = 100
+    ROWS_PER_WORKER: ClassVar[int] = 2
 
     def __init__(
             self,
             data: List[Mapping[str, str]],
             presets: Mapping[str, Any],
-            convert_cb: Callable[[str, Mapping[str, Any]], Tuple[Any, Any]]
+            convert_cb: Callable[[str, Mapping[str, Any]], Tuple[Any, Any]],
+            workers: Optional[int] = None,
+            progress: Optional[Callable[[int, int], None]] = None
     ) -> None:
         self.data = data
         self._presets = presets
         self.convert_text_to_tts = convert_cb
+        self.workers = workers or settings.AUDIO_WORKERS
+        self.progress = progress
+        self.stats = {'rows': 0, 'synthesized': 0, 'deduplicated': 0}
 
     @staticmethod
     def _escape_name_float(name: Union[str, int, float]) -> str:
@@ -257,51 +292,218 @@ class DataToAudioConverter(object):
         Notes:
             Any exceptions about file content should be thrown before this part
 
+            Rows are synthesized by the pool and stored by the calling thread
+            in batches. Amount of the rows in flight is limited, so memory and
+            open temp files do not depend on the size of the dataset
+
+            Progress callback (if any) gets amounts of the done and failed
+            rows after every phrase
+
+            Rows with the same phrase share the single synthesis, its audio
+            is linked to every record (see stats for the amounts)
+
+            Staged audio of the records that are not persisted (import is
+            broken) is deleted
+
         """
         exceptions = []
-        with ThreadPoolExecutor(max_workers=15) as executor:
-            futures = {
-                executor.submit(self._make_audio_content, row['TEXT']):
-                    AudioRecord(
-                        name=self._escape_name_float(row['ID']),
-                        text=row['TEXT'],
-                        related_project=self._presets['project'],
-                        emote=self._presets['emotion'],
-                        voice=self._presets['voice'],
-                        source=self._presets['source'],
-                        playing_speed=self._presets['speed']
-                    )
-                for row in self.data
-                if not AudioRecord.objects.filter(
-                    related_project=self._presets['project'],
-                    name=self._escape_name_float(row['ID'])
-                ).exists()
-            }
-            for future in as_completed(futures):
-                audio = futures[future]
-                try:
-                    default, content = future.result()
-                except Exception as exc:
-                    exceptions.append(
-                        f'Convert failed for audio with id {audio.name}'
-                    )
-                    continue
-                audio.audio.save(f'{audio.name}.wav', content)
-                audio.default_audio.save(f'{audio.name}-default.wav', default)
-                audio.save()
+        records = []
+        done = 0
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            with batched_project_touch(), executor:
+                for rows, future in self._iter_converted(executor):
+                    done += len(rows)
+                    try:
+                        default, content = future.result()
+                    except Exception:
+                        exceptions.extend(
+                            f'Convert failed for audio with id {row["ID"]}'
+                            for row in rows
+                        )
+                        self._report(done, len(exceptions))
+                        continue
+                    try:
+                        for row in rows:
+                            try:
+                                records.append(
+                                    self._save_record(row, default, content)
+                                )
+                            except Exception:
+                                exceptions.append(
+                                    f'Save failed for audio with id '
+                                    f'{row["ID"]}'
+                                )
+                    finally:
+                        # Temp files are removed on close
+                        for file_ in (content, default):
+                            if file_ is not None:
+                                file_.close()
+                    if len(records) >= self.BATCH_SIZE:
+                        batch, records = records, []
+                        exceptions.extend(self._persist(batch))
+                    self._report(done, len(exceptions))
+                batch, records = records, []
+                exceptions.extend(self._persist(batch))
+        except BaseException:
+            for record in records:
+                record.discard_audio()
+            raise
         return exceptions
 
+    def _save_record(
+            self,
+            row: Mapping[str, str],
+            default: Any,
+            content: Any
+    ) -> AudioRecord:
+        """ Record of the row with the synthesized audio (not inserted) """
+        audio = AudioRecord(
+            name=row['ID'],
+            text=row['TEXT'],
+            related_project=self._presets['project'],
+            emote=self._presets['emotion'],
+            voice=self._presets['voice'],
+            source=self._presets['source'],
+            playing_speed=self._presets['speed']
+        )
+        try:
+            audio.stage_audio(
+                f'{audio.name}.wav',
+                content,
+                f'{audio.name}-default.wav',
+                default
+            )
+        except BaseException:
+            audio.discard_audio()  # Audio may be staged without the default
+            raise
+        return audio
+
+    def _report(self, done: int, failed: int) -> None:
+        """ Pass amounts of the processed rows to the progress callback """
+        if self.progress is not None:
+            self.progress(done, failed)
+
+    def _iter_converted(
+            self,
+            executor: ThreadPoolExecutor
+    ) -> Generator[Tuple[List[Mapping[str, str]], Future], None, None]:
+        """ Submit phrases to the pool and yield them in completion order
+
+        Notes:
+            Not more than ROWS_PER_WORKER phrases per worker are queued or
+            done but not consumed yet. Next phrases are submitted only after
+            the consumer takes the results (backpressure)
+
+        """
+        phrases = iter(self._group_rows())
+        pending = {}
+        while True:
+            for rows in islice(
+                    phrases,
+                    self.ROWS_PER_WORKER * self.workers - len(pending)
+            ):
+                future = executor.submit(
+                    self._make_audio_content,
+                    rows[0]['TEXT']
+                )
+                pending[future] = rows
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+
+    def _group_rows(self) -> List[List[Mapping[str, str]]]:
+        """ New rows grouped by the phrase (in order of the first row)
+
+        Notes:
+            Voice, emotion and speed are the same for the whole import, so
+            rows are grouped by the normalized text only
+
+        """
+        groups: Dict[str, List[Mapping[str, str]]] = {}
+        for row in self._new_rows():
+            groups.setdefault(normalize_text(row['TEXT']), []).append(row)
+        rows = sum(len(group) for group in groups.values())
+        self.stats = {
+            'rows': rows,
+            'synthesized': len(groups),
+            'deduplicated': rows - len(groups),
+        }
+        return list(groups.values())
+
+    def _new_rows(self) -> Iterator[Mapping[str, str]]:
+        """ Rows with names that are not taken in the project (or file)
+
+        Notes:
+            Single query served by the (related_project, name) unique index.
+            Repeated IDs inside one file are resolved as "first one wins"
+
+        """
+        names = [self._escape_name_float(row['ID']) for row in self.data]
+        taken = set(
+            AudioRecord.objects.filter(
+                related_project=self._presets['project'],
+                name__in=names
+            ).values_list('name', flat=True)
+        )
+        for name, row in zip(names, self.data):
+            if name in taken:
+                continue
+            taken.add(name)
+            yield {'ID': name, 'TEXT': row['TEXT']}
+
+    def _persist(self, records: List[AudioRecord]) -> List[str]:
+        """ Insert batch of records, duplicates are skipped by the DB
+
+        Returns:
+            Errors of the records which names were taken in the meantime
+
+        Notes:
+            Records are inserted with the staged audio, so the inserted
+            ones are found by it. Only their audio is moved to the final
+            names, audio of the skipped records is deleted
+
+        """
+        if not records:
+            return []
+        AudioRecord.objects.bulk_create(records, ignore_conflicts=True)
+        staged = {record.audio.name: record for record in records}
+        inserted = AudioRecord.objects.filter(
+            related_project=self._presets['project'],
+            audio__in=list(staged)
+        ).values_list('pk', 'audio')
+        published = []
+        for primary_key, audio in inserted:
+            record = staged.pop(audio)
+            record.pk = primary_key
+            record.publish_audio()
+            published.append(record)
+        AudioRecord.objects.bulk_update(published, ['audio', 'default_audio'])
+        touch_project(self._presets['project'].pk)  # skipped by bulk_create
+        for record in staged.values():
+            record.discard_audio()
+        return [
+            f'Audio with id {record.name} already exists'
+            for record in staged.values()
+        ]
+
     def _make_audio_content(self, text: str) -> Tuple[Any, Any]:
-        """ Create DjangoFile wrapper around binary file for audio record """
+        """ Create DjangoFile wrapper around binary file for audio record
+
+        Notes:
+            Default content is None if it is the same file (speed is 1.0).
+            Files are not read, storage takes them from the temp location
+
+        """
         default_file, wav_file = self.convert_text_to_tts(
             text,
             self._presets
         )
-        content = ContentFile(open(wav_file.name, 'rb+').read())
-        default_content = ContentFile(open(default_file.name, 'rb+').read())
-        wav_file.close()
-        default_file.close()
-        return default_content, content
+        if default_file is wav_file:
+            return None, TempFile(wav_file)
+        return TempFile(default_file), TempFile(wav_file)
 
 
 class FileParserWithAudioCreation(BaseParser):
@@ -311,9 +513,24 @@ class FileParserWithAudioCreation(BaseParser):
             self,
             form_file: TemporaryUploadedFile,
             cleaned_data: Mapping[str, Any],
+            *,
+            workers: Optional[int] = None,
+            progress: Optional[Callable[[int, int], None]] = None
     ) -> None:
+        """ Parser that synthesizes audio of the parsed rows
+
+        Args:
+            form_file: File uploaded from user request (or TempFile)
+            cleaned_data: Voice, emotion, speed, project slug and source
+            workers: Size of the synthesis pool (default: AUDIO_WORKERS)
+            progress: Callable that gets amounts of done and failed rows
+
+        """
         super().__init__(form_file)
         self._raw_form_data = cleaned_data
+        self.workers = workers
+        self.progress = progress
+        self.stats: Mapping[str, int] = {}
 
     def parse(self) -> List[str]:
         """ Override of the parent method (alias) """
@@ -326,16 +543,19 @@ class FileParserWithAudioCreation(BaseParser):
         parsed_rows = super().parse()
         presets = self._extract_presets()
         if presets['source'].id == 1:
-            return DataToAudioConverter(
-                parsed_rows,
-                presets,
-                YskTTS().convert_text_to_sound_via_tts_service
-            ).make_audio_files()
-        return DataToAudioConverter(
+            convert_cb = YskTTS().convert_text_to_sound_via_tts_service
+        else:
+            convert_cb = CrtTTS().convert_text_to_sound_via_tts_service
+        converter = DataToAudioConverter(
             parsed_rows,
             presets,
-            CrtTTS().convert_text_to_sound_via_tts_service
-        ).make_audio_files()
+            convert_cb,
+            workers=self.workers,
+            progress=self.progress
+        )
+        exceptions = converter.make_audio_files()
+        self.stats = converter.stats  # Rows, synthesized and deduplicated
+        return exceptions
 
     def _extract_presets(self) -> Mapping[str, Any]:
         """ Create presets for audio converter from raw form data """
@@ -358,43 +578,117 @@ def import_own_files(
         files: Mapping[str, TemporaryUploadedFile],
         *,
         qs: QuerySet,
-        voice: str
+        voice: str,
+        workers: Optional[int] = None
 ) -> Generator[Mapping[Optional[str], Optional[str]], None, None]:
-    """ Import own file """
-    audio_list = [qs_object['name'] for qs_object in qs.values('name')]
-    converter = SoxTransformerMixin()
-    safe_extensions = ['.mp3', '.wav', '.raw']
+    """ Import own files (pre-recorded by voice actor)
+
+    Args:
+        files: Uploaded files. Name of the file is the name of the record
+        qs: Records of the project that can be replaced
+        voice: Voice actor name
+        workers: Size of the SoX conversion pool
+
+    Notes:
+        Records and source are fetched once, conversion is done by the pool
+        and records are stored with the batched UPDATE
+
+    """
+    uploads = {}
     for file_name, file_ in files.items():
-        file_name, extension = os.path.splitext(file_name)
-        if extension not in safe_extensions:
-            yield {'error': f'{file_name}{extension}', 'success': None}
-        if file_name not in audio_list:
-            yield {'error': file_name, 'success': None}
+        name, extension = os.path.splitext(file_name)
+        if extension not in OWN_FILES_EXTENSIONS:
+            yield {'error': f'{name}{extension}', 'success': None}
         else:
-            if extension == '.mp3':  # SoX do not nothing about mp3 o_O
-                file_ = convert_from_mp3(file_)
-
-            audio_record: AudioRecord = qs.get(name__exact=file_name)
-            wav_file = converter.convert_audio_type_format(
-                user_file=file_.file,
-                extension_to='wav',
-                normalise=True
+            uploads[name] = (file_, extension)
+    records = {
+        record.name: record
+        for record in qs.filter(name__in=list(uploads))
+    }
+    for name in uploads:
+        if name not in records:
+            yield {'error': name, 'success': None}
+    if not records:
+        return
+
+    source = Source.objects.get(name='Voice actor')
+    converter = SoxTransformerMixin()
+    batch, stale_files = [], []
+    executor = ThreadPoolExecutor(
+        max_workers=workers or settings.AUDIO_WORKERS
+    )
+    with batched_project_touch(), executor:
+        futures = {
+            executor.submit(_convert_own_file, converter, *uploads[name]):
+                record
+            for name, record in records.items()
+        }
+        for future in as_completed(futures):
+            audio_record = futures[future]
+            try:
+                wav_file = future.result()
+            except Exception:
+                yield {'error': audio_record.name, 'success': None}
+                continue
+            stale_files.extend(
+                field.name
+                for field in (audio_record.audio, audio_record.default_audio)
+                if field
             )
-            audio_record.source = Source.objects.get(name='Voice actor')
+            audio_record.source = source
             audio_record.voice = voice
             audio_record.emote = 'Живые эмоции'
             audio_record.playing_speed = Decimal(1.0)
-            with wav_file as converted_:
-                content = converted_.read()
-                audio_record.audio.save(
-                    f'{file_name}_{datetime.now()}.wav',
-                    ContentFile(content)
+            with TempFile(wav_file) as converted_:
+                audio_record.save_audio(
+                    f'{audio_record.name}_{datetime.now()}.wav',
+                    converted_,
+                    f'{audio_record.name}_{datetime.now()}-default.wav'
                 )
-                audio_record.default_audio.save(
-                    f'{file_name}_{datetime.now()}-default.wav',
-                    ContentFile(content)
-                )
-            yield {'error': None, 'success': file_name}
+            batch.append(audio_record)
+            if len(batch) >= DataToAudioConverter.BATCH_SIZE:
+                yield from _persist_own_files(batch, stale_files)
+                batch, stale_files = [], []
+        yield from _persist_own_files(batch, stale_files)
+
+
+def _convert_own_file(
+        converter: SoxTransformerMixin,
+        file_: TemporaryUploadedFile,
+        extension: str
+) -> Any:
+    """ Make normalised wav from the uploaded file (runs in the pool) """
+    if extension == '.mp3':  # SoX do not nothing about mp3 o_O
+        file_ = convert_from_mp3(file_)
+    return converter.convert_audio_type_format(
+        user_file=file_.file,
+        extension_to='wav',
+        normalise=True
+    )
+
+
+def _persist_own_files(
+        records: List[AudioRecord],
+        stale_files: List[str]
+) -> Generator[Mapping[Optional[str], Optional[str]], None, None]:
+    """ Store batch of the imported records with the single query
+
+    Notes:
+        bulk_update skips auto_now and post_save (django_cleanup) hooks,
+        so both are done here
+
+    """
+    if not records:
+        return
+    now = timezone.now()
+    for record in records:
+        record.modified_at = now
+    AudioRecord.objects.bulk_update(records, OWN_FILES_UPDATE_FIELDS)
+    touch_project(records[0].related_project_id)
+    for name in stale_files:
+        default_storage.delete(name)
+    for record in records:
+        yield {'error': None, 'success': record.name}
 
 
 class WrappedTempFile(object):
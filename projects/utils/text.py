@@ -0,0 +1,65 @@
+""" Canonical form of the texts sent to the TTS backends """
+import re
+import unicodedata
+
+from typing import Union
+
+
+__all__ = (
+    'normalize_text',
+)
+
+# Typographic quotes and apostrophes to the ASCII ones
+QUOTES_TABLE = str.maketrans({
+    '\u00ab': '"',  # Guillemets
+    '\u00bb': '"',
+    '\u201c': '"',  # Double quotation marks
+    '\u201d': '"',
+    '\u201e': '"',
+    '\u201f': '"',
+    '\u2039': "'",  # Single guillemets
+    '\u203a': "'",
+    '\u2018': "'",  # Single quotation marks and apostrophes
+    '\u2019': "'",
+    '\u201a': "'",
+    '\u201b': "'",
+    '\u02bc': "'",
+    '\u00b4': "'",
+    '`': "'",
+})
+
+# Zero-width characters and soft hyphen (invisible, but change the text)
+INVISIBLE_REGEXP = re.compile('[\u00ad\u200b\u200c\u200d\u2060\ufeff]')
+
+# Any whitespace, including no-break and thin spaces
+SPACES_REGEXP = re.compile(r'\s+')
+
+# No-break or thin space between digit groups ("1\u00a0000\u202f000").
+# Plain spaces are kept, they separate numbers too ("8 800 555 35 35")
+DIGIT_GROUP_REGEXP = re.compile(r'(?<=\d)[\u00a0\u2009\u202f](?=\d{3}(?!\d))')
+
+# Spaces before the punctuation marks
+PUNCTUATION_SPACES_REGEXP = re.compile(r' +(?=[,.!?:;])')
+
+
+def normalize_text(text: Union[str, int, float]) -> str:
+    """ Canonical form of the phrase (same audio for the same form)
+
+    Args:
+        text: Phrase as it was typed or parsed (numbers from the xls)
+
+    Returns:
+        NFC normalized text with ASCII quotes, without invisible
+        characters, with single spaces, without no-break and thin spaces
+        inside numbers ("1\u00a0000" -> "1000") and before the punctuation
+
+    Notes:
+        Case is preserved, backends pronounce abbreviations by it. NFKC
+        is not used, it breaks the signs that are read aloud ("№", "²")
+
+    """
+    text = unicodedata.normalize('NFC', str(text))
+    text = INVISIBLE_REGEXP.sub('', text).translate(QUOTES_TABLE)
+    text = DIGIT_GROUP_REGEXP.sub('', text)
+    text = SPACES_REGEXP.sub(' ', text).strip()
+    return PUNCTUATION_SPACES_REGEXP.sub('', text)
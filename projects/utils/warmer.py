@@ -0,0 +1,158 @@
+""" Speculative synthesis of the drafts while they are being edited """
+import hashlib
+import threading
+import uuid
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import BaseCache, cache
+
+from imedgen import loggers
+
+
+__all__ = (
+    'DraftWarmer',
+    'draft_warmer',
+)
+
+logger = loggers.return_logger('mediarecord')
+
+# Seconds the last edit is remembered after the debounce delay
+EDIT_TTL_MARGIN = 60
+
+
+class DraftWarmer(object):
+    """ Debounced warming of the synthesis cache
+
+    Notes:
+        Every edit of the draft replaces its scheduled warming, so only the
+        text that was not changed for `delay` seconds reaches the backend.
+        Edits of the same draft may reach different processes, so the last
+        edit of the draft is kept in the shared cache: timer warms only
+        the edit that is still the last one, cancel forgets it everywhere.
+        Warming is best effort: errors are logged, the save synthesizes
+        the audio itself
+
+    """
+
+    def __init__(
+            self,
+            delay: float,
+            workers: int = 2,
+            shared: Optional[BaseCache] = None
+    ) -> None:
+        """ Warmer with the given debounce delay
+
+        Args:
+            delay: Seconds without edits before the synthesis
+            workers: Amount of the parallel warm-ups
+            shared: Cache of every process (default: Django cache)
+
+        """
+        self.delay = delay
+        self._shared = shared or cache
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._timers: Dict[Hashable, threading.Timer] = {}
+        self._lock = threading.Lock()
+
+    def schedule(
+            self,
+            key: Hashable,
+            builder: Any,
+            text: str,
+            audio_presets: Dict[str, Any],
+            speeds: Iterable[float] = ()
+    ) -> None:
+        """ Warm the cache when the draft is not edited for a while
+
+        Args:
+            key: Draft identity (previous warming of the key is cancelled)
+            builder: _TTSMixin child of the chosen backend
+            text: Text as it was typed
+            audio_presets: Form audio presets (voice and emotion)
+            speeds: Playing speeds to prepare besides the default one
+
+        """
+        edit = uuid.uuid4().hex
+        self._shared.set(
+            self._edit_key(key),
+            edit,
+            timeout=self.delay + EDIT_TTL_MARGIN
+        )
+        timer = threading.Timer(
+            self.delay,
+            self._submit,
+            args=(
+                key,
+                edit,
+                builder,
+                text,
+                dict(audio_presets),
+                tuple(speeds),
+            )
+        )
+        timer.daemon = True
+        with self._lock:
+            self._cancel(key)
+            self._timers[key] = timer
+        timer.start()
+
+    def cancel(self, key: Hashable) -> None:
+        """ Drop the scheduled warming (e.g. draft is already saved) """
+        self._shared.delete(self._edit_key(key))
+        with self._lock:
+            self._cancel(key)
+
+    def pending(self) -> int:
+        """ Amount of the drafts waiting for the end of the edits """
+        with self._lock:
+            return len(self._timers)
+
+    def _cancel(self, key: Hashable) -> None:
+        """ Stop the timer of the key (lock is held by the caller) """
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+    @staticmethod
+    def _edit_key(key: Hashable) -> str:
+        """ Shared cache key of the last edit of the draft """
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return f'draft-edit:{digest}'
+
+    def _submit(
+            self,
+            key: Hashable,
+            edit: str,
+            *args: Any
+    ) -> Optional[Future]:
+        """ Start warming unless the draft was edited or saved meanwhile """
+        with self._lock:
+            if self._timers.get(key) is not threading.current_thread():
+                return None
+            del self._timers[key]
+        if self._shared.get(self._edit_key(key)) != edit:
+            return None  # Edited in the other process or saved
+        return self._executor.submit(self._warm, *args)
+
+    @staticmethod
+    def _warm(
+            builder: Any,
+            text: str,
+            audio_presets: Dict[str, Any],
+            speeds: Tuple[float, ...]
+    ) -> None:
+        """ Synthesize the text and its speed variants into the caches """
+        try:
+            builder.warm(text, audio_presets, speeds)
+        except Exception:
+            logger.exception('Cannot warm the synthesis of the draft')
+
+
+@lru_cache(maxsize=None)
+def draft_warmer() -> DraftWarmer:
+    """ Warmer of the drafts project (see MANUAL_EDIT_SLUG setting) """
+    return DraftWarmer(settings.DRAFT_WARM_DELAY)
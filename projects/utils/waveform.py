@@ -0,0 +1,71 @@
+""" Compact audio summary (duration, samples and waveform peaks) """
+import audioop
+import math
+import wave
+
+from typing import List, NamedTuple, Optional
+
+
+__all__ = (
+    'AudioSummary',
+    'WAVEFORM_BINS',
+    'empty_summary',
+    'summarize',
+)
+
+# Amount of peaks per record (bar per pixel of the table cell)
+WAVEFORM_BINS = 100
+
+# Peaks are stored as the percent of the maximum amplitude
+PEAK_SCALE = 100
+
+
+class AudioSummary(NamedTuple):
+    """ Properties of the wav file """
+    duration: Optional[float]
+    sample_count: Optional[int]
+    peaks: List[int]
+
+
+def empty_summary() -> AudioSummary:
+    """ Summary of the missing audio (new one, peaks list is mutable) """
+    return AudioSummary(None, None, [])
+
+
+def summarize(
+        path: str,
+        bins: int = WAVEFORM_BINS
+) -> AudioSummary:
+    """ Read wav file once and make its summary
+
+    Args:
+        path: Location of the wav file
+        bins: Amount of the peaks (fewer for the shorter files)
+
+    Returns:
+        Duration in seconds, amount of frames and the peaks (0..PEAK_SCALE)
+        of the equal parts of the audio. Empty summary if file is not a
+        readable wav
+
+    """
+    try:
+        with wave.open(path, 'rb') as wav:
+            width = wav.getsampwidth()
+            frames = wav.getnframes()
+            duration = frames / wav.getframerate()
+            if not frames:
+                return AudioSummary(duration, frames, [])
+            bin_frames = math.ceil(frames / bins)
+            limit = 2 ** (8 * width - 1)
+            peaks = []
+            for _ in range(0, frames, bin_frames):
+                data = wav.readframes(bin_frames)
+                if not data:
+                    break
+                if width == 1:  # 8-bit wav samples are unsigned
+                    data = audioop.bias(data, 1, -128)
+                peak = audioop.max(data, width)
+                peaks.append(min(PEAK_SCALE, round(peak * PEAK_SCALE / limit)))
+            return AudioSummary(duration, frames, peaks)
+    except (wave.Error, EOFError, OSError, audioop.error):
+        return empty_summary()
@@ -1,5 +1,6 @@
 from typing import Dict, Any
 
+from django.conf import settings
 from django.http.response import HttpResponse
 from django.template.defaultfilters import urlencode
 from django.urls.base import reverse
@@ -53,6 +54,8 @@ class AudioRecordsCommonView(TemplateView):
         ctx['PROJECT_NAME'] = IntegrationProject.objects.get(
             slug=self.kwargs['project']
         ).name
+        # Drafts are synthesized in advance while they are edited
+        ctx['IS_DRAFTS'] = self.kwargs['project'] == settings.MANUAL_EDIT_SLUG
         return ctx
 
 
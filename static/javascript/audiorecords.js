@@ -106,6 +106,7 @@ let editForm = new Vue({
           voicesList: [],
           emotionList: [],
           busyState: false,
+          warmTimer: null,
           form: {
               tts: ''
           },
@@ -120,8 +121,48 @@ let editForm = new Vue({
         textState () {
             return this.isValidText()
         },
+        speedPreviewSrc () {
+            return speedPreviewURI + this.recordId + '?speed=' + this.speed
+        },
+        warmState () {
+            return [this.tts, this.text, this.voice, this.emotion, this.speed]
+        },
+    },
+    watch: {
+        warmState () {
+            // Server waits for the end of the edits, this only saves requests
+            clearTimeout(this.warmTimer);
+            this.warmTimer = setTimeout(this.warmDraft, 500);
+        },
     },
     methods: {
+        warmDraft() {
+            // Drafts are synthesized in advance, so the save is instant
+            if (!warmDrafts || this.example === null || this.busyState) {
+                return
+            }
+            if (sourcesDict[this.tts] === undefined || !this.isValidText()) {
+                return
+            }
+            if (
+                this.text === this.example.text &&
+                this.voice === this.example.voice &&
+                this.emotion === this.example.emote
+            ) {
+                return
+            }
+            axios({
+                method: 'post',
+                url: warmURI + this.recordId,
+                data: {
+                    tts: sourcesDict[this.tts].id,
+                    text: this.text,
+                    voice: this.voice,
+                    emotion: this.emotion,
+                    speed: this.speed
+                }
+            }).catch(error => console.log(error));
+        },
        changeTTSSource() {
             if (sourcesDict[this.tts] === undefined){
                 return
@@ -241,6 +282,7 @@ new Vue({
                 {'key': 'text', 'label': 'Text', 'sortable': true},
                 {'key': 'modified_at', 'label': 'Last updated', 'sortable': true},
                 {'key': 'audio', 'label': 'Sound'},
+                {'key': 'duration', 'label': 'Duration', 'sortable': true},
                 {'key': 'source', 'label': 'Source', 'sortable': true},
                 {'key': 'voice', 'label': 'Voice', 'sortable': true},
                 {'key': 'speed', 'label': 'Record speed'},